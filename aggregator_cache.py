@@ -0,0 +1,295 @@
+import os
+import json
+import time
+import uuid
+import fcntl
+import shutil
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+from manifest import fingerprint_file
+from dataset_index import FileKind
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+ENTRY_FILE_NAME = 'entry.json'
+FILES_FOLDER_NAME = 'files'
+
+# placeholder of the case id folder leading the relative paths of the cached outputs
+CASE_ID_PLACEHOLDER = '{case_id}'
+
+# one lock per cache folder and key, the threads of a sweep aggregate the same key at the same time
+_key_locks = {}
+_key_locks_lock = threading.Lock()
+
+# linux FICLONE ioctl, a copy on write clone of the whole file (btrfs, xfs)
+FICLONE = 0x40049409
+
+def aggregator_input_files(index, participants):
+    """The windowed and features npz files of the dataset index read by the aggregator
+
+    npz files are named data_<participant id>_..., inside participant folders
+    named by the participant code, every npz file is taken without participants.
+
+    Args:
+      index (DatasetIndex): dataset index
+      participants (List[str]): participant codes of participants.txt
+
+    Returns:
+      List[str]: sorted npz file paths
+    """
+    ids = {participant[3:] for participant in participants}
+
+    files = []
+    for directory, name in index.files(FileKind.WINDOWED, FileKind.FEATURES):
+        tokens = name.split('_')
+        if not participants or os.path.basename(directory) in participants or (len(tokens) > 1 and tokens[1] in ids):
+            files.append(os.path.join(directory, name))
+
+    return sorted(files)
+
+def aggregator_cache_key(participants, ml_sensors, ml_models, image_digest, input_files, content_hash=False, shards=(), window_arrays=()):
+    """Key of an aggregation: participants, sensors, models, image digest, input npz fingerprints and shards
+
+    The case id and the case id folder are not part of the key, so every case
+    aggregating the same inputs shares the same cached output. The participants
+    of every shard and the window arrays concatenated by the merge are, as the
+    merge of a sharded aggregation may differ from the unsharded output.
+    """
+    payload = {
+        'participants': list(participants),
+        'ml_sensors': ml_sensors,
+        'ml_models': ml_models,
+        'image': image_digest,
+        'inputs': [fingerprint_file(path, content_hash) for path in input_files],
+        'shards': [list(shard) for shard in shards],
+        'window_arrays': list(window_arrays),
+    }
+
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+def cached_path(path, case_id):
+    """Replace the case id folder leading a path relative to the case id folder by the placeholder"""
+    head, _, tail = path.partition(os.sep)
+
+    return os.path.join(CASE_ID_PLACEHOLDER, tail) if head == case_id and tail else path
+
+def case_path(path, case_id):
+    """Replace the placeholder leading a cached path by the case id folder"""
+    head, _, tail = path.partition(os.sep)
+
+    return os.path.join(case_id, tail) if head == CASE_ID_PLACEHOLDER and tail else path
+
+def snapshot_folder(folder):
+    """Size and mtime of every file below a folder, skipping hidden folders
+
+    Returns:
+      Dict[str, Tuple[int, int]]: (size, mtime) by relative file path
+    """
+    files = {}
+    for root, dirs, names in os.walk(folder):
+        dirs[:] = [name for name in dirs if not name.startswith('.')]
+
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            files[os.path.relpath(path, folder)] = (stat.st_size, stat.st_mtime_ns)
+
+    return files
+
+def changed_files(before, after):
+    """Relative paths of the files written between two folder snapshots"""
+    return sorted(path for path, signature in after.items() if before.get(path) != signature)
+
+def clone_file(source, target):
+    """Clone a file copy on write with a reflink
+
+    Returns:
+      bool: False when the file system cannot clone files
+    """
+    try:
+        with open(source, 'rb') as src, open(target, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+        shutil.copystat(source, target)
+        return True
+    except OSError:
+        if os.path.exists(target):
+            os.remove(target)
+
+        return False
+
+def copy_file(source, target):
+    """Copy a file as a reflink or a plain copy, never sharing its inode with the source
+
+    A hard link would let a run rewriting the case output in place change the
+    cached one, or the other way around.
+    """
+    if not clone_file(source, target):
+        shutil.copy2(source, target)
+
+class AggregatorCache:
+    """Content addressed cache of the aggregator outputs shared by every case
+
+    Each entry folder is named by its key and holds the output files of one
+    aggregation, with the case id folder leading their relative paths replaced
+    by a placeholder, and an entry.json file with their size, written last so only
+    complete entries are found. The outputs are stored as reflinks or copies,
+    so the cache never shares an inode with a case output. A hit copies the
+    files into the new case id folder, as reflinks when the file system clones
+    files, instead of launching a container, and touches entry.json, whose
+    mtime orders the least recently used entries evicted when the cache grows
+    beyond its limit.
+
+    Args:
+      folder (str): cache folder
+      limit_bytes (int): maximum size of all the entries, None for no limit
+    """
+    def __init__(self, folder, limit_bytes=None):
+        self.folder = os.path.abspath(folder)
+        self.limit_bytes = limit_bytes
+
+    def _entry_path(self, key):
+        return os.path.join(self.folder, key)
+
+    @contextmanager
+    def key_lock(self, key):
+        """Serialize the aggregations of a key, between threads and between executor processes
+
+        The cases aggregating the same key wait for the first one and then
+        find its output cached, instead of all missing and aggregating at once.
+        flock alone does not exclude the threads of a process on NFS, where it
+        is emulated with per process fcntl locks.
+        """
+        with _key_locks_lock:
+            lock = _key_locks.setdefault((self.folder, key), threading.Lock())
+
+        with lock:
+            os.makedirs(self.folder, exist_ok=True)
+
+            with open(os.path.join(self.folder, f".{key}.lock"), 'w') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def lookup(self, key):
+        """Metadata of a complete entry, None on a miss"""
+        try:
+            with open(os.path.join(self._entry_path(key), ENTRY_FILE_NAME)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def materialize(self, key, case_id_folder, case_id):
+        """Copy the cached outputs of a key into a case id folder
+
+        Returns:
+          bool: True on a hit
+        """
+        entry = self.lookup(key)
+        if entry is None:
+            return False
+
+        files_folder = os.path.join(self._entry_path(key), FILES_FOLDER_NAME)
+        for relative_path in entry['files']:
+            target = os.path.join(case_id_folder, case_path(relative_path, case_id))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+
+            # never write through a link into the output of another case
+            if os.path.exists(target):
+                os.remove(target)
+
+            copy_file(os.path.join(files_folder, relative_path), target)
+
+        # mark the entry as recently used
+        os.utime(os.path.join(self._entry_path(key), ENTRY_FILE_NAME))
+
+        _logger.info(f"Aggregator cache hit {key[:12]}: {len(entry['files'])} files of case {entry['case_id']} copied into {case_id_folder}")
+
+        return True
+
+    def store(self, key, case_id_folder, case_id, files):
+        """Store the output files of an aggregation, relative to its case id folder, and evict the oldest entries"""
+        if not files:
+            return
+
+        size = sum(os.path.getsize(os.path.join(case_id_folder, path)) for path in files)
+        if self.limit_bytes is not None and size > self.limit_bytes:
+            _logger.warning(f"Aggregator output of {size} bytes exceeds the cache limit, not cached")
+            return
+
+        os.makedirs(self.folder, exist_ok=True)
+        tmp_path = os.path.join(self.folder, f".{key}.{uuid.uuid4().hex[:8]}.tmp")
+
+        try:
+            cached_files = []
+            for path in files:
+                relative_path = cached_path(path, case_id)
+                target = os.path.join(tmp_path, FILES_FOLDER_NAME, relative_path)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+
+                copy_file(os.path.join(case_id_folder, path), target)
+                cached_files.append(relative_path)
+
+            with open(os.path.join(tmp_path, ENTRY_FILE_NAME), 'w') as f:
+                json.dump({'case_id': case_id, 'size': size, 'created_at': time.time(), 'files': cached_files}, f)
+
+            # a concurrent run may have stored the same key first
+            try:
+                os.rename(tmp_path, self._entry_path(key))
+            except OSError:
+                pass
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+        _logger.info(f"Aggregator output of case {case_id} cached as {key[:12]}: {len(files)} files, {size} bytes")
+
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in its limit
+
+        Returns:
+          int: number of removed entries
+        """
+        if self.limit_bytes is None:
+            return 0
+
+        entries = []
+        for name in os.listdir(self.folder):
+            # entries still being stored are hidden
+            if name.startswith('.'):
+                continue
+
+            entry_file = os.path.join(self.folder, name, ENTRY_FILE_NAME)
+            try:
+                with open(entry_file) as f:
+                    size = json.load(f)['size']
+                entries.append((os.stat(entry_file).st_mtime, name, size))
+            except (OSError, ValueError, KeyError):
+                continue
+
+        total = sum(size for _, _, size in entries)
+        removed = 0
+        for _, name, size in sorted(entries):
+            if total <= self.limit_bytes:
+                break
+
+            _logger.info(f"Evicting aggregator cache entry {name[:12]} of {size} bytes")
+            shutil.rmtree(os.path.join(self.folder, name), ignore_errors=True)
+            total -= size
+            removed += 1
+
+        return removed
@@ -0,0 +1,161 @@
+import os
+import uuid
+import logging
+import posixpath
+
+from jobs import CONTAINER_USER, CONTAINER_WORKING_DIR, OOM_EXIT_CODE, JobResult, is_transient_error, iter_log_lines, running_jobs
+from logstream import open_job_log
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+# the dataset root is mounted once under the container working dir
+BATCH_DATASET_DIR = 'dataset'
+
+def batch_command(job, dataset_root):
+    """Rewrite a job command to run inside a worker container with the dataset root mounted
+
+    Per file jobs mount a participant folder (for example on /app/data) and
+    reference its files relative to the working dir (data/<file>). In the
+    worker container the same folder is reachable under dataset/<participant>,
+    so every argument starting with a job bind is rebased there.
+
+    Args:
+      job (Job): per file job
+      dataset_root (str): host dataset root mounted in the worker container
+
+    Returns:
+      List[str]: the command to be executed in the worker container
+    """
+    dataset_root = os.path.abspath(dataset_root)
+
+    mapping = []
+    for host_path, volume in job.volumes.items():
+        relative = os.path.relpath(os.path.abspath(host_path), dataset_root)
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            raise ValueError(f"Job {job.name} mounts {host_path} outside the dataset folder {dataset_root}")
+
+        source = posixpath.relpath(volume['bind'], CONTAINER_WORKING_DIR)
+        target = posixpath.normpath(posixpath.join(BATCH_DATASET_DIR, relative.replace(os.sep, '/')))
+        mapping.append((source, target))
+
+    command = []
+    for argument in job.command:
+        for source, target in mapping:
+            if argument == source or argument.startswith(source + '/'):
+                argument = target + argument[len(source):]
+                break
+
+        command.append(argument)
+
+    return command
+
+class BatchWorker:
+    """Long lived container of one image where many job commands are executed
+
+    The container is started once with the dataset root mounted and kept alive
+    with a sleep command, every job is then a docker exec inside it so Python and
+    its libraries are the only start up cost left per job.
+    """
+    def __init__(self, client, image, dataset_root, logs=None, monitors=()):
+        self.client = client
+        self.image = image
+        self.dataset_root = os.path.abspath(dataset_root)
+        self.logs = logs
+        self.monitors = monitors
+        self.container = None
+
+    def start(self):
+        # Define the container volume mapping
+        volumes = {
+            self.dataset_root: {
+                'bind': posixpath.join(CONTAINER_WORKING_DIR, BATCH_DATASET_DIR),
+                'mode': 'rw'
+            }
+        }
+
+        self.container = self.client.containers.run(
+            name = 'batch-worker-' + uuid.uuid4().hex[:8],
+            image = self.image,
+            user = CONTAINER_USER,
+            command = ['sleep', 'infinity'],
+            volumes = volumes,
+            working_dir = CONTAINER_WORKING_DIR,
+            detach = True,
+        )
+        # killing the worker container kills every job executed inside it
+        running_jobs.add(self.container.name, self.container)
+
+        _logger.info(f"Batch worker {self.container.name} started from image {self.image}")
+
+        return self
+
+    def run_job(self, job):
+        """Execute one job command inside the worker container
+
+        Returns:
+          JobResult: the job outcome, failed when the command exits with a non zero code
+        """
+        _logger.info(f"Executing job: {job.name}")
+
+        output = open_job_log(self.logs, job.name)
+        result = None
+
+        try:
+            command = batch_command(job, self.dataset_root)
+
+            exec_id = self.client.api.exec_create(
+                self.container.id,
+                command,
+                user = CONTAINER_USER,
+                workdir = CONTAINER_WORKING_DIR,
+                stdout = True,
+                stderr = True,
+            )['Id']
+
+            # the worker container is shared, so there are no per job container stats
+            for monitor in self.monitors:
+                monitor.job_started(job, None)
+
+            # stream logs live to the job output
+            for line in iter_log_lines(self.client.api.exec_start(exec_id, stream=True)):
+                output.write(line)
+
+            status_code = self.client.api.exec_inspect(exec_id)['ExitCode']
+
+            if status_code != 0:
+                _logger.error(f"Job {job.name} failed with exit code {status_code}")
+                result = JobResult(job.name, False, status_code=status_code, oom_killed=status_code == OOM_EXIT_CODE and not running_jobs.interrupted)
+            else:
+                result = JobResult(job.name, True, status_code=status_code)
+        except Exception as e:
+            _logger.error(f"Unexpected error in {job.name}: {e}")
+            result = JobResult(job.name, False, error=str(e), transient=is_transient_error(e))
+        finally:
+            output.close()
+
+            if result is not None:
+                for monitor in self.monitors:
+                    monitor.job_finished(job, result)
+
+        return result
+
+    def stop(self):
+        # remove the container and volume attached
+        if self.container is not None:
+            running_jobs.remove(self.container.name)
+            try:
+                self.container.remove(v=True, force=True)
+            except Exception as e:
+                _logger.warning(f"Batch worker {self.container.name} could not be removed: {e}")
+
+            self.container = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
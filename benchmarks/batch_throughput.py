@@ -0,0 +1,120 @@
+"""Compare job throughput of one container per job against one batch worker container
+
+Both paths execute the same short job on a real docker daemon, by default a
+Python start up importing numpy and pandas, which is the fixed cost every
+converter and windowed container pays before doing any work:
+
+    $ python3 benchmarks/batch_throughput.py \
+    --docker-image uniovi-simur-wearablepermed-hmc:1.0.0 \
+    --jobs 50 \
+    --max-workers 8
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+import tempfile
+
+import docker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jobs import Job, execute_jobs
+from batching import BatchWorker
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description="Container start up throughput benchmark")
+
+    parser.add_argument(
+        "-di",
+        "--docker-image",
+        required=True,
+        dest="docker_image",
+        help="Docker image used by both execution paths",
+    )
+    parser.add_argument(
+        "-jobs",
+        "--jobs",
+        dest="jobs",
+        type=int,
+        default=20,
+        help="Number of jobs executed by each path."
+    )
+    parser.add_argument(
+        "-max-workers",
+        "--max-workers",
+        dest="max_workers",
+        type=int,
+        default=1,
+        help="Maximum number of jobs running at the same time."
+    )
+    parser.add_argument(
+        "-job-code",
+        "--job-code",
+        dest="job_code",
+        default="import numpy, pandas",
+        help="Python code executed by every job."
+    )
+
+    return parser.parse_args(args)
+
+def make_jobs(dataset_folder, count, job_code):
+    jobs = []
+    for i in range(count):
+        participant_path = os.path.join(dataset_folder, f"PMP{i:04d}")
+        os.makedirs(participant_path, exist_ok=True)
+
+        volumes = {
+            participant_path: {
+                'bind': '/app/data',
+                'mode': 'rw'
+            }
+        }
+
+        jobs.append(Job(f"benchmark-{os.getpid()}-{i}", ['python', '-c', job_code, 'data/'], volumes))
+
+    return jobs
+
+def measure(label, run, count):
+    start = time.perf_counter()
+    results = run()
+    elapsed = time.perf_counter() - start
+
+    failed = sum(1 for result in results if not result.succeeded)
+    _logger.info(f"{label}: {count} jobs in {elapsed:.1f}s, {60 * count / elapsed:.1f} jobs/min, {failed} failed")
+
+    return elapsed
+
+def main(args):
+    args = parse_args(args)
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format="%(message)s")
+    logging.getLogger('jobs').setLevel(logging.WARNING)
+    logging.getLogger('batching').setLevel(logging.WARNING)
+
+    client = docker.from_env(max_pool_size=max(args.max_workers, 10))
+
+    with tempfile.TemporaryDirectory() as dataset_folder:
+        jobs = make_jobs(dataset_folder, args.jobs, args.job_code)
+
+        container_elapsed = measure(
+            "one container per job",
+            lambda: execute_jobs(client, args.docker_image, jobs, args.max_workers),
+            len(jobs))
+
+        with BatchWorker(client, args.docker_image, dataset_folder) as worker:
+            batch_elapsed = measure(
+                "batch worker container",
+                lambda: execute_jobs(client, args.docker_image, jobs, args.max_workers, runner=worker.run_job),
+                len(jobs))
+
+    _logger.info(f"Speed up: {container_elapsed / batch_elapsed:.2f}x")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,227 @@
+"""Measure the executor overhead without a docker daemon nor patient data
+
+A synthetic dataset tree of N participants is generated with the PMP file names
+the step filters expect (BIN, csv, activity register, features npz and METs
+activity registers). Then the scan, plan and dispatch paths of the executor
+run against a fake docker client whose containers only sleep for a duration
+proportional to their input size, and fail at a given rate:
+
+    $ python3 benchmarks/executor_overhead.py \
+    --participants 200 \
+    --job-duration 0.05 \
+    --max-workers 16 \
+    --report-file baseline.json
+
+The report has the files per second scanned (cold and cached index), the jobs
+per second planned and dispatched, and the makespan of the scheduler against
+the ideal one, to be compared between executor versions. With fake-hosts the
+jobs are also dispatched to several fake docker hosts, the last one slower:
+
+    $ python3 benchmarks/executor_overhead.py \
+    --fake-hosts 8,8,4 \
+    --slow-host-factor 3
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jobs import execute_jobs, run_job
+from hosts import DockerHost, HostDispatcher, host_job
+from dataset_index import FileKind, build_dataset_index
+from scheduler import ResourceBudget, execute_scheduled_jobs, job_input_bytes
+from stages import converter_jobs, windowed_jobs, windowed_mets_jobs
+from tests.fakes import FakeClient, generate_dataset
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description="Executor overhead benchmark with a fake docker backend")
+
+    parser.add_argument(
+        "-participants",
+        "--participants",
+        dest="participants",
+        type=int,
+        default=100,
+        help="Number of synthetic participants."
+    )
+    parser.add_argument(
+        "-file-size",
+        "--file-size",
+        dest="file_size",
+        type=int,
+        default=1024**2,
+        help="Mean size in bytes of the synthetic BIN and csv files, written as sparse files."
+    )
+    parser.add_argument(
+        "-job-duration",
+        "--job-duration",
+        dest="job_duration",
+        type=float,
+        default=0.02,
+        help="Mean duration in seconds of a fake container, proportional to its input size."
+    )
+    parser.add_argument(
+        "-failure-rate",
+        "--failure-rate",
+        dest="failure_rate",
+        type=float,
+        default=0.0,
+        help="Fraction of fake containers exiting with a non zero code."
+    )
+    parser.add_argument(
+        "-max-workers",
+        "--max-workers",
+        dest="max_workers",
+        type=int,
+        default=8,
+        help="Maximum number of fake containers running at the same time."
+    )
+    parser.add_argument(
+        "-fake-hosts",
+        "--fake-hosts",
+        dest="fake_hosts",
+        help="Comma separated capacities of fake docker hosts to dispatch the jobs to."
+    )
+    parser.add_argument(
+        "-slow-host-factor",
+        "--slow-host-factor",
+        dest="slow_host_factor",
+        type=float,
+        default=2.0,
+        help="Slowdown of the jobs on the last fake docker host."
+    )
+    parser.add_argument(
+        "-seed",
+        "--seed",
+        dest="seed",
+        type=int,
+        default=0,
+        help="Seed of the file sizes and failures."
+    )
+    parser.add_argument(
+        "-report-file",
+        "--report-file",
+        dest="report_file",
+        help="JSON file to save the report to."
+    )
+
+    return parser.parse_args(args)
+
+def measure(run):
+    start = time.perf_counter()
+    value = run()
+
+    return value, time.perf_counter() - start
+
+def benchmark(args):
+    rng = random.Random(args.seed)
+    report = {'participants': args.participants, 'max_workers': args.max_workers}
+
+    with tempfile.TemporaryDirectory() as root:
+        files = generate_dataset(root, args.participants, args.file_size, rng)
+        index_file = os.path.join(root, '.executor_index.json')
+
+        # scan the tree without and with the persisted index
+        _, cold_elapsed = measure(lambda: build_dataset_index(root, index_file))
+        index, warm_elapsed = measure(lambda: build_dataset_index(root, index_file))
+
+        report['files'] = files
+        report['scan_cold_files_per_second'] = files / cold_elapsed
+        report['scan_cached_files_per_second'] = files / warm_elapsed
+
+        # plan the jobs of the participant steps
+        plan_args = argparse.Namespace(make_feature_extractions=True)
+
+        def plan():
+            return (
+                converter_jobs(plan_args, index.files(FileKind.BIN)) +
+                windowed_jobs(plan_args, index.files(FileKind.CSV, FileKind.ACTIVITY), {}) +
+                windowed_mets_jobs(plan_args, index.files(FileKind.FEATURES, FileKind.REPOSO, FileKind.TREADMILL, FileKind.STS, FileKind.GXT))
+            )
+
+        jobs, plan_elapsed = measure(plan)
+        report['jobs'] = len(jobs)
+        report['plan_jobs_per_second'] = len(jobs) / plan_elapsed
+
+        # every fake container runs for a time proportional to its input size
+        converter = [job for job in jobs if job.stage == 'converter.py']
+        durations = {job.name: args.job_duration * job_input_bytes(job) / args.file_size for job in converter}
+        status_codes = {job.name: 1 for job in converter if rng.random() < args.failure_rate}
+
+        ideal = max(sum(durations.values()) / max(1, args.max_workers), max(durations.values(), default=0))
+        report['ideal_makespan'] = ideal
+
+        # dispatch with the default fifo pool and with the size aware scheduler
+        client = FakeClient(durations, status_codes)
+        results, fifo_elapsed = measure(lambda: execute_jobs(client, 'fake', converter, args.max_workers))
+        report['dispatch_jobs_per_second'] = len(converter) / fifo_elapsed
+        report['fifo_makespan'] = fifo_elapsed
+        report['failed'] = sum(1 for result in results if not result.succeeded)
+
+        budget = ResourceBudget(memory_bytes=2**62)
+        _, scheduled_elapsed = measure(lambda: execute_scheduled_jobs(client, 'fake', converter, budget, args.max_workers))
+        report['scheduled_makespan'] = scheduled_elapsed
+
+        if args.fake_hosts is not None:
+            report.update(benchmark_hosts(args, root, converter, durations, status_codes))
+
+    return report
+
+def benchmark_hosts(args, root, jobs, durations, status_codes):
+    """Dispatch the jobs to fake docker hosts, each one seeing the dataset in its own folder"""
+    capacities = [int(value) for value in args.fake_hosts.split(',')]
+    hosts = [DockerHost(f"fake://host{i}", capacity, f"/mnt/host{i}/dataset") for i, capacity in enumerate(capacities)]
+
+    runners = []
+    for i, host in enumerate(hosts):
+        factor = args.slow_host_factor if i == len(hosts) - 1 and len(hosts) > 1 else 1.0
+        client = FakeClient({name: duration * factor for name, duration in durations.items()}, status_codes)
+
+        runners.append(lambda job, client=client, host=host: run_job(client, 'fake', host_job(job, root, host)))
+
+    dispatcher = HostDispatcher(hosts, runners)
+    _, elapsed = measure(lambda: dispatcher.run(jobs))
+
+    return {
+        'hosts': capacities,
+        'hosts_makespan': elapsed,
+        'hosts_jobs_per_second': len(jobs) / elapsed,
+        'hosts_stolen': dispatcher.stolen,
+    }
+
+def main(args):
+    args = parse_args(args)
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format="%(message)s")
+    # the failed fake containers are counted in the report
+    for name in ['jobs', 'logstream', 'stages', 'dataset_index', 'scheduler', 'hosts']:
+        logging.getLogger(name).setLevel(logging.CRITICAL)
+
+    report = benchmark(args)
+
+    _logger.info(f"Synthetic cohort: {report['participants']} participants, {report['files']} files, {report['jobs']} jobs")
+    _logger.info(f"Scan: {report['scan_cold_files_per_second']:.0f} files/s cold, {report['scan_cached_files_per_second']:.0f} files/s cached")
+    _logger.info(f"Plan: {report['plan_jobs_per_second']:.0f} jobs/s")
+    _logger.info(f"Dispatch: {report['dispatch_jobs_per_second']:.1f} jobs/s with {report['max_workers']} workers, {report['failed']} failed")
+    _logger.info(f"Makespan: {report['fifo_makespan']:.2f}s fifo, {report['scheduled_makespan']:.2f}s scheduled, {report['ideal_makespan']:.2f}s ideal")
+
+    if 'hosts' in report:
+        _logger.info(f"Hosts {report['hosts']}: {report['hosts_jobs_per_second']:.1f} jobs/s, {report['hosts_makespan']:.2f}s makespan, {report['hosts_stolen']} jobs stolen")
+
+    if args.report_file is not None:
+        with open(args.report_file, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,142 @@
+"""Measure the import time of the executor and the startup time of its command line
+
+Every measure runs a fresh python interpreter: the import of the executor
+module with -X importtime, to get its cumulative import time and check that
+no heavy module (docker, requests, pandas, numpy) is imported up front, and
+the wall time of ``main.py --help``, what every command line call pays before
+doing any work:
+
+    $ python3 benchmarks/import_time.py \
+    --repeat 5 \
+    --max-import-ms 250 \
+    --report-file import_time.json
+
+The best of the repeated measures is reported, and with max-import-ms the
+benchmark fails when the import time or any heavy import regresses, so it can
+be tracked between executor versions.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import subprocess
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules deferred to the code paths using them
+HEAVY_MODULES = ['docker', 'requests', 'pandas', 'numpy']
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description="Executor import time benchmark")
+
+    parser.add_argument(
+        "-module",
+        "--module",
+        dest="module",
+        default="executor",
+        help="Executor module to import."
+    )
+    parser.add_argument(
+        "-repeat",
+        "--repeat",
+        dest="repeat",
+        type=int,
+        default=5,
+        help="Fresh interpreters started for every measure, the best one is reported."
+    )
+    parser.add_argument(
+        "-max-import-ms",
+        "--max-import-ms",
+        dest="max_import_ms",
+        type=float,
+        help="Fail when the module import takes longer or imports a heavy module."
+    )
+    parser.add_argument(
+        "-report-file",
+        "--report-file",
+        dest="report_file",
+        help="JSON file where the measures are saved."
+    )
+
+    return parser.parse_args(args)
+
+def parse_importtime(stderr):
+    """Parse the -X importtime output
+
+    Returns:
+      Dict[str, int]: cumulative microseconds of every imported module
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+
+    return modules
+
+def measure_import(module):
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd = ROOT_FOLDER,
+        capture_output = True,
+        text = True,
+    )
+
+    if process.returncode != 0:
+        raise Exception(f"Module {module} could not be imported: {process.stderr.strip().splitlines()[-1]}")
+
+    return parse_importtime(process.stderr)
+
+def measure_help():
+    start = time.perf_counter()
+    subprocess.run([sys.executable, 'main.py', '--help'], cwd=ROOT_FOLDER, capture_output=True, check=True)
+
+    return time.perf_counter() - start
+
+def benchmark(args):
+    imports = [measure_import(args.module) for _ in range(args.repeat)]
+    best = min(imports, key=lambda modules: modules[args.module])
+
+    return {
+        'module': args.module,
+        'import_ms': best[args.module] / 1000,
+        'heavy_imports': [module for module in HEAVY_MODULES if module in best],
+        'slowest_imports_ms': {
+            name: cumulative / 1000
+            for name, cumulative in sorted(best.items(), key=lambda item: item[1], reverse=True)[1:11]
+        },
+        'cli_help_ms': 1000 * min(measure_help() for _ in range(args.repeat)),
+    }
+
+def main(args):
+    args = parse_args(args)
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format="%(message)s")
+
+    report = benchmark(args)
+
+    _logger.info(f"Import {report['module']}: {report['import_ms']:.1f} ms")
+    _logger.info(f"Command line --help: {report['cli_help_ms']:.1f} ms")
+    _logger.info(f"Heavy imports: {', '.join(report['heavy_imports']) or 'none'}")
+    for name, cumulative in report['slowest_imports_ms'].items():
+        _logger.info(f"  {name}: {cumulative:.1f} ms")
+
+    if args.report_file is not None:
+        with open(args.report_file, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.max_import_ms is not None and (report['import_ms'] > args.max_import_ms or report['heavy_imports']):
+        _logger.error(f"Import time regression: {report['import_ms']:.1f} ms, heavy imports {report['heavy_imports']}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
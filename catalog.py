@@ -0,0 +1,308 @@
+import io
+import os
+import ast
+import csv
+import mmap
+import struct
+import logging
+import zlib
+import zipfile
+from collections import defaultdict
+
+from dataset_index import FileKind
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+CATALOG_FILE_NAME = '.executor_catalog.csv'
+
+# one row per array of every windowed and features npz file, one row without array for unreadable files
+CATALOG_COLUMNS = ['participant', 'sensor', 'kind', 'path', 'size', 'mtime_ns', 'status', 'array', 'dtype', 'shape', 'nbytes']
+
+NPY_MAGIC = b'\x93NUMPY'
+
+# upper bound of the npy header read from a stored array, headers only grow this large for huge record dtypes
+NPY_MAX_HEADER_SIZE = 1 << 20
+
+ZIP_LOCAL_HEADER_MAGIC = b'PK\x03\x04'
+ZIP_LOCAL_HEADER_SIZE = 30
+
+def parse_windowed_name(file_name):
+    """Get the participant code and sensor from a windowed file name like data_1002_tot_PI.npz
+
+    Returns:
+      Tuple[str, str]: participant code and sensor, None values when the name has no such tokens
+    """
+    tokens = os.path.splitext(file_name)[0].split('_')
+
+    if len(tokens) < 4 or tokens[0] != 'data':
+        return None, None
+
+    return 'PMP' + tokens[1], tokens[3]
+
+def dtype_itemsize(descr):
+    """Bytes of one item of a simple npy dtype description like <f8 or <U12, None for objects and records"""
+    if not isinstance(descr, str) or len(descr) < 2 or not descr[2:].isdigit():
+        return None
+
+    kind, size = descr[1], int(descr[2:])
+
+    # unicode strings are stored as 4 byte code points
+    return size * 4 if kind == 'U' else size
+
+def read_npy_header(stream):
+    """Read the header of a npy array without reading its data
+
+    Returns:
+      Tuple[str, Tuple[int, ...], int]: dtype description, shape and header length in bytes
+    """
+    prefix = stream.read(8)
+    if len(prefix) < 8 or prefix[:6] != NPY_MAGIC:
+        raise ValueError("Not a npy array")
+
+    major = prefix[6]
+    if major == 1:
+        length_size, length_format = 2, '<H'
+    else:
+        length_size, length_format = 4, '<I'
+
+    raw_length = stream.read(length_size)
+    if len(raw_length) < length_size:
+        raise ValueError("Truncated npy header")
+
+    header_length = struct.unpack(length_format, raw_length)[0]
+    raw_header = stream.read(header_length)
+    if len(raw_header) < header_length:
+        raise ValueError("Truncated npy header")
+
+    header = ast.literal_eval(raw_header.decode('latin1'))
+
+    return header['descr'], tuple(header['shape']), 8 + length_size + header_length
+
+def member_data_offset(mapped, member):
+    """Offset of the data of a zip member, after its local file header"""
+    local_header = mapped[member.header_offset:member.header_offset + ZIP_LOCAL_HEADER_SIZE]
+    if len(local_header) < ZIP_LOCAL_HEADER_SIZE or local_header[:4] != ZIP_LOCAL_HEADER_MAGIC:
+        raise ValueError(f"Bad local header of {member.filename}")
+
+    name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+
+    return member.header_offset + ZIP_LOCAL_HEADER_SIZE + name_length + extra_length
+
+def inspect_npz(path):
+    """Read the array headers of a npz file, memory mapped and without loading any array
+
+    A npz file is a zip of npy arrays: only its central directory and the
+    header of every array are read, straight from the mapped file for the
+    stored arrays of np.savez and decompressing only the header for the ones
+    of np.savez_compressed. The file is truncated when the zip cannot be
+    opened or a stored array has less data bytes than its shape needs.
+
+    Returns:
+      Tuple[str, List[Tuple[str, str, Tuple[int, ...], int]]]: status (ok, truncated or unreadable)
+      and the name, dtype, shape and bytes of every array
+    """
+    arrays = []
+
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return 'truncated', arrays
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, zipfile.ZipFile(f) as archive:
+                for member in archive.infolist():
+                    if member.compress_type == zipfile.ZIP_STORED:
+                        offset = member_data_offset(mapped, member)
+                        if offset + member.file_size > size:
+                            return 'truncated', arrays
+
+                        header_end = offset + min(member.file_size, NPY_MAX_HEADER_SIZE)
+                        descr, shape, header_length = read_npy_header(io.BytesIO(mapped[offset:header_end]))
+                    else:
+                        with archive.open(member) as stream:
+                            descr, shape, header_length = read_npy_header(stream)
+
+                    itemsize = dtype_itemsize(descr)
+                    count = 1
+                    for dimension in shape:
+                        count *= dimension
+
+                    nbytes = count * itemsize if itemsize is not None else None
+                    name = member.filename[:-4] if member.filename.endswith('.npy') else member.filename
+
+                    if nbytes is not None and member.file_size - header_length < nbytes:
+                        return 'truncated', arrays
+
+                    arrays.append((name, descr, shape, nbytes))
+    except zipfile.BadZipFile:
+        return 'truncated', arrays
+    except (OSError, ValueError, SyntaxError, KeyError, zlib.error) as e:
+        _logger.warning(f"Npz file {path} could not be read: {e}")
+        return 'unreadable', arrays
+
+    return 'ok', arrays
+
+def format_shape(shape):
+    return 'x'.join(str(dimension) for dimension in shape)
+
+class Catalog:
+    """Array shapes, dtypes and bytes of the windowed and features npz files per participant and sensor
+
+    Args:
+      path (str): catalog csv file
+      rows (List[dict]): one row per array, with the CATALOG_COLUMNS keys
+    """
+    def __init__(self, path, rows=None):
+        self.path = path
+        self.rows = rows or []
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved catalog, an empty one if missing or unreadable"""
+        try:
+            with open(path, newline='') as f:
+                reader = csv.DictReader(f)
+                if reader.fieldnames != CATALOG_COLUMNS:
+                    return cls(path)
+
+                return cls(path, list(reader))
+        except FileNotFoundError:
+            return cls(path)
+        except (OSError, csv.Error) as e:
+            _logger.warning(f"Catalog {path} could not be read, building it from scratch: {e}")
+            return cls(path)
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=CATALOG_COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.rows)
+
+        os.replace(tmp_path, self.path)
+
+    def files(self, participants=None, sensors=None, kinds=None):
+        """Status and array bytes of every cataloged file, optionally of some participants, sensors and kinds
+
+        Returns:
+          Dict[str, dict]: ``{"<path>": {"participant": ..., "sensor": ..., "kind": ..., "status": ..., "size": ..., "nbytes": ...}}``
+        """
+        files = {}
+        for row in self.rows:
+            if participants is not None and row['participant'] not in participants:
+                continue
+            if sensors is not None and row['sensor'] not in sensors:
+                continue
+            if kinds is not None and row['kind'] not in kinds:
+                continue
+
+            entry = files.setdefault(row['path'], {
+                'participant': row['participant'],
+                'sensor': row['sensor'],
+                'kind': row['kind'],
+                'status': row['status'],
+                'size': int(row['size']),
+                'nbytes': 0,
+            })
+            entry['nbytes'] += int(row['nbytes'] or 0)
+
+        return files
+
+    def participant_bytes(self, participants=None, sensors=None):
+        """Array bytes of the windowed files of every participant
+
+        Returns:
+          Dict[str, int]: bytes by participant code
+        """
+        totals = defaultdict(int)
+        for entry in self.files(participants, sensors, [FileKind.WINDOWED.value]).values():
+            totals[entry['participant']] += entry['nbytes']
+
+        return dict(totals)
+
+    def problems(self, participants, sensors):
+        """Missing and damaged windowed outputs of some participants and sensors, only damaged files without participants
+
+        Returns:
+          List[str]: one message per problem, empty when every output is complete
+        """
+        files = self.files(participants, sensors)
+
+        found = {(entry['participant'], entry['sensor']) for entry in files.values() if entry['kind'] == FileKind.WINDOWED.value}
+
+        problems = [f"{path} is {entry['status']}" for path, entry in sorted(files.items()) if entry['status'] != 'ok']
+        for participant in participants or []:
+            for sensor in sensors:
+                if (participant, sensor) not in found:
+                    problems.append(f"Windowed output of {participant} sensor {sensor} not found")
+
+        return problems
+
+def build_catalog(index, path):
+    """Refresh and save the catalog of the windowed and features npz files of a dataset index
+
+    Files with the same size and mtime as in the saved catalog keep their rows,
+    only new and changed files are inspected.
+
+    Args:
+      index (DatasetIndex): dataset index
+      path (str): catalog csv file
+
+    Returns:
+      Catalog: the refreshed catalog
+    """
+    cached = defaultdict(list)
+    for row in Catalog.load(path).rows:
+        cached[row['path']].append(row)
+
+    rows = []
+    inspected = 0
+    for kind in [FileKind.WINDOWED, FileKind.FEATURES]:
+        for directory, file_name in index.files(kind):
+            file_path = os.path.join(directory, file_name)
+
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+
+            previous = cached.get(file_path)
+            if previous and previous[0]['size'] == str(stat.st_size) and previous[0]['mtime_ns'] == str(stat.st_mtime_ns):
+                rows.extend(previous)
+                continue
+
+            participant, sensor = parse_windowed_name(file_name)
+            status, arrays = inspect_npz(file_path)
+            inspected += 1
+
+            row = {
+                'participant': participant,
+                'sensor': sensor,
+                'kind': kind.value,
+                'path': file_path,
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'status': status,
+            }
+
+            if not arrays:
+                rows.append({**row, 'array': '', 'dtype': '', 'shape': '', 'nbytes': ''})
+
+            for name, descr, shape, nbytes in arrays:
+                rows.append({**row, 'array': name, 'dtype': descr, 'shape': format_shape(shape), 'nbytes': '' if nbytes is None else nbytes})
+
+    # keep every value as the csv text, as the rows of a loaded catalog
+    rows = [{column: '' if row[column] is None else str(row[column]) for column in CATALOG_COLUMNS} for row in rows]
+
+    catalog = Catalog(path, rows)
+    catalog.save()
+
+    files = catalog.files()
+    damaged = sum(1 for entry in files.values() if entry['status'] != 'ok')
+    _logger.info(f"Catalog {path}: {len(files)} npz files, {inspected} inspected again, {damaged} truncated or unreadable")
+
+    return catalog
@@ -0,0 +1,262 @@
+import os
+import re
+import json
+import time
+import logging
+from enum import Enum
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+INDEX_FILE_NAME = '.executor_index.json'
+INDEX_VERSION = 2
+
+# directories modified this close to the previous scan are always listed again,
+# because coarse mtime granularity (NFS) could hide a change in the same interval
+RACY_MTIME_NS = 2 * 10**9
+
+# participant folders are named by the participant code, like PMP1002
+PARTICIPANT_FOLDER_PATTERN = re.compile(r'PMP\d+')
+
+class FileKind(Enum):
+    BIN = 'bin'
+    CSV = 'csv'
+    ACTIVITY = 'activity'
+    REPOSO = 'reposo'
+    TREADMILL = 'treadmill'
+    STS = 'sts'
+    GXT = 'gxt'
+    FEATURES = 'features'
+    WINDOWED = 'windowed'
+
+def classify(file_name):
+    """Classify a dataset file name by the kinds the executor steps consume
+
+    Returns:
+      List[FileKind]: kinds of the file, empty if no step uses it
+    """
+    _, ext = os.path.splitext(file_name)
+
+    kinds = []
+    if ext == '.BIN':
+        kinds.append(FileKind.BIN)
+    if ext == '.csv':
+        kinds.append(FileKind.CSV)
+    if '_RegistroActividades.xlsx' in file_name:
+        kinds.append(FileKind.ACTIVITY)
+    if '_REPOSO_' in file_name:
+        kinds.append(FileKind.REPOSO)
+    if '_TREADMILL_' in file_name:
+        kinds.append(FileKind.TREADMILL)
+    if '_STS_' in file_name:
+        kinds.append(FileKind.STS)
+    if '_GXT_' in file_name:
+        kinds.append(FileKind.GXT)
+    if '_features.npz' in file_name:
+        kinds.append(FileKind.FEATURES)
+    elif file_name.startswith('data_') and ext == '.npz':
+        kinds.append(FileKind.WINDOWED)
+
+    return kinds
+
+class DatasetIndex:
+    """Classified dataset files grouped by participant directory
+
+    Each directory entry keeps its mtime, its subdirectories and its files by
+    kind: ``{"<dir>": {"mtime_ns": ..., "dirs": [...], "files": {"bin": [...], ...}}}``.
+    skipped keeps the cached entries of the directories a filtered scan did not walk.
+    """
+    def __init__(self, root, directories=None, scanned_at_ns=0, skipped=None):
+        self.root = root
+        self.directories = directories or {}
+        self.scanned_at_ns = scanned_at_ns
+        self.skipped = skipped or {}
+
+    def files(self, *kinds):
+        """Return the sorted (participant directory, file name) tuples of the given kinds"""
+        values = {kind.value for kind in kinds}
+
+        files = set()
+        for directory, entry in self.directories.items():
+            for kind, names in entry['files'].items():
+                if kind in values:
+                    files.update((directory, name) for name in names)
+
+        return sorted(files)
+
+    def participant_files(self, directory, kind):
+        """Return the sorted file names of a kind inside one participant directory"""
+        entry = self.directories.get(directory)
+        if entry is None:
+            return []
+
+        return sorted(entry['files'].get(kind.value, []))
+
+    def participants(self):
+        """Return the participant directories holding classified files"""
+        return sorted(directory for directory, entry in self.directories.items() if entry['files'])
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'version': INDEX_VERSION,
+                'root': self.root,
+                'scanned_at_ns': self.scanned_at_ns,
+                'directories': self.directories,
+            }, f)
+
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, root):
+        """Load a persisted index, an empty one if missing, invalid or from another root"""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls(root)
+        except (OSError, ValueError) as e:
+            _logger.warning(f"Dataset index {path} could not be read, scanning from scratch: {e}")
+            return cls(root)
+
+        if data.get('version') != INDEX_VERSION or data.get('root') != root:
+            return cls(root)
+
+        return cls(root, data['directories'], data['scanned_at_ns'])
+
+def list_directory(directory):
+    """List one directory, classifying its files
+
+    Returns:
+      Tuple[List[str], Dict[str, List[str]]]: subdirectory paths and file names by kind value
+    """
+    subdirectories = []
+    files = {}
+
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                subdirectories.append(entry.path)
+            elif entry.is_file():
+                for kind in classify(entry.name):
+                    files.setdefault(kind.value, []).append(entry.name)
+
+    return sorted(subdirectories), files
+
+def skip_unselected_participants(participants):
+    """Directory filter skipping the participant folders not in participants
+
+    Folders not named like a participant code are always walked.
+
+    Returns:
+      Callable[[str], bool]: True for the directories not to be walked
+    """
+    def skip_directory(directory):
+        name = os.path.basename(directory)
+
+        return PARTICIPANT_FOLDER_PATTERN.fullmatch(name) is not None and name not in participants
+
+    return skip_directory
+
+def cached_subtree(directory, cached_directories):
+    """The cached entries of a directory and all its cached subdirectories"""
+    entries = {}
+
+    pending = [directory]
+    while pending:
+        directory = pending.pop()
+
+        entry = cached_directories.get(directory)
+        if entry is not None:
+            entries[directory] = entry
+            pending.extend(entry['dirs'])
+
+    return entries
+
+def scan_dataset(root, cache=None, skip_directory=None):
+    """Index the dataset tree listing only the directories changed since the cached scan
+
+    A directory mtime changes when entries are added, removed or renamed inside
+    it, so unchanged directories reuse their cached listing and only need one stat.
+
+    Skipped directories are neither walked nor returned, their cached entries
+    are kept apart so the persisted index still covers the whole tree.
+
+    Args:
+      root (str): dataset root folder
+      cache (DatasetIndex): previous index of the same root, if any
+      skip_directory (Callable[[str], bool]): True for the directories not to be walked
+
+    Returns:
+      DatasetIndex: the refreshed index
+    """
+    cached_directories = cache.directories if cache is not None else {}
+    racy_limit_ns = (cache.scanned_at_ns if cache is not None else 0) - RACY_MTIME_NS
+
+    scanned_at_ns = time.time_ns()
+    directories = {}
+    skipped = {}
+    listed = 0
+
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+
+        if skip_directory is not None and directory != root and skip_directory(directory):
+            skipped.update(cached_subtree(directory, cached_directories))
+            continue
+
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError as e:
+            _logger.warning(f"Directory {directory} could not be indexed: {e}")
+            continue
+
+        cached = cached_directories.get(directory)
+        if cached is not None and cached['mtime_ns'] == mtime_ns and mtime_ns < racy_limit_ns:
+            entry = cached
+        else:
+            subdirectories, files = list_directory(directory)
+            entry = {'mtime_ns': mtime_ns, 'dirs': subdirectories, 'files': files}
+            listed += 1
+
+        directories[directory] = entry
+        pending.extend(entry['dirs'])
+
+    _logger.info(f"Dataset index: {len(directories)} directories, {listed} listed again")
+
+    return DatasetIndex(root, directories, scanned_at_ns, skipped)
+
+def build_dataset_index(root, index_file=None, skip_directory=None):
+    """Refresh and persist the dataset index of a root folder
+
+    Args:
+      root (str): dataset root folder
+      index_file (str): persisted index path, by default inside the root folder
+      skip_directory (Callable[[str], bool]): True for the directories not to be walked
+
+    Returns:
+      DatasetIndex: the refreshed index
+    """
+    root = os.path.abspath(root)
+    index_file = index_file or os.path.join(root, INDEX_FILE_NAME)
+
+    cache = DatasetIndex.load(index_file, root)
+    index = scan_dataset(root, cache, skip_directory)
+
+    # keep the cached listing of the skipped directories for the next full scan,
+    # dated as the cache so they are never trusted beyond it
+    persisted = index
+    if index.skipped:
+        persisted = DatasetIndex(root, {**index.skipped, **index.directories}, min(index.scanned_at_ns, cache.scanned_at_ns))
+
+    try:
+        persisted.save(index_file)
+    except OSError as e:
+        _logger.warning(f"Dataset index {index_file} could not be saved: {e}")
+
+    return index
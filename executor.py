@@ -0,0 +1,1304 @@
+import sys
+import os
+import argparse
+import logging
+from contextlib import nullcontext
+from enum import Enum
+
+from jobs import (
+    JobResult, execute_job_chains, execute_jobs, execute_with_oom_recovery, log_summary, retry_transient, run_job,
+)
+from manifest import MANIFEST_FILE_NAME, Manifest, select_outdated_jobs
+from dataset_index import INDEX_FILE_NAME, FileKind, build_dataset_index, skip_unselected_participants
+from catalog import CATALOG_FILE_NAME, build_catalog
+from batching import BatchWorker
+from logstream import LogMultiplexer
+from profiling import Profiler
+from progress import MetricsServer, ProgressMonitor
+from stages import (
+    Stage, aggregator_job, converter_jobs, fan_out_jobs, load_participants_not_time_off, participants_file_path, read_participant_codes,
+    container_name, select_jobs, split_values, tester_job, trainer_job, windowed_jobs, windowed_mets_jobs,
+)
+from pipeline import COHORT_STAGES, Pipeline, parse_stage_images, parse_stages, unsupported_options
+from planner import build_plan, log_plan, save_plan
+from scheduler import ResourceBudget, execute_scheduled_jobs, parse_bytes
+from sweep import case_args, expand_sweep, load_sweep, sweep_chains, write_comparison
+from journal import JournalMonitor, RunJournal, default_journal_path, new_run_id, resume_chains, resume_jobs
+from runtime import DockerRuntime
+from hosts import HostDispatcher, host_job, parse_docker_hosts
+from sharding import WINDOW_ARRAYS, merge_shards, parse_window_arrays, plan_shards, prepare_shards, shard_jobs
+from local_backend import LocalBackend, LocalRuntime
+from staging import StagingArea
+from handoff import ArtifactWatcher, TesterHandoff, execute_streamed_testers
+from aggregator_cache import (
+    AggregatorCache, aggregator_cache_key, aggregator_input_files, changed_files, snapshot_folder,
+)
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+class ML_Model(Enum):
+    ESANN = 'ESANN'
+    CAPTURE24 = 'CAPTURE24'
+    RANDOM_FOREST = 'RandomForest'
+    XGBOOST = 'XGBoost'
+
+class ML_Sensor(Enum):
+    PI = 'thigh'
+    M = 'wrist'
+    C = 'hip'
+
+def parse_args(args):
+    """Parse command line parameters
+
+    Args:
+      args (List[str]): command line parameters as list of strings
+          (for example  ``["--help"]``).
+
+    Returns:
+      :obj:`argparse.Namespace`: command line parameters namespace
+    """
+    parser = argparse.ArgumentParser(description="BIN to CSV Converter")
+
+    parser.add_argument(
+        "-rd",
+        "--dataset-folder",
+        required=True,
+        dest="dataset_folder",
+        help="Root Participant data folder",
+    )
+    parser.add_argument(
+        "-di",
+        "--docker-image",
+        required=True,
+        dest="docker_image",
+        help="Docker image with Python modules implemented",
+    )    
+    parser.add_argument(
+        "-md",
+        "--python-module",
+        required=True,
+        dest="python_module",
+        help="Python module to be execute, pipeline to execute all the stages as a dependency graph, sweep to train and test a grid of cases or catalog to catalog the windowed outputs",
+    )
+    parser.add_argument(
+        "-make-feature-extractions",
+        "--make-feature-extractions",
+        dest="make_feature_extractions",
+        action='store_true',
+        help="make feature extractions?.")
+    parser.add_argument(
+        "-case-id",
+        "--case-id",
+        dest="case_id",
+        help="Case unique identifier."
+    )
+    parser.add_argument(
+        "-ml-models",
+        "--ml-models",
+        dest="ml_models",
+        help=f"Available ML models: {[c.value for c in ML_Model]}."
+    )
+    parser.add_argument(
+        "-ml-sensors",
+        "--ml-sensors",
+        dest="ml_sensors",
+        help=f"Available ML sensors: {[c.value for c in ML_Sensor]}."
+    ) 
+    parser.add_argument(
+        "-participants-file",
+        "--participants-file",
+        dest="participants_file",
+        help="Choose the dataset participant text file, also selecting the participants processed by the converter, windowed and windowing mets steps"
+    )
+    parser.add_argument(
+        "-participants",
+        "--participants",
+        dest="participants",
+        help="Comma separated participant codes processed by the converter, windowed and windowing mets steps, like PMP1002,PMP1010."
+    )
+    parser.add_argument(
+        "-sensors",
+        "--sensors",
+        dest="sensors",
+        help="Comma separated sensor codes or names processed by the converter, windowed and windowing mets steps, like PI,M or thigh,wrist."
+    )
+    parser.add_argument(
+        "-csv-participants-not-time-off-file",
+        "--csv-participants-not-time-off-file",
+        dest="csv_participants_not_time_off_file",
+        help="csv Participants not time off file"
+    )    
+    parser.add_argument(
+        "-case-id-folder",
+        "--case-id-folder",
+        dest="case_id_folder",
+        help="Choose the case id root folder."
+    )  
+    parser.add_argument(
+        "-training-percent",
+        "--training-percent",        
+        dest="training_percent",
+        default="70",        
+        help="Choose the training percent."
+    )
+    parser.add_argument(
+        "-max-workers",
+        "--max-workers",
+        dest="max_workers",
+        type=int,
+        default=1,
+        help="Maximum number of containers running at the same time."
+    )
+    parser.add_argument(
+        "-incremental",
+        "--incremental",
+        dest="incremental",
+        action='store_true',
+        help="Skip jobs whose inputs, image and command are unchanged and whose outputs exist."
+    )
+    parser.add_argument(
+        "-force",
+        "--force",
+        dest="force",
+        action='store_true',
+        help="Execute all jobs in incremental mode, even the up to date ones."
+    )
+    parser.add_argument(
+        "-manifest-file",
+        "--manifest-file",
+        dest="manifest_file",
+        help=f"Incremental manifest file, by default {MANIFEST_FILE_NAME} in the dataset folder."
+    )
+    parser.add_argument(
+        "-content-hash",
+        "--content-hash",
+        dest="content_hash",
+        action='store_true',
+        help="Fingerprint input files by content hash instead of size and mtime."
+    )
+    parser.add_argument(
+        "-index-file",
+        "--index-file",
+        dest="index_file",
+        help=f"Dataset index cache file, by default {INDEX_FILE_NAME} in the dataset folder."
+    )
+    parser.add_argument(
+        "-catalog-file",
+        "--catalog-file",
+        dest="catalog_file",
+        help=f"Catalog of the windowed outputs, by default {CATALOG_FILE_NAME} in the dataset folder."
+    )
+    parser.add_argument(
+        "-use-catalog",
+        "--use-catalog",
+        dest="use_catalog",
+        action='store_true',
+        help="Check the windowed outputs and shard and size the aggregator jobs by their array bytes."
+    )
+    parser.add_argument(
+        "-batch",
+        "--batch",
+        dest="batch",
+        action='store_true',
+        help="Execute all jobs inside one long lived container with the dataset folder mounted."
+    )
+    parser.add_argument(
+        "-log-folder",
+        "--log-folder",
+        dest="log_folder",
+        help="Folder where the output of every job is saved to a compressed log file."
+    )
+    parser.add_argument(
+        "-console-log-rate",
+        "--console-log-rate",
+        dest="console_log_rate",
+        type=float,
+        default=20,
+        help="Maximum console log lines per second for each job, 0 for unlimited."
+    )
+    parser.add_argument(
+        "-profile-folder",
+        "--profile-folder",
+        dest="profile_folder",
+        help="Folder where the per container resource profile and its summary are saved."
+    )
+    parser.add_argument(
+        "-progress-interval",
+        "--progress-interval",
+        dest="progress_interval",
+        type=float,
+        default=30,
+        help="Seconds between the progress and ETA log lines of every stage, 0 to disable them."
+    )
+    parser.add_argument(
+        "-metrics-port",
+        "--metrics-port",
+        dest="metrics_port",
+        type=int,
+        help="Local port serving the job counters and durations on /metrics in Prometheus text format."
+    )
+    parser.add_argument(
+        "-pipeline-stages",
+        "--pipeline-stages",
+        dest="pipeline_stages",
+        help="Comma separated python modules executed by the pipeline, by default all of them."
+    )
+    parser.add_argument(
+        "-stage-images",
+        "--stage-images",
+        dest="stage_images",
+        help="Comma separated <python module>=<docker image> overriding the docker image of a pipeline stage."
+    )
+    parser.add_argument(
+        "-dry-run",
+        "--dry-run",
+        dest="dry_run",
+        action='store_true',
+        help="Plan and log the jobs without executing them."
+    )
+    parser.add_argument(
+        "-plan-file",
+        "--plan-file",
+        dest="plan_file",
+        help="JSON file where the planned jobs are exported."
+    )
+    parser.add_argument(
+        "-memory-budget",
+        "--memory-budget",
+        dest="memory_budget",
+        help="Memory shared by all running containers (for example 64g), enables the size aware scheduler."
+    )
+    parser.add_argument(
+        "-cpu-budget",
+        "--cpu-budget",
+        dest="cpu_budget",
+        type=float,
+        help="CPUs shared by all running containers with the size aware scheduler."
+    )
+    parser.add_argument(
+        "-memory-per-input-byte",
+        "--memory-per-input-byte",
+        dest="memory_per_input_byte",
+        type=float,
+        default=3.0,
+        help="Container memory estimated for each byte of the job input files."
+    )
+    parser.add_argument(
+        "-min-job-memory",
+        "--min-job-memory",
+        dest="min_job_memory",
+        default="1g",
+        help="Minimum memory limit of each container with the size aware scheduler."
+    )
+    parser.add_argument(
+        "-job-cpus",
+        "--job-cpus",
+        dest="job_cpus",
+        type=float,
+        default=1.0,
+        help="CPU limit of each container with the size aware scheduler."
+    )
+    parser.add_argument(
+        "-fan-out",
+        "--fan-out",
+        dest="fan_out",
+        action='store_true',
+        help="Run one trainer or tester container per ML model and comma separated case id."
+    )
+    parser.add_argument(
+        "-stream-tester",
+        "--stream-tester",
+        dest="stream_tester",
+        action='store_true',
+        help="With the trainer, run the tester of every model as soon as its trained artifact is complete."
+    )
+    parser.add_argument(
+        "-model-artifact-pattern",
+        "--model-artifact-pattern",
+        dest="model_artifact_pattern",
+        help="Glob matching only the final trained artifact of a model inside the case id folder, never its checkpoints, with {case_id} and {model} placeholders. Without it each tester starts when its trainer succeeds."
+    )
+    parser.add_argument(
+        "-artifact-stable-seconds",
+        "--artifact-stable-seconds",
+        dest="artifact_stable_seconds",
+        type=float,
+        default=10,
+        help="Seconds a model artifact must stay unchanged to be complete."
+    )
+    parser.add_argument(
+        "-artifact-poll-interval",
+        "--artifact-poll-interval",
+        dest="artifact_poll_interval",
+        type=float,
+        default=5,
+        help="Maximum seconds between two checks of the model artifacts."
+    )
+    parser.add_argument(
+        "-aggregator-shards",
+        "--aggregator-shards",
+        dest="aggregator_shards",
+        type=int,
+        default=1,
+        help="Split the participants in shards aggregated by parallel containers and merged at the end."
+    )
+    parser.add_argument(
+        "-aggregator-window-arrays",
+        "--aggregator-window-arrays",
+        dest="aggregator_window_arrays",
+        default=WINDOW_ARRAYS,
+        help="Comma separated names or globs of the npz arrays stacked by window, concatenated when merging the aggregator shards."
+    )
+    parser.add_argument(
+        "-aggregator-cache-folder",
+        "--aggregator-cache-folder",
+        dest="aggregator_cache_folder",
+        help="Folder caching the aggregator outputs, reused by every case aggregating the same participants, sensors, models, image and inputs."
+    )
+    parser.add_argument(
+        "-aggregator-cache-limit",
+        "--aggregator-cache-limit",
+        dest="aggregator_cache_limit",
+        default="100g",
+        help="Maximum size of the aggregator cache, the least recently used outputs are evicted beyond it."
+    )
+    parser.add_argument(
+        "-sweep-file",
+        "--sweep-file",
+        dest="sweep_file",
+        help="TOML or JSON sweep specification with the training percents, ML model sets and ML sensor sets."
+    )
+    parser.add_argument(
+        "-sweep-metrics-files",
+        "--sweep-metrics-files",
+        dest="sweep_metrics_files",
+        default="*.json,*metric*.csv,*report*.csv",
+        help="Comma separated globs of the tester output files with the metrics of the sweep comparison."
+    )
+    parser.add_argument(
+        "-backend",
+        "--backend",
+        dest="backend",
+        choices=["docker", "local"],
+        default="docker",
+        help="Run every job in a docker container or as a local process of the local python modules."
+    )
+    parser.add_argument(
+        "-local-modules-folder",
+        "--local-modules-folder",
+        dest="local_modules_folder",
+        help="Folder with a local copy of the HMC and ML python modules, for the local backend."
+    )
+    parser.add_argument(
+        "-local-python",
+        "--local-python",
+        dest="local_python",
+        default=sys.executable,
+        help="Python interpreter running the local python modules, by default the executor one."
+    )
+    parser.add_argument(
+        "-scratch-folder",
+        "--scratch-folder",
+        dest="scratch_folder",
+        help="Local NVMe or tmpfs folder where the input files of every job are staged, and its outputs moved back from."
+    )
+    parser.add_argument(
+        "-scratch-limit",
+        "--scratch-limit",
+        dest="scratch_limit",
+        help="Maximum scratch space used at the same time, like 32g."
+    )
+    parser.add_argument(
+        "-docker-hosts",
+        "--docker-hosts",
+        dest="docker_hosts",
+        help="Comma separated <url>=<capacity>[:<dataset folder on the host>] docker hosts running the converter, windowed and windowing mets jobs."
+    )
+    parser.add_argument(
+        "-pull",
+        "--pull",
+        dest="pull",
+        action='store_true',
+        help="Pull the docker images before the run even when found locally."
+    )
+    parser.add_argument(
+        "-journal-file",
+        "--journal-file",
+        dest="journal_file",
+        help="SQLite run journal with the state of every job, by default one per dataset folder in the local user state directory."
+    )
+    parser.add_argument(
+        "-run-id",
+        "--run-id",
+        dest="run_id",
+        help="Id of the run in the journal, generated by default."
+    )
+    parser.add_argument(
+        "-resume",
+        "--resume",
+        dest="resume",
+        help="Resume a journaled run, executing only its jobs not succeeded yet."
+    )
+    parser.add_argument(
+        "-retries",
+        "--retries",
+        dest="retries",
+        type=int,
+        default=3,
+        help="Retries of a job failed on a transient Docker API error."
+    )
+    parser.add_argument(
+        "-retry-backoff",
+        "--retry-backoff",
+        dest="retry_backoff",
+        type=float,
+        default=2.0,
+        help="Seconds before the first retry, doubled on every retry."
+    )
+    parser.add_argument(
+        "-oom-retries",
+        "--oom-retries",
+        dest="oom_retries",
+        type=int,
+        default=2,
+        help="Rounds rescheduling the OOM killed jobs with more memory and half the workers."
+    )
+    parser.add_argument(
+        "-oom-memory-factor",
+        "--oom-memory-factor",
+        dest="oom_memory_factor",
+        type=float,
+        default=2.0,
+        help="Growth of the memory limit of an OOM killed job on every rescheduling round."
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        dest="loglevel",
+        help="set loglevel to INFO",
+        action="store_const",
+        const=logging.INFO,
+    )
+    parser.add_argument(
+        "-vv",
+        "--very-verbose",
+        dest="loglevel",
+        help="set loglevel to DEBUG",
+        action="store_const",
+        const=logging.DEBUG,
+    )
+
+    args = parser.parse_args(args)
+
+    # the pipeline plans and schedules its own jobs
+    if args.python_module == "pipeline" and unsupported_options(args):
+        parser.error(f"{', '.join(unsupported_options(args))} not available with the pipeline")
+
+    return args
+
+
+def filter_conveter_files(index):
+    # get only files for converter step
+    return index.files(FileKind.BIN)
+
+def filter_windowed_files(index):
+    # get only files for windowed step
+    return index.files(FileKind.CSV, FileKind.ACTIVITY)
+
+def filter_windowed_mets_files(index):
+    # get only files for windowed mets step
+    return index.files(FileKind.FEATURES, FileKind.REPOSO, FileKind.TREADMILL, FileKind.STS, FileKind.GXT)
+
+def resource_budget(args):
+    if args.memory_budget is None:
+        return None
+
+    return ResourceBudget(
+        memory_bytes = parse_bytes(args.memory_budget),
+        cpus = args.cpu_budget,
+        memory_per_input_byte = args.memory_per_input_byte,
+        min_job_memory = parse_bytes(args.min_job_memory),
+        job_cpus = args.job_cpus,
+    )
+
+def job_runner(args, client, image, logs, monitors, runner=None, staging=None):
+    # the staging area reports the end of the staged jobs, once their outputs are published
+    runner_monitors = staging.runner_monitors() if staging is not None else monitors
+
+    if runner is None and args.backend == "local":
+        runner = LocalBackend(args.local_modules_folder, args.local_python, logs, runner_monitors).run_job
+    elif runner is None:
+        runner = lambda job: run_job(client, image(job) if callable(image) else image, job, logs, runner_monitors)
+
+    # run the jobs against a copy of their inputs in the scratch folder of the run
+    if staging is not None:
+        runner = staging.wrap(runner)
+
+    # run again the jobs failed on transient Docker API errors
+    return retry_transient(runner, args.retries, args.retry_backoff)
+
+def execute_recovering_jobs(args, runtime, jobs, logs, monitors, max_workers=None, staging=None):
+    image = runtime.image(args.docker_image)
+    runner = job_runner(args, runtime.client, image, logs, monitors, staging=staging)
+
+    def execute(jobs, max_workers):
+        return execute_jobs(runtime.client, image, jobs, max_workers, runner=runner, logs=logs, monitors=monitors)
+
+    # reschedule the OOM killed jobs with more memory and less concurrent containers
+    return execute_with_oom_recovery(jobs, execute, max_workers or args.max_workers, args.oom_retries, args.oom_memory_factor)
+
+def execute_scheduled_stage_jobs(args, runtime, jobs, logs, monitors, on_result=None, runner=None, staging=None):
+    budget = resource_budget(args)
+    image = runtime.image(args.docker_image)
+    runner = job_runner(args, runtime.client, image, logs, monitors, runner, staging)
+
+    def execute(jobs, max_workers):
+        if budget is None:
+            return execute_jobs(runtime.client, image, jobs, max_workers, on_result=on_result, runner=runner, logs=logs, monitors=monitors)
+
+        # order the jobs by size and pack them under the resource budget
+        return execute_scheduled_jobs(runtime.client, image, jobs, budget, max_workers, on_result=on_result, runner=runner, logs=logs, monitors=monitors)
+
+    # reschedule the OOM killed jobs with more memory and less concurrent containers
+    return execute_with_oom_recovery(jobs, execute, args.max_workers, args.oom_retries, args.oom_memory_factor)
+
+def execute_dispatched_jobs(args, hosts, jobs, logs, monitors, on_result=None):
+    if args.batch or args.memory_budget is not None or args.scratch_folder is not None:
+        raise Exception("The docker hosts dispatcher is not available with batch, memory-budget or scratch-folder")
+
+    def host_runner(host, runtime):
+        image = runtime.image(args.docker_image)
+
+        # run each job with the dataset volumes mapped to the host dataset folder
+        runner = lambda job: run_job(runtime.client, image, host_job(job, args.dataset_folder, host), logs, monitors)
+
+        return job_runner(args, runtime.client, image, logs, monitors, runner)
+
+    runners = [host_runner(host, runtime) for host, runtime in hosts]
+    dispatcher = HostDispatcher([host for host, _ in hosts], runners)
+
+    def execute(jobs, max_workers):
+        return dispatcher.run(jobs, max_workers, on_result=on_result, monitors=monitors)
+
+    # reschedule the OOM killed jobs with more memory and less concurrent containers
+    return execute_with_oom_recovery(jobs, execute, dispatcher.capacity, args.oom_retries, args.oom_memory_factor)
+
+def execute_batch_jobs(args, runtime, jobs, logs, monitors, on_result=None, hosts=(), staging=None):
+    if hosts:
+        return execute_dispatched_jobs(args, hosts, jobs, logs, monitors, on_result=on_result)
+
+    if not args.batch or len(jobs) == 0:
+        return execute_scheduled_stage_jobs(args, runtime, jobs, logs, monitors, on_result=on_result, staging=staging)
+
+    if args.backend == "local" or args.scratch_folder is not None:
+        raise Exception("The batch worker is not available with the local backend or scratch-folder")
+
+    # start one worker container for all jobs and execute each job inside it
+    with BatchWorker(runtime.client, runtime.image(args.docker_image), args.dataset_folder, logs, monitors) as worker:
+        return execute_scheduled_stage_jobs(args, runtime, jobs, logs, monitors, on_result=on_result, runner=worker.run_job)
+
+def execute_stage_jobs(args, runtime, jobs, logs, monitors, hosts=(), staging=None):
+    if not args.incremental:
+        return execute_batch_jobs(args, runtime, jobs, logs, monitors, hosts=hosts, staging=staging)
+
+    # load the manifest with the jobs executed in previous runs
+    manifest_path = args.manifest_file or os.path.join(args.dataset_folder, MANIFEST_FILE_NAME)
+    manifest = Manifest(manifest_path, args.python_module)
+
+    image_digest = runtime.image(args.docker_image)
+    outdated_jobs, keys, skipped = select_outdated_jobs(manifest, jobs, image_digest, args.force, args.content_hash)
+
+    _logger.info(f"Skipping {skipped} up to date jobs, executing {len(outdated_jobs)} jobs")
+
+    # record every succeeded job as soon as it finishes to keep progress after an interruption
+    jobs_by_name = {job.name: job for job in outdated_jobs}
+
+    def record_result(result):
+        if result.succeeded:
+            manifest.record(jobs_by_name[result.name], keys[result.name])
+            manifest.save()
+
+    return execute_batch_jobs(args, runtime, outdated_jobs, logs, monitors, on_result=record_result, hosts=hosts, staging=staging)
+
+def start_runtimes(args, hosts):
+    images = run_images(args)
+
+    if args.backend == "local":
+        if hosts or args.local_modules_folder is None:
+            raise Exception("The local backend needs local-modules-folder and no docker-hosts")
+
+        return [LocalRuntime(args.local_modules_folder).start(images)]
+
+    if not hosts:
+        return [DockerRuntime(args.max_workers, args.pull).start(images)]
+
+    runtimes = [DockerRuntime(host.capacity, args.pull, host.url).start(images) for host in hosts]
+
+    # every host must run the very same images
+    for host, runtime in zip(hosts[1:], runtimes[1:]):
+        if runtime.images != runtimes[0].images:
+            raise Exception(f"Docker host {host.url} images differ from {hosts[0].url}: {runtime.images}")
+
+    return runtimes
+
+def run_images(args):
+    if args.python_module in ("pipeline", "sweep"):
+        return list(parse_stage_images(args.stage_images, args.docker_image).values())
+
+    return [args.docker_image]
+
+def selected_participants(args):
+    """Participant codes of --participants and --participants-file, None to select every participant"""
+    if args.participants is None and args.participants_file is None:
+        return None
+
+    participants = set(split_values(args.participants or ''))
+
+    if args.participants_file is not None:
+        if not os.path.isfile(args.participants_file):
+            raise Exception(f"Participants file {args.participants_file} not found")
+
+        participants.update(read_participant_codes(args.participants_file))
+
+    if not participants:
+        raise Exception("No participants selected")
+
+    return participants
+
+def selected_sensors(args):
+    """Sensor codes of --sensors, given by code like PI or by name like thigh, None to select every sensor"""
+    if args.sensors is None:
+        return None
+
+    names = {sensor.value: sensor.name for sensor in ML_Sensor}
+
+    sensors = set()
+    for value in split_values(args.sensors):
+        if value.upper() in ML_Sensor.__members__:
+            sensors.add(value.upper())
+        elif value.lower() in names:
+            sensors.add(names[value.lower()])
+        else:
+            raise Exception(f"Unknown sensor {value}, expected one of {', '.join(ML_Sensor.__members__)} or {', '.join(names)}")
+
+    if not sensors:
+        raise Exception("No sensors selected")
+
+    return sensors
+
+def scan_selected_dataset(args):
+    # do not walk the folders of the participants not selected
+    participants = selected_participants(args)
+    skip_directory = skip_unselected_participants(participants) if participants is not None else None
+
+    return build_dataset_index(args.dataset_folder, args.index_file, skip_directory)
+
+def select_stage_jobs(args, jobs):
+    participants = selected_participants(args)
+    sensors = selected_sensors(args)
+
+    if participants is None and sensors is None:
+        return jobs
+
+    selected = select_jobs(jobs, participants, sensors)
+    _logger.info(f"Selected {len(selected)} of {len(jobs)} jobs of the given participants and sensors")
+
+    return selected
+
+def refresh_catalog(args):
+    # the catalog covers every participant, even when only some are selected
+    catalog_path = args.catalog_file or os.path.join(args.dataset_folder, CATALOG_FILE_NAME)
+
+    return build_catalog(build_dataset_index(args.dataset_folder, args.index_file), catalog_path)
+
+def catalog_sensors(args):
+    # the windowed files are named by the sensor code, the aggregator is given the sensor names
+    sensors = split_values(args.ml_sensors or '')
+
+    return [sensor.name for sensor in ML_Sensor if sensor.value in sensors]
+
+def aggregator_catalog(args):
+    """Refresh the catalog and check the windowed outputs read by the aggregator
+
+    Returns:
+      Tuple[Catalog, List[str], List[str]]: the catalog, the participants (None for every one) and the sensor codes aggregated
+    """
+    catalog = refresh_catalog(args)
+    participants = read_participant_codes(participants_file_path()) or None
+    sensors = catalog_sensors(args)
+
+    problems = catalog.problems(participants, sensors)
+    for problem in problems:
+        _logger.error(problem)
+
+    if problems:
+        raise Exception(f"{len(problems)} windowed outputs missing or damaged, see the catalog {catalog.path}")
+
+    return catalog, participants, sensors
+
+def aggregator_shards(args):
+    # balance the shards by the windowed bytes of every participant when cataloged
+    weights = None
+    if args.use_catalog:
+        catalog, participants, sensors = aggregator_catalog(args)
+        weights = catalog.participant_bytes(participants, sensors)
+
+    return plan_shards(args, args.aggregator_shards, weights)
+
+def size_catalog_job(args, job, catalog, participants, sensors):
+    """Read the windowed files of some participants and limit the job memory by their array bytes"""
+    files = catalog.files(participants, sensors, [FileKind.WINDOWED.value])
+    job.inputs = sorted(files)
+
+    budget = resource_budget(args)
+    if budget is not None:
+        nbytes = sum(entry['nbytes'] for entry in files.values())
+        job.mem_limit = min(max(budget.min_job_memory, int(nbytes * budget.memory_per_input_byte)), budget.memory_bytes)
+
+    return job
+
+def aggregator_jobs(args, python_module):
+    if not args.use_catalog:
+        if args.aggregator_shards > 1:
+            return shard_jobs(args, plan_shards(args, args.aggregator_shards), python_module)
+
+        return [aggregator_job(args, python_module)]
+
+    catalog, participants, sensors = aggregator_catalog(args)
+
+    if args.aggregator_shards > 1:
+        shards = plan_shards(args, args.aggregator_shards, catalog.participant_bytes(participants, sensors))
+
+        return [
+            size_catalog_job(args, job, catalog, shard.participants, sensors)
+            for job, shard in zip(shard_jobs(args, shards, python_module), shards)
+        ]
+
+    return [size_catalog_job(args, aggregator_job(args, python_module), catalog, participants, sensors)]
+
+def plan_jobs(args, index=None):
+    """Plan the jobs of the step of args.python_module
+
+    Args:
+      args (argparse.Namespace): executor options
+      index (DatasetIndex): dataset index of the per file steps, scanned when not given
+
+    Returns:
+      List[Job]: the planned jobs
+    """
+    if args.python_module == "converter.py":
+        _logger.info("Filtering files ...")
+        input_files = filter_conveter_files(index or scan_selected_dataset(args))
+
+        return select_stage_jobs(args, converter_jobs(args, input_files, args.python_module))
+    elif args.python_module == "windowed.py":
+        _logger.info("Filtering files ...")
+        input_files = filter_windowed_files(index or scan_selected_dataset(args))
+
+        return select_stage_jobs(args, windowed_jobs(args, input_files, load_participants_not_time_off(), args.python_module))
+    elif args.python_module == "windowing_mets.py":
+        _logger.info("Filtering Mets files ...")
+        input_files = filter_windowed_mets_files(index or scan_selected_dataset(args))
+
+        return select_stage_jobs(args, windowed_mets_jobs(args, input_files, args.python_module))
+    elif args.python_module == "aggregator.py":
+        return aggregator_jobs(args, args.python_module)
+    elif args.python_module == "trainer.py":
+        if args.fan_out:
+            return fan_out_jobs(args, trainer_job, args.python_module)
+
+        return [trainer_job(args, args.python_module)]
+    elif args.python_module == "tester.py":
+        if args.fan_out:
+            return fan_out_jobs(args, tester_job, args.python_module)
+
+        return [tester_job(args, args.python_module)]
+    elif args.python_module == "sweep":
+        chains = sweep_chains(args, expand_sweep(load_sweep(args.sweep_file), args))
+
+        return [job for chain in chains for job in chain]
+    else:
+        raise Exception("Python module not implemented")
+
+def execute_catalog(args):
+    catalog = refresh_catalog(args)
+
+    # a truncated or unreadable output fails the step before the aggregator reads it
+    files = catalog.files()
+    damaged = sorted(path for path, entry in files.items() if entry['status'] != 'ok')
+    for path in damaged:
+        _logger.error(f"Npz file {path} is {files[path]['status']}")
+
+    results = [JobResult('catalog', not damaged, error=f"{len(damaged)} damaged npz files" if damaged else None)]
+    log_summary(results)
+
+    return results
+
+def execute_container_by_converter(args, runtime, jobs, logs=None, monitors=(), hosts=(), staging=None):
+    # Run the containers from volume and command
+    return execute_stage_jobs(args, runtime, jobs, logs, monitors, hosts, staging)
+
+def execute_container_by_windowed(args, runtime, jobs, logs=None, monitors=(), hosts=(), staging=None):
+    # Run the containers from volume and command
+    return execute_stage_jobs(args, runtime, jobs, logs, monitors, hosts, staging)
+
+def execute_container_by_windowed_mets(args, runtime, jobs, logs=None, monitors=(), hosts=(), staging=None):
+    # Run the containers from volume and command
+    return execute_stage_jobs(args, runtime, jobs, logs, monitors, hosts, staging)
+
+def execute_pipeline(args, runtime, logs=None, monitors=(), staging=None):
+    stages = parse_stages(args.pipeline_stages)
+
+    if any(stage in COHORT_STAGES for stage in stages) and (args.case_id is None or args.case_id_folder is None or args.ml_models is None):
+        raise Exception("The aggregator, trainer and tester stages need case-id, case-id-folder and ml-models")
+
+    images = {stage: runtime.image(image) for stage, image in parse_stage_images(args.stage_images, args.docker_image).items()}
+
+    runner = job_runner(args, runtime.client, lambda job: images[Stage(job.stage)], logs, monitors, staging=staging)
+
+    pipeline = Pipeline(args, runtime.client, stages, images, logs, monitors, runner, selected_participants(args), selected_sensors(args))
+
+    return pipeline.run(args.max_workers)
+
+def execute_sweep(args, runtime, logs=None, monitors=(), journal=None, run_id=None, staging=None):
+    if args.sweep_file is None or args.case_id_folder is None:
+        raise Exception("The sweep needs sweep-file and case-id-folder")
+
+    cases = expand_sweep(load_sweep(args.sweep_file), args)
+    chains = sweep_chains(args, cases)
+
+    _logger.info(f"Sweep of {len(cases)} cases ...")
+
+    # skip the jobs of every case already succeeded before the resumed run stopped
+    pending_chains, results = chains, []
+    if args.resume is not None:
+        pending_chains, results = resume_chains(journal, run_id, chains)
+
+    images = parse_stage_images(args.stage_images, args.docker_image)
+    image_for_job = lambda job: runtime.image(images[Stage(job.stage)])
+
+    # every case runs aggregator -> trainer -> tester, the cases run concurrently
+    runner = job_runner(args, runtime.client, image_for_job, logs, monitors, staging=staging)
+
+    if args.aggregator_cache_folder is not None:
+        runner = cached_aggregator_runner(args, cases, chains, images, runtime, runner, logs, monitors, staging)
+
+    results += execute_job_chains(runtime.client, pending_chains, image_for_job, args.max_workers, runner=runner, logs=logs, monitors=monitors)
+
+    comparison_path = os.path.join(args.case_id_folder, os.path.splitext(os.path.basename(args.sweep_file))[0] + '_comparison.csv')
+    missing = write_comparison(args, cases, chains, results, comparison_path)
+
+    # a comparison without the metrics of a tested case is useless, fail the sweep
+    if missing:
+        _logger.error(f"No metrics matching {args.sweep_metrics_files} found for the tested cases {', '.join(missing)}")
+        results.append(JobResult('sweep_comparison', False, error=f"No metrics found for {len(missing)} tested cases"))
+
+    return results
+
+def cached_aggregator_runner(args, cases, chains, images, runtime, runner, logs=None, monitors=(), staging=None):
+    """Wrap the sweep runner to execute the aggregator of every case through the aggregator cache
+
+    The cases aggregating the same participants, sensors and inputs share one
+    aggregation, the other cases copy its output. The sweep never shards its
+    aggregators.
+    """
+    case_arguments = {
+        chain[0].name: argparse.Namespace(**{
+            **vars(case_args(args, case)),
+            'docker_image': images[Stage.AGGREGATOR],
+            'aggregator_shards': 1,
+        })
+        for case, chain in zip(cases, chains)
+    }
+
+    def run(job):
+        if job.stage != Stage.AGGREGATOR.value:
+            return runner(job)
+
+        return execute_container_by_agregator(case_arguments[job.name], runtime, [job], logs, monitors, staging)[0]
+
+    return run
+
+def execute_container_by_agregator(args, runtime, jobs, logs=None, monitors=(), staging=None):
+    if args.aggregator_cache_folder is None:
+        return execute_aggregator_jobs(args, runtime, jobs, logs, monitors, staging)
+
+    cache = AggregatorCache(args.aggregator_cache_folder, parse_bytes(args.aggregator_cache_limit))
+
+    participants = read_participant_codes(participants_file_path())
+    input_files = aggregator_input_files(build_dataset_index(args.dataset_folder, args.index_file), participants)
+    # the shard slices, balanced by count or by cataloged bytes, change the merged output
+    shards, window_arrays = [], []
+    if args.aggregator_shards > 1:
+        shards = [shard.participants for shard in aggregator_shards(args)]
+        window_arrays = parse_window_arrays(args.aggregator_window_arrays)
+
+    key = aggregator_cache_key(participants, args.ml_sensors, args.ml_models, runtime.image(args.docker_image), input_files, args.content_hash, shards, window_arrays)
+
+    # the cases with the same key wait for the first one to aggregate and store it
+    with cache.key_lock(key):
+        return execute_cached_aggregation(args, runtime, jobs, cache, key, logs, monitors, staging)
+
+def execute_cached_aggregation(args, runtime, jobs, cache, key, logs=None, monitors=(), staging=None):
+    # copy the output of a previous case with the same inputs instead of aggregating again
+    if cache.materialize(key, args.case_id_folder, args.case_id):
+        results = [JobResult(job.name, True, status_code=0) for job in jobs]
+
+        # report the whole lifecycle, the journal only records the jobs it saw queued
+        for job, result in zip(jobs, results):
+            for monitor in monitors:
+                monitor.job_queued(job)
+                monitor.job_started(job, None)
+                monitor.job_finished(job, result)
+
+        return results
+
+    # only the case folder, the other cases of a sweep write to the case id folder at the same time
+    case_folder = os.path.join(args.case_id_folder, args.case_id)
+    before = snapshot_folder(case_folder)
+
+    results = execute_aggregator_jobs(args, runtime, jobs, logs, monitors, staging)
+
+    if jobs and all(result.succeeded for result in results):
+        files = [os.path.join(args.case_id, path) for path in changed_files(before, snapshot_folder(case_folder))]
+        cache.store(key, args.case_id_folder, args.case_id, files)
+
+    return results
+
+def execute_aggregator_jobs(args, runtime, jobs, logs=None, monitors=(), staging=None):
+    if args.aggregator_shards <= 1:
+        # Run the container
+        return execute_recovering_jobs(args, runtime, jobs, logs, monitors, max_workers=1, staging=staging)
+
+    # write the participants of the shards to execute, shards succeeded in a resumed run keep their output
+    shards = aggregator_shards(args)
+    job_names = {job.name for job in jobs}
+    prepare_shards([shard for job, shard in zip(shard_jobs(args, shards, args.python_module), shards) if job.name in job_names])
+
+    # Run one container per shard at the same time
+    results = execute_recovering_jobs(args, runtime, jobs, logs, monitors, max_workers=len(shards), staging=staging)
+
+    if all(result.succeeded for result in results):
+        merge_shards(shards, args.case_id_folder, parse_window_arrays(args.aggregator_window_arrays))
+    else:
+        _logger.error("Aggregator shards failed, the shard outputs are kept to resume the run")
+
+    return results
+
+def execute_container_by_trainer(args, runtime, jobs, logs=None, monitors=(), staging=None, journal=None, run_id=None):
+    if args.stream_tester:
+        return execute_streamed_trainer(args, runtime, jobs, logs, monitors, staging, journal, run_id)
+
+    # Run the containers, one per model and case id when fanned out
+    return execute_recovering_jobs(args, runtime, jobs, logs, monitors, staging=staging)
+
+def execute_streamed_trainer(args, runtime, jobs, logs=None, monitors=(), staging=None, journal=None, run_id=None):
+    if args.case_id_folder is None:
+        raise Exception("The streamed tester needs case-id-folder")
+
+    image = runtime.image(args.docker_image)
+    runner = job_runner(args, runtime.client, image, logs, monitors, staging=staging)
+
+    # one tester per case id and model, handed over the artifact of its model
+    handoffs = []
+    for case_id in (split_values(args.case_id) if args.fan_out else [args.case_id]):
+        for ml_model in split_values(args.ml_models):
+            # the models of a case id are trained by one job when not fanned out
+            if args.fan_out:
+                trainer_name = container_name(trainer_job(args, Stage.TRAINER.value, case_id, ml_model).name + '_' + ml_model)
+            else:
+                trainer_name = trainer_job(args, Stage.TRAINER.value, case_id).name
+
+            tester = tester_job(args, Stage.TESTER.value, case_id, ml_model)
+            tester.name = container_name(tester.name + '_' + ml_model)
+            # without a final artifact pattern the tester waits for its trainer to exit
+            pattern = None
+            if args.model_artifact_pattern is not None:
+                pattern = args.model_artifact_pattern.format(case_id=case_id, model=ml_model)
+
+            handoffs.append(TesterHandoff(tester, trainer_name, pattern))
+
+    # skip the testers succeeded before the resumed run stopped, as the trainers
+    results = []
+    if args.resume is not None:
+        testers, results = resume_jobs(journal, run_id, [handoff.tester for handoff in handoffs])
+        tester_names = {tester.name for tester in testers}
+        handoffs = [handoff for handoff in handoffs if handoff.tester.name in tester_names]
+
+    watcher = ArtifactWatcher(args.case_id_folder, args.artifact_stable_seconds, args.artifact_poll_interval)
+    try:
+        return results + execute_streamed_testers(
+            jobs, handoffs, watcher, runner, runner, args.max_workers, monitors, args.oom_retries, args.oom_memory_factor
+        )
+    finally:
+        watcher.close()
+
+def execute_container_by_tester(args, runtime, jobs, logs=None, monitors=(), staging=None):
+    # Run the containers, one per model and case id when fanned out
+    return execute_recovering_jobs(args, runtime, jobs, logs, monitors, staging=staging)
+
+class Executor:
+    """Scan, plan and run the executor steps from python
+
+    The command line is a thin wrapper of this class, so other python services
+    can embed the executor with the same options. Every run starts the docker
+    runtimes (or the local backend), the log multiplexer and the monitors,
+    journals its jobs and closes all of them when it ends. docker, pandas and
+    numpy are only imported by the steps using them.
+
+        executor = Executor.from_options(
+            '/mnt/data/input', 'ofertoio/uniovi-simur-wearablepermed-hmc:1.0.0',
+            participants='PMP1002', max_workers=8)
+
+        index = executor.scan()
+        jobs = executor.plan('converter.py', index)
+        results = executor.converter(jobs)
+
+    Args:
+      args (argparse.Namespace): executor options, as returned by parse_args
+    """
+    def __init__(self, args):
+        self.args = args
+
+    @classmethod
+    def from_options(cls, dataset_folder, docker_image, python_module="pipeline", **options):
+        """Executor with the command line defaults and the given options, named as their dest like max_workers
+
+        Returns:
+          Executor: the executor
+        """
+        args = parse_args(['--dataset-folder', dataset_folder, '--docker-image', docker_image, '--python-module', python_module])
+
+        for name, value in options.items():
+            if not hasattr(args, name):
+                raise Exception(f"Unknown executor option {name}")
+
+            setattr(args, name, value)
+
+        return cls(args)
+
+    def module_args(self, python_module=None):
+        # the options of another step share everything but the python module
+        if python_module is None:
+            return self.args
+
+        return argparse.Namespace(**{**vars(self.args), 'python_module': python_module})
+
+    def scan(self):
+        """Refresh the dataset index of the selected participants
+
+        Returns:
+          DatasetIndex: the dataset index
+        """
+        return scan_selected_dataset(self.args)
+
+    def plan(self, python_module=None, index=None):
+        """Plan the jobs of a step without executing them
+
+        Args:
+          python_module (str): step to plan, by default the one of the options
+          index (DatasetIndex): dataset index of the per file steps, scanned when not given
+
+        Returns:
+          List[Job]: the planned jobs
+        """
+        return plan_jobs(self.module_args(python_module), index)
+
+    def dry_run(self, python_module=None):
+        """Plan and log the jobs of a step, saving the plan to the plan file when given
+
+        Returns:
+          dict: the plan
+        """
+        args = self.module_args(python_module)
+
+        if args.python_module == "pipeline":
+            raise Exception("The pipeline plans its stages while running, dry run is not available")
+        if args.python_module == "catalog":
+            raise Exception("The catalog step only reads the npz headers and executes no job, dry run is not available")
+
+        plan = build_plan(args, plan_jobs(args))
+        log_plan(plan)
+
+        if args.plan_file is not None:
+            save_plan(plan, args.plan_file)
+
+        return plan
+
+    def run(self, python_module=None, jobs=None):
+        """Execute the jobs of a step, planned from the options when not given
+
+        Args:
+          python_module (str): step to execute, by default the one of the options
+          jobs (List[Job]): jobs planned before, not available for the pipeline and the sweep
+
+        Returns:
+          List[JobResult]: the job results, with the ones succeeded before a resumed run stopped
+        """
+        args = self.module_args(python_module)
+
+        if jobs is not None and args.python_module in ("pipeline", "sweep"):
+            raise Exception("The pipeline and the sweep plan their own jobs")
+        if args.python_module == "pipeline" and unsupported_options(args):
+            raise Exception(f"{', '.join(unsupported_options(args))} not available with the pipeline")
+
+        # the catalog only reads the npz headers, no container is needed
+        if args.python_module == "catalog":
+            return execute_catalog(args)
+
+        # resolve and pin the images up front, a missing image fails the run before scanning the dataset
+        docker_hosts = parse_docker_hosts(args.docker_hosts)
+        runtimes = start_runtimes(args, docker_hosts)
+
+        try:
+            # the first runtime runs the cohort steps, the participant steps are dispatched to every host
+            return self._journaled_run(args, jobs, runtimes[0], list(zip(docker_hosts, runtimes)))
+        finally:
+            for runtime in runtimes:
+                runtime.close()
+
+    def converter(self, jobs=None):
+        return self.run(Stage.CONVERTER.value, jobs)
+
+    def windowed(self, jobs=None):
+        return self.run(Stage.WINDOWED.value, jobs)
+
+    def windowing_mets(self, jobs=None):
+        return self.run(Stage.WINDOWED_METS.value, jobs)
+
+    def aggregator(self, jobs=None):
+        return self.run(Stage.AGGREGATOR.value, jobs)
+
+    def trainer(self, jobs=None):
+        return self.run(Stage.TRAINER.value, jobs)
+
+    def tester(self, jobs=None):
+        return self.run(Stage.TESTER.value, jobs)
+
+    def pipeline(self):
+        return self.run("pipeline")
+
+    def sweep(self):
+        return self.run("sweep")
+
+    def catalog(self):
+        return self.run("catalog")
+
+    def _journaled_run(self, args, jobs, runtime, hosts):
+        # journal the state of every job to resume the run after a failure or an interruption
+        journal = RunJournal(args.journal_file or default_journal_path(args.dataset_folder))
+
+        try:
+            if args.resume is not None:
+                if args.python_module == "pipeline":
+                    raise Exception("The pipeline plans its stages while running, resume is not available")
+
+                run_module = journal.run_module(args.resume)
+                if run_module is None:
+                    raise Exception(f"Run {args.resume} not found in the journal")
+                if run_module != args.python_module:
+                    raise Exception(f"Run {args.resume} executed {run_module}, not {args.python_module}")
+
+                run_id = args.resume
+            else:
+                run_id = args.run_id or new_run_id()
+
+            journal.start_run(run_id, args.python_module)
+
+            results = self._monitored_run(args, jobs, runtime, hosts, journal, run_id)
+
+            succeeded = log_summary(results, detailed=args.fan_out or args.python_module == "sweep")
+            journal.finish_run(run_id, succeeded)
+        finally:
+            journal.close()
+
+        return results
+
+    def _monitored_run(self, args, jobs, runtime, hosts, journal, run_id):
+        # collect the output of every job from one writer thread
+        logs = LogMultiplexer(args.log_folder, args.console_log_rate).start()
+
+        monitors = []
+        if args.profile_folder is not None:
+            profiler = Profiler(args.python_module)
+            monitors.append(profiler)
+
+        monitors.append(JournalMonitor(journal, run_id))
+
+        # live progress of every stage, logged and optionally served to prometheus
+        progress = ProgressMonitor(args.python_module, args.progress_interval).start()
+        monitors.append(progress)
+
+        metrics_server = None
+        if args.metrics_port is not None:
+            metrics_server = MetricsServer(progress, args.metrics_port).start()
+
+        # one scratch folder for the whole run, removed when it ends
+        staging = None
+        if args.scratch_folder is not None:
+            scratch_limit = parse_bytes(args.scratch_limit) if args.scratch_limit is not None else None
+            staging = StagingArea(args.scratch_folder, scratch_limit, monitors)
+
+        _logger.info(f"Run {run_id}, continue it after a failure with --resume {run_id}")
+
+        try:
+            with staging if staging is not None else nullcontext():
+                results = self._execute(args, jobs, runtime, hosts, logs, monitors, journal, run_id, staging)
+        finally:
+            progress.stop()
+            if metrics_server is not None:
+                metrics_server.stop()
+
+            # flush the job outputs still queued
+            logs.close()
+
+        if args.profile_folder is not None:
+            profiler.write(args.profile_folder)
+
+        return results
+
+    def _execute(self, args, jobs, runtime, hosts, logs, monitors, journal, run_id, staging=None):
+        if args.python_module == "pipeline":
+            _logger.info("Execute Docker Python modules pipeline ...")
+            return execute_pipeline(args, runtime, logs, monitors, staging)
+        elif args.python_module == "sweep":
+            _logger.info("Execute Docker Python modules sweep ...")
+            return execute_sweep(args, runtime, logs, monitors, journal, run_id, staging)
+
+        if jobs is None:
+            jobs = plan_jobs(args)
+
+            if args.plan_file is not None:
+                save_plan(build_plan(args, jobs), args.plan_file)
+
+        # execute only the jobs not succeeded before the resumed run stopped
+        previous_results = []
+        if args.resume is not None:
+            jobs, previous_results = resume_jobs(journal, run_id, jobs)
+
+        if args.python_module == "converter.py":
+            _logger.info("Execute Docker Python converter module ...")
+            results = execute_container_by_converter(args, runtime, jobs, logs, monitors, hosts, staging)
+        elif args.python_module == "windowed.py":
+            _logger.info("Execute Docker Python windowed module ...")
+            results = execute_container_by_windowed(args, runtime, jobs, logs, monitors, hosts, staging)
+        elif args.python_module == "windowing_mets.py":
+            _logger.info("Execute Docker Python windowed module ...")
+            results = execute_container_by_windowed_mets(args, runtime, jobs, logs, monitors, hosts, staging)
+        elif args.python_module == "aggregator.py":
+            _logger.info("Execute Docker Python aggregator module ...")
+            results = execute_container_by_agregator(args, runtime, jobs, logs, monitors, staging)
+        elif args.python_module == "trainer.py":
+            _logger.info("Execute Docker Python trainer module ...")
+            results = execute_container_by_trainer(args, runtime, jobs, logs, monitors, staging, journal, run_id)
+        elif args.python_module == "tester.py":
+            _logger.info("Execute Docker Python tester module ...")
+            results = execute_container_by_tester(args, runtime, jobs, logs, monitors, staging)
+        else:
+            raise Exception("Python module not implemented")
+
+        return previous_results + results
@@ -0,0 +1,271 @@
+import os
+import glob
+import time
+import ctypes
+import ctypes.util
+import select
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from jobs import JobResult, shutdown_interrupted
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+# inotify events of a file written, created or moved into a watched folder
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+
+class Inotify:
+    """Minimal linux inotify through libc, waking the watcher as soon as a local file changes
+
+    inotify does not see the writes of other hosts on network file systems, so
+    the watcher always polls too and inotify only shortens the wait.
+    """
+    def __init__(self, libc, fd):
+        self.libc = libc
+        self.fd = fd
+        self.watched = set()
+
+    @classmethod
+    def open(cls):
+        """The inotify instance, None when not available on this platform"""
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+
+        return cls(libc, fd) if fd >= 0 else None
+
+    def watch(self, folder):
+        if folder in self.watched:
+            return
+
+        if self.libc.inotify_add_watch(self.fd, os.fsencode(folder), IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) >= 0:
+            self.watched.add(folder)
+
+    def drain(self):
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        os.close(self.fd)
+
+class ArtifactWatcher:
+    """Watch a folder for complete model artifacts
+
+    An artifact is complete when it was written after the watcher started, so
+    the artifacts of a previous training are never taken, is not empty and its
+    size and mtime did not change for stable seconds. The watcher wakes up every
+    poll interval, when a file changes in the folder (with inotify) or when
+    wake is called.
+
+    Args:
+      folder (str): folder where the artifacts are written
+      stable_seconds (float): seconds an artifact must stay unchanged
+      poll_interval (float): maximum seconds between two checks
+    """
+    def __init__(self, folder, stable_seconds=10, poll_interval=5):
+        self.folder = folder
+        self.stable_seconds = stable_seconds
+        self.poll_interval = poll_interval
+        self.signatures = {}
+        self.started_at_ns = time.time_ns()
+        self.inotify = Inotify.open()
+        self.wake_read, self.wake_write = os.pipe()
+
+    def stable_artifacts(self, pattern):
+        """Paths of the complete artifacts matching a glob pattern relative to the folder"""
+        now = time.monotonic()
+
+        stable = []
+        for path in glob.glob(os.path.join(self.folder, pattern), recursive=True):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            if not os.path.isfile(path) or stat.st_mtime_ns < self.started_at_ns:
+                continue
+
+            signature = (stat.st_size, stat.st_mtime_ns)
+            previous = self.signatures.get(path)
+            if previous is None or previous[0] != signature:
+                self.signatures[path] = (signature, now)
+            elif stat.st_size > 0 and now - previous[1] >= self.stable_seconds:
+                stable.append(path)
+
+        return stable
+
+    def wake(self):
+        os.write(self.wake_write, b'x')
+
+    def wait(self):
+        readers = [self.wake_read]
+
+        if self.inotify is not None:
+            # watch the folders created since the last wait too
+            for root, _, _ in os.walk(self.folder):
+                self.inotify.watch(root)
+
+            readers.append(self.inotify.fd)
+
+        ready, _, _ = select.select(readers, [], [], self.poll_interval)
+
+        if self.wake_read in ready:
+            os.read(self.wake_read, 4096)
+        if self.inotify is not None and self.inotify.fd in ready:
+            self.inotify.drain()
+
+    def close(self):
+        os.close(self.wake_read)
+        os.close(self.wake_write)
+
+        if self.inotify is not None:
+            self.inotify.close()
+
+class TesterHandoff:
+    """A tester job waiting for the artifact of its model
+
+    Args:
+      tester (Job): tester job of one case id and model
+      trainer_name (str): name of the trainer job training the model
+      pattern (str): glob of the final model artifact relative to the watched folder, None to wait for the trainer
+    """
+    def __init__(self, tester, trainer_name, pattern):
+        self.tester = tester
+        self.trainer_name = trainer_name
+        self.pattern = pattern
+
+def execute_streamed_testers(trainers, handoffs, watcher, trainer_runner, tester_runner, max_workers=1, monitors=(), oom_retries=0, memory_factor=2.0):
+    """Execute the trainer jobs and every tester job as soon as the artifact of its model is complete
+
+    The pattern of a handoff must only match the final artifact of its model: a
+    checkpoint written every epoch is also stable between two epochs. A tester
+    without pattern, or whose artifact was not found, starts when its trainer
+    succeeds, as without streaming, and fails without running when its trainer fails. A
+    tester whose trainer is not executed starts at once. The testers run in
+    their own pool next to the trainers.
+
+    As with execute_with_oom_recovery, the OOM killed trainers run again once
+    the other trainers finished, with their memory limit multiplied by
+    memory_factor and half the concurrent trainers, while their testers wait.
+
+    Args:
+      trainers (List[Job]): trainer jobs
+      handoffs (List[TesterHandoff]): tester jobs and the artifacts they wait for
+      watcher (ArtifactWatcher): watcher of the case id folder
+      trainer_runner (Callable[[Job], JobResult]): executes one trainer job
+      tester_runner (Callable[[Job], JobResult]): executes one tester job
+      max_workers (int): maximum number of trainer containers and of tester containers running at the same time
+      monitors (List[JobMonitor]): observers notified when each job is queued, and when a skipped tester finishes
+      oom_retries (int): maximum number of rescheduling rounds of the OOM killed trainers
+      memory_factor (float): growth of the memory limit of the OOM killed trainers every round
+
+    Returns:
+      List[JobResult]: the last result of every job, in completion order
+    """
+    results = []
+    running = {}
+    finished_trainers = {}
+    trainer_names = {trainer.name for trainer in trainers}
+    pending = list(handoffs)
+    oom_trainers = []
+    oom_round = 0
+    trainer_workers = max(1, max_workers)
+
+    trainer_pools = [ThreadPoolExecutor(max_workers=trainer_workers)]
+    tester_pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+
+    def submit(pool, runner, job):
+        for monitor in monitors:
+            monitor.job_queued(job)
+
+        future = pool.submit(runner, job)
+        future.add_done_callback(lambda _: watcher.wake())
+        running[future] = job
+
+    try:
+        for trainer in trainers:
+            submit(trainer_pools[0], trainer_runner, trainer)
+
+        # the models trained before a resumed run stopped are tested right away
+        for handoff in list(pending):
+            if handoff.trainer_name not in trainer_names:
+                pending.remove(handoff)
+                submit(tester_pool, tester_runner, handoff.tester)
+
+        while running or pending:
+            done, _ = wait(running, timeout=0, return_when=FIRST_COMPLETED) if running else (set(), set())
+
+            for future in done:
+                job = running.pop(future)
+                result = future.result()
+
+                if job.name in trainer_names and result.oom_killed and oom_round < oom_retries:
+                    oom_trainers.append(job)
+                    continue
+
+                results.append(result)
+
+                if job.name in trainer_names:
+                    finished_trainers[job.name] = result
+
+            # reschedule the OOM killed trainers alone, with more memory and less concurrency
+            if oom_trainers and not any(job.name in trainer_names for job in running.values()):
+                oom_round += 1
+                trainer_workers = max(1, trainer_workers // 2)
+                trainer_pools.append(ThreadPoolExecutor(max_workers=trainer_workers))
+
+                _logger.warning(f"Rescheduling {len(oom_trainers)} OOM killed trainers with {trainer_workers} workers")
+
+                for job in oom_trainers:
+                    if job.mem_limit is not None:
+                        job.mem_limit = int(job.mem_limit * memory_factor)
+
+                    submit(trainer_pools[-1], trainer_runner, job)
+
+                oom_trainers = []
+
+            for handoff in list(pending):
+                trainer_result = finished_trainers.get(handoff.trainer_name)
+                artifacts = watcher.stable_artifacts(handoff.pattern) if handoff.pattern is not None else []
+
+                if artifacts:
+                    _logger.info(f"Model artifact {os.path.relpath(artifacts[0], watcher.folder)} complete, starting {handoff.tester.name}")
+                elif trainer_result is None:
+                    continue
+                elif not trainer_result.succeeded:
+                    _logger.error(f"Skipping {handoff.tester.name} after failed job {trainer_result.name}")
+                    result = JobResult(handoff.tester.name, False, error=f"Trainer {trainer_result.name} failed")
+                    results.append(result)
+                    pending.remove(handoff)
+
+                    # journal the skipped tester as failed, a resumed run executes it again
+                    for monitor in monitors:
+                        monitor.job_queued(handoff.tester)
+                        monitor.job_finished(handoff.tester, result)
+                    continue
+
+                pending.remove(handoff)
+                submit(tester_pool, tester_runner, handoff.tester)
+
+            if running or pending:
+                watcher.wait()
+    except KeyboardInterrupt:
+        shutdown_interrupted(*trainer_pools, tester_pool)
+        raise
+    finally:
+        for pool in trainer_pools + [tester_pool]:
+            pool.shutdown(wait=True)
+
+    return results
@@ -0,0 +1,188 @@
+import os
+import queue
+import logging
+import posixpath
+import threading
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from jobs import JobResult, running_jobs
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+@dataclass
+class DockerHost:
+    """A docker daemon the jobs can be dispatched to
+
+    Args:
+      url (str): docker endpoint, like unix:///var/run/docker.sock, tcp://node2:2376 or ssh://user@node3
+      capacity (int): maximum number of containers running at the same time on the host
+      dataset_folder (str): path of the shared dataset folder as seen by the host, None if the same
+    """
+    url: str
+    capacity: int = 1
+    dataset_folder: Optional[str] = None
+
+def parse_docker_hosts(text):
+    """Parse a comma separated list of <url>[=<capacity>[:<dataset folder>]] docker hosts
+
+    For example ``unix:///var/run/docker.sock=8,ssh://simur@node2=16:/mnt/data/input``
+    """
+    hosts = []
+    for item in (text or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+
+        url, separator, settings = item.rpartition('=')
+        if not separator:
+            hosts.append(DockerHost(item))
+            continue
+
+        capacity, _, dataset_folder = settings.partition(':')
+        hosts.append(DockerHost(url, int(capacity), dataset_folder or None))
+
+    return hosts
+
+def map_volumes(volumes, dataset_root, host_dataset_folder):
+    """Rebase the volumes inside the dataset root to the dataset folder of a host"""
+    if host_dataset_folder is None:
+        return volumes
+
+    mapped = {}
+    for path, bind in volumes.items():
+        relative_path = os.path.relpath(os.path.abspath(path), dataset_root)
+
+        if relative_path == os.curdir:
+            path = host_dataset_folder
+        elif not relative_path.startswith(os.pardir):
+            path = posixpath.join(host_dataset_folder, *relative_path.split(os.sep))
+
+        mapped[path] = bind
+
+    return mapped
+
+def host_job(job, dataset_root, host):
+    """Copy of a job with its volumes mapped to the dataset folder of a host"""
+    return replace(job, volumes=map_volumes(job.volumes, os.path.abspath(dataset_root), host.dataset_folder))
+
+class HostDispatcher:
+    """Spread jobs over several docker hosts with work stealing
+
+    The jobs are grouped by participant and every group is queued on the host
+    with the lowest load per capacity, so the files of a participant stay
+    together. Each host runs capacity workers taking jobs from the front of its
+    own queue, and a worker whose queue is empty steals from the back of the
+    most loaded queue, so a slow host never holds work the others could do.
+
+    Args:
+      hosts (List[DockerHost]): docker hosts
+      runners (List[Callable[[Job], JobResult]]): executes one job on each host
+    """
+    def __init__(self, hosts, runners):
+        self.hosts = hosts
+        self.runners = runners
+        self.capacity = sum(host.capacity for host in hosts)
+        self.lock = threading.Lock()
+        self.queues = []
+        self.stolen = 0
+
+    def _distribute(self, jobs):
+        groups = {}
+        for job in jobs:
+            groups.setdefault(job.participant or job.name, []).append(job)
+
+        self.queues = [deque() for _ in self.hosts]
+        for group in groups.values():
+            position = min(range(len(self.hosts)), key=lambda i: len(self.queues[i]) / self.hosts[i].capacity)
+            self.queues[position].extend(group)
+
+    def _next_job(self, position):
+        with self.lock:
+            if self.queues[position]:
+                return self.queues[position].popleft()
+
+            victim = max(range(len(self.queues)), key=lambda i: len(self.queues[i]))
+            if self.queues[victim]:
+                self.stolen += 1
+                return self.queues[victim].pop()
+
+            return None
+
+    def run(self, jobs, max_workers=None, on_result=None, monitors=()):
+        """Execute the jobs on all the hosts
+
+        Args:
+          jobs (List[Job]): jobs to be executed
+          max_workers (int): maximum number of containers running at the same time on all the hosts,
+              shared in proportion to the host capacities, by default the total capacity
+          on_result (Callable[[JobResult], None]): called from the calling thread as soon as each job finishes
+          monitors (List[JobMonitor]): observers notified when each job is queued
+
+        Returns:
+          List[JobResult]: one result per job, in completion order
+        """
+        for job in jobs:
+            for monitor in monitors:
+                monitor.job_queued(job)
+
+        self._distribute(jobs)
+        self.stolen = 0
+
+        scale = min(1.0, (max_workers or self.capacity) / self.capacity)
+        finished = queue.SimpleQueue()
+        stop = threading.Event()
+
+        def work(position):
+            while not stop.is_set():
+                job = self._next_job(position)
+                if job is None:
+                    return
+
+                try:
+                    result = self.runners[position](job)
+                except Exception as e:
+                    _logger.error(f"Unexpected error in {job.name} on {self.hosts[position].url}: {e}")
+                    result = JobResult(job.name, False, error=str(e))
+
+                finished.put(result)
+
+        threads = []
+        for position, host in enumerate(self.hosts):
+            for _ in range(max(1, round(host.capacity * scale))):
+                thread = threading.Thread(target=work, args=(position,), name=f"host-{position}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        results = []
+        try:
+            while len(results) < len(jobs):
+                result = finished.get()
+                results.append(result)
+
+                if on_result is not None:
+                    on_result(result)
+        except KeyboardInterrupt:
+            # do not start queued jobs, running jobs are killed and still clean up their containers
+            _logger.warning("Interrupted, killing running jobs and cancelling pending jobs ...")
+            running_jobs.kill_all()
+            stop.set()
+            try:
+                for thread in threads:
+                    thread.join()
+            finally:
+                running_jobs.reset()
+            raise
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        _logger.info(f"Dispatched {len(jobs)} jobs to {len(self.hosts)} docker hosts, {self.stolen} stolen")
+
+        return results
@@ -0,0 +1,456 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field
+from typing import Optional
+
+from logstream import open_job_log
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+CONTAINER_USER = '1000:1000'
+CONTAINER_WORKING_DIR = '/app'
+
+# exit code of a container killed with SIGKILL, what the kernel OOM killer sends
+OOM_EXIT_CODE = 137
+
+@dataclass
+class Job:
+    """A single container execution: container name, command and volume mapping
+
+    inputs and outputs are host paths read and written by the job, used to
+    decide if the job is up to date. participant and sensor identify the
+    data processed by per file jobs and stage the python module executed.
+    mem_limit (bytes) and nano_cpus limit the job container when set.
+    """
+    name: str
+    command: list
+    volumes: dict
+    inputs: list = field(default_factory=list)
+    outputs: list = field(default_factory=list)
+    participant: Optional[str] = None
+    sensor: Optional[str] = None
+    stage: Optional[str] = None
+    mem_limit: Optional[int] = None
+    nano_cpus: Optional[int] = None
+
+@dataclass
+class JobResult:
+    """Outcome of one job once its container has exited and been removed
+
+    oom_killed is set when the container was killed by the OOM killer and
+    transient when the job failed on a Docker API error worth retrying.
+    """
+    name: str
+    succeeded: bool
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+    oom_killed: bool = False
+    transient: bool = False
+
+class JobMonitor:
+    """Observer of the job lifecycle, every method is called from the thread running the job"""
+    def job_queued(self, job):
+        pass
+
+    def job_started(self, job, container):
+        pass
+
+    def job_finished(self, job, result):
+        pass
+
+class RunningJobs:
+    """Containers and processes of the running jobs, killed when the run is interrupted
+
+    Every handle has a kill method, like a docker container or a subprocess. A
+    handle registered once the run is interrupted is killed at once, so a job
+    starting while the pool shuts down does not run to completion.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.handles = {}
+        self.interrupted = False
+
+    def add(self, name, handle):
+        with self.lock:
+            self.handles[name] = handle
+            interrupted = self.interrupted
+
+        if interrupted:
+            self._kill(name, handle)
+
+    def remove(self, name):
+        with self.lock:
+            self.handles.pop(name, None)
+
+    def kill_all(self):
+        with self.lock:
+            self.interrupted = True
+            handles = list(self.handles.items())
+
+        if handles:
+            _logger.warning(f"Killing {len(handles)} running jobs ...")
+
+        for name, handle in handles:
+            self._kill(name, handle)
+
+    def reset(self):
+        with self.lock:
+            self.interrupted = False
+
+    def _kill(self, name, handle):
+        # the job may have exited meanwhile
+        try:
+            handle.kill()
+        except Exception as e:
+            _logger.debug(f"Job {name} could not be killed: {e}")
+
+# the running jobs of every pool of the process
+running_jobs = RunningJobs()
+
+def shutdown_interrupted(*pools):
+    """Kill the running jobs, cancel the queued ones and wait for the running ones to clean up"""
+    _logger.warning("Interrupted, killing running jobs and cancelling pending jobs ...")
+    running_jobs.kill_all()
+    try:
+        for pool in pools:
+            pool.shutdown(wait=True, cancel_futures=True)
+    finally:
+        running_jobs.reset()
+
+def parse_participant_sensor(file_name):
+    """Get the participant code and sensor from a PMP file name like PMP1002_W1_PI.BIN
+
+    Returns:
+      Tuple[str, str]: participant code and sensor, None values when the name has no such tokens
+    """
+    tokens = os.path.splitext(file_name)[0].split('_')
+
+    if len(tokens) < 3 or not tokens[0].startswith('PMP'):
+        return None, None
+
+    return tokens[0], tokens[2]
+
+def iter_log_lines(stream):
+    """Split a raw docker log stream into decoded text lines
+
+    Docker returns arbitrary byte chunks, so a line can be split between two
+    chunks and a chunk can hold several lines.
+    """
+    buffer = b''
+    for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            yield line.decode(errors='replace').rstrip('\r')
+
+    if buffer:
+        yield buffer.decode(errors='replace').rstrip('\r')
+
+def is_transient_error(e):
+    """Check if a Docker API error is worth retrying: daemon side errors, timeouts and lost connections"""
+    # docker and requests are only loaded by the runs talking to a docker daemon
+    import docker
+    import requests
+
+    if isinstance(e, docker.errors.APIError):
+        return e.is_server_error()
+
+    return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+def container_oom_killed(container, status_code):
+    """Check if an exited container was killed by the OOM killer"""
+    if status_code == OOM_EXIT_CODE:
+        return True
+
+    try:
+        container.reload()
+        return container.attrs.get('State', {}).get('OOMKilled', False)
+    except Exception:
+        return False
+
+def run_job(client, image, job, logs=None, monitors=()):
+    """Run one job container, stream its logs and always remove it
+
+    Args:
+      client (docker.DockerClient): docker client shared by all jobs
+      image (str): docker image used to create the container
+      job (Job): job to be executed
+      logs (LogMultiplexer): multiplexer receiving the job output, None to log it directly
+      monitors (List[JobMonitor]): observers notified when the job starts and finishes
+
+    Returns:
+      JobResult: the job outcome, failed when the container exits with a non zero code
+    """
+    import docker
+
+    _logger.info(f"Executing job: {job.name}")
+
+    container = None
+    output = open_job_log(logs, job.name)
+    result = None
+
+    # apply only the container limits set for the job
+    limits = {}
+    if job.mem_limit is not None:
+        limits['mem_limit'] = job.mem_limit
+    if job.nano_cpus is not None:
+        limits['nano_cpus'] = job.nano_cpus
+
+    try:
+        container = client.containers.run(
+            name = job.name,
+            image = image,
+            user = CONTAINER_USER,
+            command = job.command,
+            volumes = job.volumes,
+            working_dir = CONTAINER_WORKING_DIR,
+            detach = True,
+            stdout = True,
+            stderr = True,
+            **limits,
+        )
+        running_jobs.add(job.name, container)
+
+        for monitor in monitors:
+            monitor.job_started(job, container)
+
+        # stream logs live to the job output
+        for line in iter_log_lines(container.logs(stream=True, follow=True)):
+            output.write(line)
+
+        # a detached container never raises ContainerError, so check its exit code
+        status_code = container.wait().get('StatusCode', -1)
+
+        if status_code != 0:
+            # a container killed on interrupt exits with the OOM exit code too
+            oom_killed = not running_jobs.interrupted and container_oom_killed(container, status_code)
+
+            _logger.error(f"Container {job.name} failed with exit code {status_code}{' (OOM killed)' if oom_killed else ''}")
+            result = JobResult(job.name, False, status_code=status_code, oom_killed=oom_killed)
+        else:
+            result = JobResult(job.name, True, status_code=status_code)
+    except docker.errors.ImageNotFound:
+        _logger.error(f"Image not found: {image}")
+        result = JobResult(job.name, False, error="Image not found")
+    except Exception as e:
+        _logger.error(f"Unexpected error in {job.name}: {e}")
+        result = JobResult(job.name, False, error=str(e), transient=is_transient_error(e))
+    finally:
+        output.close()
+
+        if result is not None:
+            for monitor in monitors:
+                monitor.job_finished(job, result)
+
+        # remove the container and volume attached
+        if container is not None:
+            running_jobs.remove(job.name)
+            try:
+                container.remove(v=True, force=True)
+            except Exception as e:
+                _logger.warning(f"Container {job.name} could not be removed: {e}")
+
+    return result
+
+def retry_transient(runner, retries=3, backoff=2.0):
+    """Wrap a job runner to run again the jobs failed on transient Docker API errors
+
+    The wait before each new attempt doubles from backoff seconds.
+
+    Args:
+      runner (Callable[[Job], JobResult]): executes one job
+      retries (int): maximum number of new attempts of a job
+      backoff (float): seconds to wait before the first new attempt
+
+    Returns:
+      Callable[[Job], JobResult]: the retrying runner
+    """
+    def run(job):
+        attempt = 0
+        while True:
+            result = runner(job)
+
+            if not result.transient or attempt >= retries:
+                return result
+
+            delay = backoff * 2**attempt
+            attempt += 1
+
+            _logger.warning(f"Transient error in {job.name}, retry {attempt} of {retries} in {delay:.1f}s: {result.error}")
+            time.sleep(delay)
+
+    return run
+
+def execute_with_oom_recovery(jobs, execute, max_workers=1, oom_retries=2, memory_factor=2.0):
+    """Execute jobs and reschedule the OOM killed ones with more memory and less concurrency
+
+    Every round the OOM killed jobs get their memory limit, when set, multiplied
+    by memory_factor and run again with half the concurrent workers, so they no
+    longer compete for the host memory.
+
+    Args:
+      jobs (List[Job]): jobs to be executed
+      execute (Callable[[List[Job], int], List[JobResult]]): executes jobs with a maximum of concurrent workers
+      max_workers (int): maximum number of containers running at the same time in the first round
+      oom_retries (int): maximum number of rescheduling rounds
+      memory_factor (float): growth of the memory limit of the OOM killed jobs every round
+
+    Returns:
+      List[JobResult]: the last result of every job
+    """
+    jobs_by_name = {job.name: job for job in jobs}
+    results = {result.name: result for result in execute(jobs, max_workers)}
+
+    for _ in range(oom_retries):
+        oom_jobs = [jobs_by_name[name] for name, result in results.items() if result.oom_killed and name in jobs_by_name]
+        if not oom_jobs:
+            break
+
+        max_workers = max(1, max_workers // 2)
+        for job in oom_jobs:
+            if job.mem_limit is not None:
+                job.mem_limit = int(job.mem_limit * memory_factor)
+
+        _logger.warning(f"Rescheduling {len(oom_jobs)} OOM killed jobs with {max_workers} workers")
+
+        results.update((result.name, result) for result in execute(oom_jobs, max_workers))
+
+    return list(results.values())
+
+def execute_jobs(client, image, jobs, max_workers=1, on_result=None, runner=None, logs=None, monitors=()):
+    """Execute jobs keeping up to max_workers containers running at once
+
+    Args:
+      client (docker.DockerClient): docker client shared by all jobs
+      image (str): docker image used to create the containers
+      jobs (List[Job]): jobs to be executed
+      max_workers (int): maximum number of containers running at the same time
+      on_result (Callable[[JobResult], None]): called from the calling thread
+          as soon as each job finishes
+      runner (Callable[[Job], JobResult]): executes one job, by default a new
+          container per job with run_job
+      logs (LogMultiplexer): multiplexer receiving the output of the default runner
+      monitors (List[JobMonitor]): observers notified when each job is queued,
+          and when it starts and finishes with the default runner
+
+    Returns:
+      List[JobResult]: one result per job, in completion order
+    """
+    if runner is None:
+        runner = lambda job: run_job(client, image, job, logs, monitors)
+
+    results = []
+
+    pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        futures = []
+        for job in jobs:
+            for monitor in monitors:
+                monitor.job_queued(job)
+
+            futures.append(pool.submit(runner, job))
+
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+
+            if on_result is not None:
+                on_result(result)
+    except KeyboardInterrupt:
+        # do not start queued jobs, running jobs are killed and still clean up their containers
+        shutdown_interrupted(pool)
+        raise
+    finally:
+        pool.shutdown(wait=True)
+
+    return results
+
+def execute_job_chains(client, chains, image_for_job, max_workers=1, on_result=None, runner=None, logs=None, monitors=()):
+    """Execute chains of dependent jobs concurrently
+
+    The jobs of a chain run one after the other, each one only after the previous
+    one succeeded, while up to max_workers jobs of different chains run at once.
+
+    Args:
+      client (docker.DockerClient): docker client shared by all jobs
+      chains (List[List[Job]]): chains of jobs
+      image_for_job (Callable[[Job], str]): docker image of each job
+      max_workers (int): maximum number of containers running at the same time
+      on_result (Callable[[JobResult], None]): called as soon as each job finishes
+      runner (Callable[[Job], JobResult]): executes one job, by default a new
+          container per job with run_job
+      logs (LogMultiplexer): multiplexer receiving the output of the default runner
+      monitors (List[JobMonitor]): observers of every job
+
+    Returns:
+      List[JobResult]: one result per executed job, in completion order
+    """
+    if runner is None:
+        runner = lambda job: run_job(client, image_for_job(job), job, logs, monitors)
+
+    results = []
+    running = {}
+
+    pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+
+    def submit(chain, position):
+        job = chain[position]
+        for monitor in monitors:
+            monitor.job_queued(job)
+
+        running[pool.submit(runner, job)] = (chain, position)
+
+    try:
+        for chain in chains:
+            if chain:
+                submit(chain, 0)
+
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                chain, position = running.pop(future)
+                result = future.result()
+                results.append(result)
+
+                if on_result is not None:
+                    on_result(result)
+
+                if position + 1 < len(chain):
+                    if result.succeeded:
+                        submit(chain, position + 1)
+                    else:
+                        _logger.error(f"Skipping {len(chain) - position - 1} jobs after failed job {result.name}")
+    except KeyboardInterrupt:
+        shutdown_interrupted(pool)
+        raise
+    finally:
+        pool.shutdown(wait=True)
+
+    return results
+
+def log_summary(results, detailed=False):
+    """Log how many jobs succeeded and failed, and the status of every job when detailed
+
+    Returns:
+      bool: True when every job succeeded
+    """
+    failed = [result for result in results if not result.succeeded]
+
+    _logger.info(f"Jobs summary: {len(results) - len(failed)} succeeded, {len(failed)} failed")
+
+    if detailed:
+        for result in sorted(results, key=lambda result: result.name):
+            _logger.info(f"Job {result.name}: {'succeeded' if result.succeeded else 'failed'}")
+
+    for result in failed:
+        _logger.error(f"Failed job: {result.name} (exit code: {result.status_code}, error: {result.error})")
+
+    return len(failed) == 0
@@ -0,0 +1,198 @@
+import os
+import time
+import uuid
+import hashlib
+import sqlite3
+import logging
+import threading
+
+from jobs import JobMonitor, JobResult
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+JOURNAL_FOLDER_NAME = 'simur-executor'
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+OOM_KILLED = 'oom_killed'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    python_module TEXT NOT NULL,
+    state TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    run_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    stage TEXT,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    status_code INTEGER,
+    error TEXT,
+    mem_limit INTEGER,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run_id, name)
+);
+'''
+
+def default_journal_path(dataset_folder):
+    """Local journal of a dataset folder, inside the user state directory
+
+    The dataset folder is usually on NFS, where SQLite locking is not
+    reliable, so the journal lives on the local disk, one per dataset folder.
+    """
+    state_home = os.environ.get('XDG_STATE_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'state')
+    digest = hashlib.sha256(os.path.abspath(dataset_folder).encode()).hexdigest()[:16]
+
+    return os.path.join(state_home, JOURNAL_FOLDER_NAME, f"journal_{digest}.sqlite")
+
+def new_run_id():
+    """Sortable and unique run id like 20240501-101500-1a2b3c"""
+    return time.strftime('%Y%m%d-%H%M%S') + '-' + uuid.uuid4().hex[:6]
+
+class RunJournal:
+    """SQLite journal with the state of every job of every run
+
+    Every state change is committed at once, so after an interruption or a crash
+    the journal tells which jobs of the run still have to be executed. The
+    connection is shared by the job threads and guarded by a lock.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        # the default rollback journal, WAL needs shared memory that network file systems do not provide
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+
+    def _execute(self, sql, parameters=()):
+        with self.lock, self.connection:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def start_run(self, run_id, python_module):
+        now = time.time()
+        self._execute(
+            'INSERT INTO runs VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (run_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at',
+            (run_id, python_module, RUNNING, now, now))
+
+    def finish_run(self, run_id, succeeded):
+        self._execute('UPDATE runs SET state = ?, updated_at = ? WHERE run_id = ?', (SUCCEEDED if succeeded else FAILED, time.time(), run_id))
+
+    def run_module(self, run_id):
+        """Python module of a journaled run, None if the run does not exist"""
+        rows = self._execute('SELECT python_module FROM runs WHERE run_id = ?', (run_id,))
+
+        return rows[0][0] if rows else None
+
+    def job_queued(self, run_id, job):
+        self._execute(
+            'INSERT INTO jobs (run_id, name, stage, state, mem_limit, updated_at) VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (run_id, name) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at',
+            (run_id, job.name, job.stage, QUEUED, job.mem_limit, time.time()))
+
+    def job_started(self, run_id, job):
+        self._execute(
+            'UPDATE jobs SET state = ?, attempts = attempts + 1, mem_limit = ?, updated_at = ? WHERE run_id = ? AND name = ?',
+            (RUNNING, job.mem_limit, time.time(), run_id, job.name))
+
+    def job_finished(self, run_id, job, result):
+        if result.succeeded:
+            state = SUCCEEDED
+        elif result.oom_killed:
+            state = OOM_KILLED
+        else:
+            state = FAILED
+
+        self._execute(
+            'UPDATE jobs SET state = ?, status_code = ?, error = ?, mem_limit = ?, updated_at = ? WHERE run_id = ? AND name = ?',
+            (state, result.status_code, result.error, job.mem_limit, time.time(), run_id, job.name))
+
+    def jobs(self, run_id):
+        """Journaled jobs of a run
+
+        Returns:
+          Dict[str, dict]: ``{"<job name>": {"state": ..., "attempts": ..., "mem_limit": ...}}``
+        """
+        rows = self._execute('SELECT name, state, attempts, mem_limit FROM jobs WHERE run_id = ?', (run_id,))
+
+        return {name: {'state': state, 'attempts': attempts, 'mem_limit': mem_limit} for name, state, attempts, mem_limit in rows}
+
+    def close(self):
+        self.connection.close()
+
+class JournalMonitor(JobMonitor):
+    """Record the lifecycle of every job of a run in the journal"""
+    def __init__(self, journal, run_id):
+        self.journal = journal
+        self.run_id = run_id
+
+    def job_queued(self, job):
+        self.journal.job_queued(self.run_id, job)
+
+    def job_started(self, job, container):
+        self.journal.job_started(self.run_id, job)
+
+    def job_finished(self, job, result):
+        self.journal.job_finished(self.run_id, job, result)
+
+def resume_jobs(journal, run_id, jobs):
+    """Select the jobs of a resumed run that did not succeed yet
+
+    The jobs keep the memory limit journaled for them, so the jobs OOM killed
+    before resume with the raised limit.
+
+    Returns:
+      Tuple[List[Job], List[JobResult]]: the jobs to execute and the results of the succeeded ones
+    """
+    journaled = journal.jobs(run_id)
+
+    pending = []
+    succeeded = []
+    for job in jobs:
+        entry = journaled.get(job.name)
+
+        if entry is not None and entry['state'] == SUCCEEDED:
+            succeeded.append(JobResult(job.name, True, status_code=0))
+            continue
+
+        if entry is not None and entry['mem_limit'] is not None:
+            job.mem_limit = max(job.mem_limit or 0, entry['mem_limit'])
+
+        pending.append(job)
+
+    _logger.info(f"Resuming run {run_id}: {len(succeeded)} jobs already succeeded, executing {len(pending)} jobs")
+
+    return pending, succeeded
+
+def resume_chains(journal, run_id, chains):
+    """Drop the jobs of a resumed run that already succeeded at the start of each chain
+
+    Returns:
+      Tuple[List[List[Job]], List[JobResult]]: the chains left to execute and the results of the succeeded jobs
+    """
+    journaled = journal.jobs(run_id)
+
+    pending = []
+    succeeded = []
+    for chain in chains:
+        position = 0
+        while position < len(chain) and journaled.get(chain[position].name, {}).get('state') == SUCCEEDED:
+            succeeded.append(JobResult(chain[position].name, True, status_code=0))
+            position += 1
+
+        pending.append(chain[position:])
+
+    _logger.info(f"Resuming run {run_id}: {len(succeeded)} jobs already succeeded")
+
+    return pending, succeeded
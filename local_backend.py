@@ -0,0 +1,148 @@
+import os
+import signal
+import logging
+import posixpath
+import subprocess
+
+from jobs import CONTAINER_WORKING_DIR, JobResult, running_jobs
+from logstream import open_job_log
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+def host_path(container_path, volumes):
+    """Map a path seen inside the job container to the host path of its volume, None if not mounted
+
+    Relative paths are resolved from the container working directory, as the
+    container command sees them. The host path is absolute, as docker resolves
+    the volumes, since the local process runs from the modules folder instead
+    of the executor working directory.
+    """
+    if not posixpath.isabs(container_path):
+        container_path = posixpath.join(CONTAINER_WORKING_DIR, container_path)
+
+    container_path = posixpath.normpath(container_path)
+
+    # the deepest mount point wins, like in the container
+    for path, bind in sorted(volumes.items(), key=lambda volume: len(volume[1]['bind']), reverse=True):
+        mount_point = bind['bind']
+
+        if container_path == mount_point:
+            return os.path.abspath(path)
+        if container_path.startswith(mount_point + '/'):
+            return os.path.join(os.path.abspath(path), *container_path[len(mount_point) + 1:].split('/'))
+
+    return None
+
+def local_command(job, modules_folder, python):
+    """Translate the container command of a job to a local command line
+
+    The python module is taken from the modules folder and every argument that
+    is a path inside a job volume is mapped to its host path, so both backends
+    execute the same command line on the same files.
+    """
+    _, python_module, *arguments = job.command
+
+    command = [python, os.path.join(modules_folder, python_module)]
+    for argument in arguments:
+        path = None if argument.startswith('-') else host_path(argument, job.volumes)
+        command.append(argument if path is None else path)
+
+    return command
+
+class LocalRuntime:
+    """Runtime of the local backend: no docker daemon, the python modules folder stands for the image
+
+    Args:
+      modules_folder (str): folder with a local copy of the HMC and ML python modules
+    """
+    def __init__(self, modules_folder):
+        self.client = None
+        self.modules_folder = os.path.abspath(modules_folder)
+
+    def start(self, images):
+        if not os.path.isdir(self.modules_folder):
+            raise Exception(f"Python modules folder {self.modules_folder} not found")
+
+        return self
+
+    def image(self, image):
+        # the modules folder identifies the code run by the jobs, for the manifest too
+        return 'local:' + self.modules_folder
+
+    def close(self):
+        pass
+
+class LocalBackend:
+    """Execute every job as a local subprocess instead of a container
+
+    Args:
+      modules_folder (str): folder with a local copy of the HMC and ML python modules
+      python (str): python interpreter running the modules
+      logs (LogMultiplexer): multiplexer receiving the job outputs, None to log them directly
+      monitors (List[JobMonitor]): observers notified when each job starts and finishes
+    """
+    def __init__(self, modules_folder, python, logs=None, monitors=()):
+        self.modules_folder = os.path.abspath(modules_folder)
+        self.python = python
+        self.logs = logs
+        self.monitors = monitors
+
+    def run_job(self, job):
+        """Run one job subprocess and stream its output
+
+        Returns:
+          JobResult: the job outcome, failed when the process exits with a non zero code
+        """
+        _logger.info(f"Executing job: {job.name}")
+
+        output = open_job_log(self.logs, job.name)
+        result = None
+
+        try:
+            command = local_command(job, self.modules_folder, self.python)
+
+            # the modules folder is the working directory, as /app in the container
+            process = subprocess.Popen(
+                command,
+                cwd = self.modules_folder,
+                stdout = subprocess.PIPE,
+                stderr = subprocess.STDOUT,
+                text = True,
+                errors = 'replace',
+            )
+            running_jobs.add(job.name, process)
+
+            # there is no container to sample stats from
+            for monitor in self.monitors:
+                monitor.job_started(job, None)
+
+            # stream logs live to the job output
+            for line in process.stdout:
+                output.write(line.rstrip('\r\n'))
+
+            status_code = process.wait()
+
+            if status_code != 0:
+                # a process killed on interrupt gets SIGKILL too
+                oom_killed = status_code == -signal.SIGKILL and not running_jobs.interrupted
+
+                _logger.error(f"Process {job.name} failed with exit code {status_code}")
+                result = JobResult(job.name, False, status_code=status_code, oom_killed=oom_killed)
+            else:
+                result = JobResult(job.name, True, status_code=status_code)
+        except Exception as e:
+            _logger.error(f"Unexpected error in {job.name}: {e}")
+            result = JobResult(job.name, False, error=str(e))
+        finally:
+            running_jobs.remove(job.name)
+            output.close()
+
+            if result is not None:
+                for monitor in self.monitors:
+                    monitor.job_finished(job, result)
+
+        return result
@@ -0,0 +1,212 @@
+import os
+import gzip
+import time
+import queue
+import logging
+import threading
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+# lines waiting for the writer thread, beyond it the lines of the jobs are dropped
+QUEUE_SIZE = 10000
+
+class RateLimiter:
+    """Token bucket allowing rate lines per second with bursts up to burst lines"""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def allow(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+
+        return False
+
+class JobLog:
+    """Output of one job, lines are queued and never written from the job thread
+
+    A line is dropped when the queue is full, the job never waits for the
+    writer. The dropped lines are counted and reported with the next line
+    queued or when the job log is closed.
+    """
+    def __init__(self, multiplexer, job_name):
+        self.multiplexer = multiplexer
+        self.job_name = job_name
+        self.dropped = 0
+
+    def write(self, line):
+        try:
+            self.multiplexer.queue.put_nowait(('line', self.job_name, time.time(), line, self.dropped))
+            self.dropped = 0
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        # the end of the job is never dropped, its log file must be closed
+        self.multiplexer.queue.put(('close', self.job_name, time.time(), None, self.dropped))
+        self.dropped = 0
+
+class _JobOutput:
+    def __init__(self, file, limiter):
+        self.file = file
+        self.limiter = limiter
+        self.suppressed = 0
+        self.dropped = 0
+
+class LogMultiplexer:
+    """Collect the log lines of many running jobs from a single writer thread
+
+    Every job line is written to its own gzip compressed log file (when a log
+    folder is given) and to the console prefixed with the job name. Console
+    lines are rate limited per job, the suppressed ones are only counted and
+    reported, so a chatty container can not flood stdout. Jobs only enqueue
+    lines, so slow console or disk I/O never blocks a running job: when the
+    bounded queue is full the lines are dropped, counted and reported like
+    the suppressed ones, and marked in the log file.
+
+    Args:
+      log_folder (str): folder for the <job name>.log.gz files, None to disable them, every attempt of a job is appended
+      console_rate (float): console lines per second allowed per job, 0 for unlimited
+      queue_size (int): lines waiting for the writer thread before the next ones are dropped
+    """
+    def __init__(self, log_folder=None, console_rate=0, queue_size=QUEUE_SIZE):
+        self.log_folder = log_folder
+        self.console_rate = console_rate
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.outputs = {}
+        self.thread = None
+
+        if log_folder is not None:
+            os.makedirs(log_folder, exist_ok=True)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='log-multiplexer', daemon=True)
+        self.thread.start()
+
+        return self
+
+    def open(self, job_name):
+        return JobLog(self, job_name)
+
+    def close(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def log_path(self, job_name):
+        return os.path.join(self.log_folder, job_name + '.log.gz')
+
+    def _output(self, job_name, created):
+        output = self.outputs.get(job_name)
+
+        if output is None:
+            file = None
+            if self.log_folder is not None:
+                # append a gzip member per attempt, a retried or rescheduled job keeps the log of the failed one
+                file = gzip.open(self.log_path(job_name), 'at', encoding='utf-8')
+                file.write(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(created)) + f" ---- {job_name} attempt started ----\n")
+
+            limiter = None
+            if self.console_rate > 0:
+                limiter = RateLimiter(self.console_rate, max(1, self.console_rate))
+
+            output = self.outputs[job_name] = _JobOutput(file, limiter)
+
+        return output
+
+    def _report_suppressed(self, job_name, output):
+        if output.suppressed > 0:
+            where = f", see {self.log_path(job_name)}" if output.file is not None else ""
+            _logger.info(f"[{job_name}] ... {output.suppressed} lines suppressed{where}")
+            output.suppressed = 0
+
+        if output.dropped > 0:
+            _logger.warning(f"[{job_name}] ... {output.dropped} lines dropped, the log writer could not keep up")
+            output.dropped = 0
+
+    def _count_dropped(self, output, created, dropped):
+        if dropped > 0:
+            output.dropped += dropped
+
+            if output.file is not None:
+                output.file.write(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(created)) + f" ---- {dropped} lines dropped ----\n")
+
+    def _write_line(self, job_name, created, line, dropped=0):
+        output = self._output(job_name, created)
+        self._count_dropped(output, created, dropped)
+
+        if output.file is not None:
+            output.file.write(time.strftime('%Y-%m-%d %H:%M:%S ', time.localtime(created)) + line + '\n')
+
+        if output.limiter is None or output.limiter.allow(time.monotonic()):
+            self._report_suppressed(job_name, output)
+            _logger.info(f"[{job_name}] {line}")
+        else:
+            output.suppressed += 1
+
+    def _close_job(self, job_name, created=None, dropped=0):
+        # every line of the job may have been dropped
+        if dropped > 0:
+            self._output(job_name, created)
+
+        output = self.outputs.pop(job_name, None)
+
+        if output is not None:
+            self._count_dropped(output, created, dropped)
+            self._report_suppressed(job_name, output)
+
+            if output.file is not None:
+                output.file.close()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+
+            action, job_name, created, line, dropped = item
+            try:
+                if action == 'line':
+                    self._write_line(job_name, created, line, dropped)
+                else:
+                    self._close_job(job_name, created, dropped)
+            except Exception as e:
+                _logger.warning(f"Log of job {job_name} could not be written: {e}")
+
+        for job_name in list(self.outputs):
+            self._close_job(job_name)
+
+class ConsoleLog:
+    """Job output logged directly from the job thread, used when no multiplexer is running"""
+    def __init__(self, job_name):
+        self.job_name = job_name
+
+    def write(self, line):
+        _logger.info(f"[{self.job_name}] {line}")
+
+    def close(self):
+        pass
+
+def open_job_log(logs, job_name):
+    """Open the output of a job in a multiplexer, or on the console if there is none"""
+    if logs is None:
+        return ConsoleLog(job_name)
+
+    return logs.open(job_name)
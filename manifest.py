@@ -0,0 +1,119 @@
+import os
+import json
+import hashlib
+import logging
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+MANIFEST_FILE_NAME = '.executor_manifest.json'
+MANIFEST_VERSION = 1
+
+def fingerprint_file(path, content_hash=False):
+    """Fingerprint an input file from its size and mtime, or from its content
+
+    Args:
+      path (str): input file path
+      content_hash (bool): hash the file content instead of using its mtime
+
+    Returns:
+      list: [path, size, mtime or sha256], None values if the file does not exist
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return [path, None, None]
+
+    if not content_hash:
+        return [path, stat.st_size, stat.st_mtime_ns]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+
+    return [path, stat.st_size, digest.hexdigest()]
+
+def job_key(job, image_digest, content_hash=False):
+    """Key of a job: its input fingerprints, the image digest and the command line"""
+    payload = {
+        'inputs': [fingerprint_file(path, content_hash) for path in sorted(job.inputs)],
+        'image': image_digest,
+        'command': job.command,
+    }
+
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+class Manifest:
+    """Persistent record of the jobs that finished successfully and their keys
+
+    Entries are grouped by python module and indexed by job name:
+    ``{"version": 1, "jobs": {"converter.py": {"<job name>": {"key": ..., "outputs": [...]}}}}``
+    """
+    def __init__(self, path, python_module):
+        self.path = path
+        self.python_module = python_module
+        self.data = {'version': MANIFEST_VERSION, 'jobs': {}}
+
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+
+                if data.get('version') == MANIFEST_VERSION:
+                    self.data = data
+                else:
+                    _logger.warning(f"Manifest {path} has an unknown version, ignoring it")
+            except (OSError, ValueError) as e:
+                _logger.warning(f"Manifest {path} could not be read, ignoring it: {e}")
+
+    @property
+    def entries(self):
+        return self.data['jobs'].setdefault(self.python_module, {})
+
+    def is_up_to_date(self, job, key):
+        """A job is up to date when its key is unchanged and all its outputs exist"""
+        entry = self.entries.get(job.name)
+
+        if entry is None or entry.get('key') != key:
+            return False
+
+        return all(os.path.exists(output) for output in job.outputs)
+
+    def record(self, job, key):
+        self.entries[job.name] = {'key': key, 'outputs': list(job.outputs)}
+
+    def save(self):
+        # write to a temporary file and rename it to never leave a truncated manifest
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f, indent=1, sort_keys=True)
+
+        os.replace(tmp_path, self.path)
+
+def select_outdated_jobs(manifest, jobs, image_digest, force=False, content_hash=False):
+    """Split jobs in the ones to be executed and the ones already up to date
+
+    Returns:
+      Tuple[List[Job], Dict[str, str], int]: jobs to execute, key by job name
+      and number of skipped jobs
+    """
+    outdated_jobs = []
+    keys = {}
+
+    for job in jobs:
+        key = job_key(job, image_digest, content_hash)
+        keys[job.name] = key
+
+        if not force and manifest.is_up_to_date(job, key):
+            _logger.debug(f"Skipping up to date job: {job.name}")
+            continue
+
+        outdated_jobs.append(job)
+
+    skipped = len(jobs) - len(outdated_jobs)
+
+    return outdated_jobs, keys, skipped
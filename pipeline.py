@@ -0,0 +1,304 @@
+import os
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from jobs import parse_participant_sensor, run_job, shutdown_interrupted
+from dataset_index import FileKind, build_dataset_index, list_directory, skip_unselected_participants
+from stages import (
+    Stage, aggregator_job, converter_jobs, fan_out_jobs, load_participants_not_time_off, participants_file_path,
+    read_participant_codes, select_jobs, tester_job, trainer_job, windowed_jobs, windowed_mets_jobs,
+)
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+# stages executed for each participant folder, one after the other
+PARTICIPANT_STAGES = [Stage.CONVERTER, Stage.WINDOWED, Stage.WINDOWED_METS]
+
+# stages executed once for the whole cohort after the participant stages
+COHORT_STAGES = [Stage.AGGREGATOR, Stage.TRAINER, Stage.TESTER]
+
+STAGE_FILE_KINDS = {
+    Stage.CONVERTER: [FileKind.BIN],
+    Stage.WINDOWED: [FileKind.CSV, FileKind.ACTIVITY],
+    Stage.WINDOWED_METS: [FileKind.FEATURES, FileKind.REPOSO, FileKind.TREADMILL, FileKind.STS, FileKind.GXT],
+}
+
+# options of the single step runs the pipeline does not implement, with their value when not given
+UNSUPPORTED_OPTIONS = {
+    'incremental': False,
+    'batch': False,
+    'memory_budget': None,
+    'aggregator_shards': 1,
+    'aggregator_cache_folder': None,
+    'use_catalog': False,
+    'stream_tester': False,
+    'docker_hosts': None,
+}
+
+def unsupported_options(args):
+    """Command line names of the given options the pipeline would ignore"""
+    return [
+        f"--{name.replace('_', '-')}" for name, default in UNSUPPORTED_OPTIONS.items()
+        if getattr(args, name, default) != default
+    ]
+
+def parse_stages(text):
+    """Parse a comma separated list of python modules into pipeline stages"""
+    if text is None:
+        return PARTICIPANT_STAGES + COHORT_STAGES
+
+    return [Stage(value.strip()) for value in text.split(',') if value.strip()]
+
+def parse_stage_images(text, default_image):
+    """Parse the docker image of each stage from a <python module>=<image> comma separated list"""
+    images = {stage: default_image for stage in Stage}
+
+    for item in (text or '').split(','):
+        if item.strip():
+            stage, image = item.split('=', 1)
+            images[Stage(stage.strip())] = image.strip()
+
+    return images
+
+class ParticipantState:
+    def __init__(self, directory):
+        self.directory = directory
+        self.name = os.path.basename(directory)
+        self.code = None
+        self.next_stage = 0
+        self.pending = 0
+        self.failed = False
+        self.done = False
+
+class Pipeline:
+    """Dependency graph of the executor stages with per participant pipelining
+
+    converter -> windowed -> windowing_mets run per participant folder: as soon as
+    all jobs of one participant stage finish, the next stage jobs of that
+    participant are planned from its refreshed folder listing and queued, while
+    other participants are still in previous stages. aggregator -> trainer ->
+    tester run once, when every participant listed in participants.txt (every
+    participant if it is empty) finished its stages successfully. A participant
+    of participants.txt is matched by its folder name or the code of its files,
+    the run fails before starting any job when one of them is not found.
+
+    Args:
+      args (argparse.Namespace): executor arguments
+      client (docker.DockerClient): docker client shared by all jobs
+      stages (List[Stage]): stages to be executed
+      images (Dict[Stage, str]): docker image of each stage
+      logs (LogMultiplexer): multiplexer receiving the job outputs
+      monitors (List[JobMonitor]): observers of every job
+      runner (Callable[[Job], JobResult]): executes one job, by default a new
+          container per job with run_job
+      participants (Set[str]): participant codes of the participant stages, None for every participant
+      sensors (Set[str]): sensors of the participant stages, None for every sensor
+    """
+    def __init__(self, args, client, stages, images, logs=None, monitors=(), runner=None, participants=None, sensors=None):
+        self.args = args
+        self.client = client
+        self.participant_stages = [stage for stage in PARTICIPANT_STAGES if stage in stages]
+        self.cohort_stages = [stage for stage in COHORT_STAGES if stage in stages]
+        self.images = images
+        self.logs = logs
+        self.monitors = monitors
+        self.runner = runner or (lambda job: run_job(client, images[Stage(job.stage)], job, logs, monitors))
+        self.selected_participants = participants
+        self.selected_sensors = sensors
+
+        self.participants = {}
+        self.required = set()
+        self.futures = {}
+        self.results = []
+        self.next_cohort_stage = None
+        self.cohort_pending = 0
+        self.cohort_failed = False
+        self.pool = None
+
+        if Stage.WINDOWED in self.participant_stages:
+            self.participants_not_time_off = load_participants_not_time_off()
+
+    def _submit(self, job, participant=None):
+        for monitor in self.monitors:
+            monitor.job_queued(job)
+
+        future = self.pool.submit(self.runner, job)
+        self.futures[future] = (job, participant)
+
+    def _resolve_code(self, participant):
+        # the code of the first PMP file name, the folder may not be named after it
+        _, files = list_directory(participant.directory)
+
+        for name in sorted(name for names in files.values() for name in names):
+            participant.code = parse_participant_sensor(name)[0]
+            if participant.code is not None:
+                return
+
+    def _participant_jobs(self, participant, stage):
+        _, files = list_directory(participant.directory)
+
+        input_files = sorted(
+            (participant.directory, name)
+            for kind in STAGE_FILE_KINDS[stage]
+            for name in files.get(kind.value, [])
+        )
+
+        if stage == Stage.CONVERTER:
+            jobs = converter_jobs(self.args, input_files)
+        elif stage == Stage.WINDOWED:
+            jobs = windowed_jobs(self.args, input_files, self.participants_not_time_off)
+        else:
+            jobs = windowed_mets_jobs(self.args, input_files)
+
+        return select_jobs(jobs, self.selected_participants, self.selected_sensors)
+
+    def _advance_participant(self, participant):
+        # plan the next stage with jobs, stages without input files are skipped
+        while participant.next_stage < len(self.participant_stages):
+            stage = self.participant_stages[participant.next_stage]
+            participant.next_stage += 1
+
+            jobs = self._participant_jobs(participant, stage)
+            if jobs:
+                participant.pending = len(jobs)
+                for job in jobs:
+                    self._submit(job, participant)
+                return
+
+        participant.done = True
+        _logger.info(f"Participant {participant.code or participant.directory} finished")
+
+    def _is_required(self, participant):
+        return not self.required or participant.name in self.required or participant.code in self.required
+
+    def _check_required(self):
+        # a participant of participants.txt without folder would never gate the cohort stages
+        required = self.required
+        if self.selected_participants is not None:
+            required = required & set(self.selected_participants)
+
+        found = {participant.name for participant in self.participants.values()}
+        found.update(participant.code for participant in self.participants.values())
+
+        missing = sorted(required - found)
+        if missing:
+            raise Exception(f"Participants {', '.join(missing)} of participants.txt not found in {self.args.dataset_folder}")
+
+    def _cohort_ready(self):
+        gating = [participant for participant in self.participants.values() if self._is_required(participant)]
+
+        if any(participant.failed for participant in gating):
+            return None
+
+        return all(participant.done for participant in gating)
+
+    def _start_cohort(self):
+        # the cohort stages start only once
+        if self.next_cohort_stage is not None:
+            return
+
+        ready = self._cohort_ready()
+
+        if ready is None:
+            _logger.error("Cohort stages blocked by failed participants")
+            self.next_cohort_stage = len(self.cohort_stages)
+        elif ready:
+            self.next_cohort_stage = 0
+            self._advance_cohort()
+
+    def _cohort_jobs(self, stage):
+        if stage == Stage.AGGREGATOR:
+            return [aggregator_job(self.args)]
+
+        job_builder = trainer_job if stage == Stage.TRAINER else tester_job
+
+        if self.args.fan_out:
+            return fan_out_jobs(self.args, job_builder, stage.value)
+
+        return [job_builder(self.args)]
+
+    def _advance_cohort(self):
+        if self.next_cohort_stage < len(self.cohort_stages):
+            stage = self.cohort_stages[self.next_cohort_stage]
+            self.next_cohort_stage += 1
+
+            jobs = self._cohort_jobs(stage)
+            self.cohort_pending = len(jobs)
+            for job in jobs:
+                self._submit(job)
+
+    def _job_finished(self, job, participant, result):
+        if participant is None:
+            self.cohort_failed = self.cohort_failed or not result.succeeded
+            self.cohort_pending -= 1
+
+            if self.cohort_pending == 0:
+                if self.cohort_failed:
+                    _logger.error(f"Cohort stage {job.stage} failed, stopping the cohort stages")
+                    self.next_cohort_stage = len(self.cohort_stages)
+                else:
+                    self._advance_cohort()
+            return
+
+        participant.failed = participant.failed or not result.succeeded
+        participant.pending -= 1
+
+        if participant.pending == 0:
+            if participant.failed:
+                participant.done = True
+                _logger.error(f"Participant {participant.code or participant.directory} failed in {job.stage}")
+            else:
+                self._advance_participant(participant)
+
+            self._start_cohort()
+
+    def run(self, max_workers=1):
+        """Execute the pipeline keeping up to max_workers containers running at once
+
+        Returns:
+          List[JobResult]: one result per executed job, in completion order
+        """
+        # do not walk the folders of the participants not selected
+        skip_directory = None
+        if self.selected_participants is not None:
+            skip_directory = skip_unselected_participants(self.selected_participants)
+
+        index = build_dataset_index(self.args.dataset_folder, self.args.index_file, skip_directory)
+        self.required = set(read_participant_codes(participants_file_path()))
+
+        if self.participant_stages:
+            for directory in index.participants():
+                participant = ParticipantState(directory)
+                self._resolve_code(participant)
+                self.participants[directory] = participant
+
+            if self.cohort_stages:
+                self._check_required()
+
+        self.pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        try:
+            for participant in self.participants.values():
+                self._advance_participant(participant)
+
+            self._start_cohort()
+
+            while self.futures:
+                done, _ = wait(self.futures, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    job, participant = self.futures.pop(future)
+                    result = future.result()
+                    self.results.append(result)
+
+                    self._job_finished(job, participant, result)
+        except KeyboardInterrupt:
+            shutdown_interrupted(self.pool)
+            raise
+        finally:
+            self.pool.shutdown(wait=True)
+
+        return self.results
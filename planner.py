@@ -0,0 +1,39 @@
+import json
+import time
+import logging
+from dataclasses import asdict
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+PLAN_VERSION = 1
+
+def build_plan(args, jobs):
+    """Serializable plan of a run: the docker image and every job to be executed
+
+    Returns:
+      dict: ``{"version": 1, "python_module": ..., "docker_image": ..., "jobs": [...]}``
+    """
+    return {
+        'version': PLAN_VERSION,
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python_module': args.python_module,
+        'docker_image': args.docker_image,
+        'dataset_folder': args.dataset_folder,
+        'jobs': [asdict(job) for job in jobs],
+    }
+
+def log_plan(plan):
+    _logger.info(f"Plan for {plan['python_module']} with image {plan['docker_image']}: {len(plan['jobs'])} jobs")
+
+    for job in plan['jobs']:
+        _logger.info(f"[{job['name']}] {' '.join(job['command'])}")
+
+def save_plan(plan, path):
+    with open(path, 'w') as f:
+        json.dump(plan, f, indent=2)
+
+    _logger.info(f"Plan written to {path}")
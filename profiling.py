@@ -0,0 +1,215 @@
+import os
+import csv
+import json
+import math
+import time
+import logging
+import threading
+from collections import defaultdict
+
+from jobs import JobMonitor
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+PROFILE_FIELDS = [
+    'stage', 'job', 'participant', 'sensor', 'succeeded', 'status_code',
+    'queued_at', 'started_at', 'finished_at', 'wait_seconds', 'wall_seconds',
+    'cpu_seconds', 'peak_rss_bytes', 'block_read_bytes', 'block_write_bytes',
+]
+
+SUMMARY_METRICS = ['wall_seconds', 'cpu_seconds', 'peak_rss_bytes', 'block_read_bytes', 'block_write_bytes']
+
+def percentile(values, percent):
+    """Nearest rank percentile of a non empty list of values"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+
+    return ordered[rank - 1]
+
+def rss_bytes(memory_stats):
+    """Resident memory of a container stats sample, for cgroup v1 and v2 daemons"""
+    stats = memory_stats.get('stats', {})
+
+    for key in ('rss', 'total_rss', 'anon'):
+        if key in stats:
+            return stats[key]
+
+    return memory_stats.get('usage', 0)
+
+def block_io_bytes(blkio_stats):
+    """Total (read, write) bytes of a container stats sample"""
+    read = write = 0
+
+    for entry in blkio_stats.get('io_service_bytes_recursive') or []:
+        op = entry.get('op', '').lower()
+        if op == 'read':
+            read += entry.get('value', 0)
+        elif op == 'write':
+            write += entry.get('value', 0)
+
+    return read, write
+
+class ContainerSampler:
+    """Follow the docker stats stream of one container until it stops"""
+    def __init__(self, container):
+        self.container = container
+        self.peak_rss_bytes = 0
+        self.cpu_seconds = 0.0
+        self.block_read_bytes = 0
+        self.block_write_bytes = 0
+        self.thread = threading.Thread(target=self._run, name='stats-' + container.name, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+        return self
+
+    def join(self, timeout=5):
+        self.thread.join(timeout)
+
+    def _run(self):
+        try:
+            for stats in self.container.stats(stream=True, decode=True):
+                memory_stats = stats.get('memory_stats') or {}
+                if memory_stats:
+                    self.peak_rss_bytes = max(self.peak_rss_bytes, rss_bytes(memory_stats))
+
+                # cumulative counters, the last sample of a running container is the total
+                total_usage = ((stats.get('cpu_stats') or {}).get('cpu_usage') or {}).get('total_usage')
+                if total_usage:
+                    self.cpu_seconds = total_usage / 1e9
+
+                read, write = block_io_bytes(stats.get('blkio_stats') or {})
+                if read or write:
+                    self.block_read_bytes, self.block_write_bytes = read, write
+        except Exception as e:
+            _logger.debug(f"Stats of container {self.container.name} stopped: {e}")
+
+class Profiler(JobMonitor):
+    """Record timestamps and container resource usage of every job of a stage
+
+    Args:
+      stage (str): python module executed by the jobs
+    """
+    def __init__(self, stage):
+        self.stage = stage
+        self.records = {}
+        self.samplers = {}
+        self.lock = threading.Lock()
+
+    def _record(self, job):
+        record = self.records.get(job.name)
+
+        if record is None:
+            record = self.records[job.name] = {field: None for field in PROFILE_FIELDS}
+            record.update(stage=job.stage or self.stage, job=job.name, participant=job.participant, sensor=job.sensor)
+
+        return record
+
+    def job_queued(self, job):
+        with self.lock:
+            self._record(job)['queued_at'] = time.time()
+
+    def job_started(self, job, container):
+        with self.lock:
+            self._record(job)['started_at'] = time.time()
+
+            if container is not None:
+                self.samplers[job.name] = ContainerSampler(container).start()
+
+    def job_finished(self, job, result):
+        finished_at = time.time()
+
+        with self.lock:
+            sampler = self.samplers.pop(job.name, None)
+
+        # the stats stream ends when the container stops
+        if sampler is not None:
+            sampler.join()
+
+        with self.lock:
+            record = self._record(job)
+            record.update(finished_at=finished_at, succeeded=result.succeeded, status_code=result.status_code)
+
+            if record['started_at'] is not None:
+                record['wall_seconds'] = round(finished_at - record['started_at'], 3)
+                if record['queued_at'] is not None:
+                    record['wait_seconds'] = round(record['started_at'] - record['queued_at'], 3)
+
+            if sampler is not None:
+                record.update(
+                    cpu_seconds=round(sampler.cpu_seconds, 3),
+                    peak_rss_bytes=sampler.peak_rss_bytes,
+                    block_read_bytes=sampler.block_read_bytes,
+                    block_write_bytes=sampler.block_write_bytes,
+                )
+
+    def summary(self):
+        """p50, p95 and max of every metric for the whole step, and per stage, participant and sensor
+
+        The pipeline profiles the jobs of every stage together, so the
+        participant and sensor breakdowns are kept per stage.
+        """
+        records = list(self.records.values())
+
+        def summarize(group):
+            metrics = {}
+            for metric in SUMMARY_METRICS:
+                values = [record[metric] for record in group if record[metric] is not None]
+                if values:
+                    metrics[metric] = {'p50': percentile(values, 50), 'p95': percentile(values, 95), 'max': max(values)}
+
+            return {'jobs': len(group), 'metrics': metrics}
+
+        def breakdown(group):
+            by_participant = defaultdict(list)
+            by_sensor = defaultdict(list)
+            for record in group:
+                if record['participant'] is not None:
+                    by_participant[record['participant']].append(record)
+                if record['sensor'] is not None:
+                    by_sensor[record['sensor']].append(record)
+
+            return {
+                'total': summarize(group),
+                'participants': {key: summarize(records) for key, records in sorted(by_participant.items())},
+                'sensors': {key: summarize(records) for key, records in sorted(by_sensor.items())},
+            }
+
+        by_stage = defaultdict(list)
+        for record in records:
+            by_stage[record['stage']].append(record)
+
+        return {
+            'stage': self.stage,
+            'total': summarize(records),
+            'stages': {stage: breakdown(group) for stage, group in sorted(by_stage.items())},
+        }
+
+    def write(self, profile_folder):
+        """Write the per job profile CSV and the stage summary JSON
+
+        Returns:
+          Tuple[str, str]: paths of the profile and summary files
+        """
+        os.makedirs(profile_folder, exist_ok=True)
+
+        prefix = os.path.join(profile_folder, 'profile_' + os.path.splitext(self.stage)[0] + time.strftime('_%Y%m%d_%H%M%S'))
+        profile_path = prefix + '.csv'
+        summary_path = prefix + '_summary.json'
+
+        with open(profile_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=PROFILE_FIELDS)
+            writer.writeheader()
+            writer.writerows(sorted(self.records.values(), key=lambda record: record['job']))
+
+        with open(summary_path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+        _logger.info(f"Profile written to {profile_path} and {summary_path}")
+
+        return profile_path, summary_path
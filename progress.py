@@ -0,0 +1,256 @@
+import time
+import logging
+import threading
+from collections import defaultdict
+
+from jobs import JobMonitor
+from scheduler import job_input_bytes
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+JOB_STATES = ['queued', 'running', 'succeeded', 'failed']
+
+# upper bounds in seconds of the job duration histogram buckets
+DURATION_BUCKETS = [1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600]
+
+def format_duration(seconds):
+    if seconds is None:
+        return '--:--:--'
+
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+class StageProgress:
+    """Job states, input bytes and duration histogram of one stage
+
+    The progress is weighted by input bytes, or by jobs for stages whose jobs
+    have no input files, and the ETA extrapolates the throughput since the
+    first job of the stage started.
+    """
+    def __init__(self):
+        self.states = {}
+        self.weights = {}
+        self.started_at = None
+        self.duration_buckets = [0] * len(DURATION_BUCKETS)
+        self.duration_count = 0
+        self.duration_sum = 0.0
+
+    def counts(self):
+        counts = dict.fromkeys(JOB_STATES, 0)
+        for state in self.states.values():
+            counts[state] += 1
+
+        return counts
+
+    def _weight(self, name):
+        # stages without input bytes progress by jobs
+        return self.weights[name] if any(self.weights.values()) else 1
+
+    def done_fraction(self):
+        total = sum(self._weight(name) for name in self.states)
+        done = sum(self._weight(name) for name, state in self.states.items() if state in ('succeeded', 'failed'))
+
+        return done / total if total else 1.0
+
+    def eta_seconds(self, now):
+        fraction = self.done_fraction()
+        if self.started_at is None or fraction == 0:
+            return None
+
+        elapsed = now - self.started_at
+        return elapsed * (1 - fraction) / fraction
+
+    def observe_duration(self, seconds):
+        self.duration_count += 1
+        self.duration_sum += seconds
+
+        for position, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                self.duration_buckets[position] += 1
+
+class ProgressMonitor(JobMonitor):
+    """Track the jobs queued, running, succeeded and failed per stage
+
+    With interval seconds a background thread logs the progress and ETA of
+    every unfinished stage.
+
+    Args:
+      stage (str): stage of the jobs without one
+      interval (float): seconds between progress lines, 0 to not log them
+    """
+    def __init__(self, stage, interval=30):
+        self.stage = stage
+        self.interval = interval
+        self.stages = defaultdict(StageProgress)
+        self.started = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def _stage(self, job):
+        return self.stages[job.stage or self.stage]
+
+    def job_queued(self, job):
+        weight = job_input_bytes(job)
+
+        with self.lock:
+            progress = self._stage(job)
+            progress.states[job.name] = 'queued'
+            progress.weights[job.name] = weight
+
+    def job_started(self, job, container):
+        now = time.time()
+
+        with self.lock:
+            progress = self._stage(job)
+            progress.states[job.name] = 'running'
+            progress.weights.setdefault(job.name, 0)
+            progress.started_at = progress.started_at or now
+            self.started[job.name] = now
+
+    def job_finished(self, job, result):
+        now = time.time()
+
+        with self.lock:
+            progress = self._stage(job)
+            progress.states[job.name] = 'succeeded' if result.succeeded else 'failed'
+            progress.weights.setdefault(job.name, 0)
+
+            started_at = self.started.pop(job.name, None)
+            if started_at is not None:
+                progress.observe_duration(now - started_at)
+
+    def snapshot(self):
+        """Counts, done fraction and ETA of every stage
+
+        Returns:
+          Dict[str, dict]: ``{"<stage>": {"queued": ..., "running": ..., "succeeded": ..., "failed": ..., "done": ..., "eta_seconds": ...}}``
+        """
+        now = time.time()
+
+        with self.lock:
+            return {
+                stage: {**progress.counts(), 'done': progress.done_fraction(), 'eta_seconds': progress.eta_seconds(now)}
+                for stage, progress in self.stages.items()
+            }
+
+    def log_progress(self):
+        for stage, snapshot in self.snapshot().items():
+            if snapshot['queued'] == 0 and snapshot['running'] == 0:
+                continue
+
+            finished = snapshot['succeeded'] + snapshot['failed']
+            total = finished + snapshot['queued'] + snapshot['running']
+
+            _logger.info(
+                f"Progress {stage}: {finished}/{total} jobs, {snapshot['running']} running, "
+                f"{snapshot['failed']} failed, {100 * snapshot['done']:.1f}% done, "
+                f"ETA {format_duration(snapshot['eta_seconds'])}")
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.log_progress()
+
+    def start(self):
+        if self.interval > 0:
+            self.thread = threading.Thread(target=self._run, name="progress", daemon=True)
+            self.thread.start()
+
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+        if self.thread is not None:
+            self.thread.join()
+
+    def metrics(self):
+        """Prometheus text exposition of the job states, progress, ETA and duration histograms"""
+        snapshot = self.snapshot()
+
+        lines = [
+            '# HELP executor_jobs Jobs of every stage by state.',
+            '# TYPE executor_jobs gauge',
+        ]
+        for stage, values in sorted(snapshot.items()):
+            for state in JOB_STATES:
+                lines.append(f'executor_jobs{{stage="{stage}",state="{state}"}} {values[state]}')
+
+        lines += [
+            '# HELP executor_progress_ratio Done fraction of every stage weighted by input bytes.',
+            '# TYPE executor_progress_ratio gauge',
+        ]
+        for stage, values in sorted(snapshot.items()):
+            lines.append(f'executor_progress_ratio{{stage="{stage}"}} {values["done"]:.6f}')
+
+        lines += [
+            '# HELP executor_eta_seconds Estimated seconds to finish every stage.',
+            '# TYPE executor_eta_seconds gauge',
+        ]
+        for stage, values in sorted(snapshot.items()):
+            if values['eta_seconds'] is not None:
+                lines.append(f'executor_eta_seconds{{stage="{stage}"}} {values["eta_seconds"]:.1f}')
+
+        lines += [
+            '# HELP executor_job_duration_seconds Duration of every job attempt.',
+            '# TYPE executor_job_duration_seconds histogram',
+        ]
+        with self.lock:
+            for stage, progress in sorted(self.stages.items()):
+                for bound, count in zip(DURATION_BUCKETS, progress.duration_buckets):
+                    lines.append(f'executor_job_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+
+                lines.append(f'executor_job_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {progress.duration_count}')
+                lines.append(f'executor_job_duration_seconds_sum{{stage="{stage}"}} {progress.duration_sum:.3f}')
+                lines.append(f'executor_job_duration_seconds_count{{stage="{stage}"}} {progress.duration_count}')
+
+        return '\n'.join(lines) + '\n'
+
+class MetricsServer:
+    """Serve the progress metrics on http://<host>:<port>/metrics in Prometheus text format
+
+    Args:
+      progress (ProgressMonitor): monitor of the run jobs
+      port (int): local port
+      host (str): interface to listen on, only the local one by default
+    """
+    def __init__(self, progress, port, host='127.0.0.1'):
+        # the http server is only loaded when the metrics are served
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        monitor = progress
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+
+                body = monitor.metrics().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                _logger.debug(format % args)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True)
+        self.thread.start()
+
+        _logger.info(f"Metrics served on http://{self.server.server_address[0]}:{self.server.server_address[1]}/metrics")
+
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
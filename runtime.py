@@ -0,0 +1,81 @@
+import logging
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+class DockerRuntime:
+    """Docker client and pinned images shared by every job of a run
+
+    The client is created once with a connection pool sized for the concurrent
+    jobs. Every image is resolved once before scheduling, pulled when missing
+    (or always with pull), and pinned to its image id, so all the containers of
+    the run use the same image even if its tag is moved while running.
+
+    Args:
+      max_workers (int): maximum number of containers running at the same time
+      pull (bool): pull the images even when found locally, to get their latest tag
+      base_url (str): docker endpoint, by default the one of the environment
+    """
+    def __init__(self, max_workers=1, pull=False, base_url=None):
+        # docker is loaded on first use, the local backend and the dry runs never need it
+        import docker
+
+        if base_url is None:
+            self.client = docker.from_env(max_pool_size=max(max_workers, 10))
+        else:
+            self.client = docker.DockerClient(base_url=base_url, max_pool_size=max(max_workers, 10))
+
+        self.base_url = base_url
+        self.pull = pull
+        self.images = {}
+
+    def start(self, images):
+        """Check the docker daemon and pin every image, failing before any job is scheduled
+
+        Returns:
+          DockerRuntime: the runtime itself
+        """
+        try:
+            self.client.ping()
+        except Exception as e:
+            raise Exception(f"Docker daemon {self.base_url or ''} not reachable: {e}")
+
+        for image in dict.fromkeys(images):
+            self.images[image] = self._resolve(image)
+            _logger.info(f"Image {image} pinned to {self.images[image]}")
+
+        return self
+
+    def _resolve(self, image):
+        import docker
+
+        if not self.pull:
+            try:
+                return self.client.images.get(image).id
+            except docker.errors.ImageNotFound:
+                pass
+            except docker.errors.APIError as e:
+                raise Exception(f"Image {image} could not be resolved: {e}")
+
+        _logger.info(f"Pulling image {image} ...")
+
+        try:
+            return self.client.images.pull(image).id
+        except docker.errors.APIError as e:
+            raise Exception(f"Image {image} could not be pulled: {e}")
+
+    def image(self, image):
+        """Pinned image id of an image resolved when the runtime started"""
+        return self.images[image]
+
+    def close(self):
+        self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,172 @@
+import os
+import re
+import logging
+from dataclasses import dataclass
+from typing import Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from jobs import run_job, shutdown_interrupted
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+BYTE_UNITS = {'': 1, 'b': 1, 'k': 1024, 'm': 1024**2, 'g': 1024**3, 't': 1024**4}
+
+def parse_bytes(text):
+    """Parse a size like 512m, 64g or 1073741824 into bytes"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([bkmgt]?)b?\s*', str(text).lower())
+    if match is None:
+        raise ValueError(f"Invalid size: {text}")
+
+    return int(float(match.group(1)) * BYTE_UNITS[match.group(2)])
+
+@dataclass
+class ResourceBudget:
+    """Total resources shared by the concurrent containers and the per job estimate factors
+
+    Args:
+      memory_bytes (int): memory shared by all running containers
+      cpus (float): CPUs shared by all running containers, None for no CPU budget
+      memory_per_input_byte (float): container memory estimated per input byte
+      min_job_memory (int): minimum memory of every container
+      job_cpus (float): CPUs of every container
+    """
+    memory_bytes: int
+    cpus: Optional[float] = None
+    memory_per_input_byte: float = 3.0
+    min_job_memory: int = 1024**3
+    job_cpus: float = 1.0
+
+def job_input_bytes(job):
+    """Total size of the existing input files of a job"""
+    total = 0
+    for path in job.inputs:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+
+    return total
+
+def estimate_jobs(jobs, budget):
+    """Set the container limits of every job from its input size and order them longest first
+
+    The memory limit grows with the input bytes, never below the minimum job
+    memory or a limit already raised after an OOM kill, nor above the whole budget. Input size is also the job duration
+    estimate, so running the biggest jobs first keeps a big file from being the
+    last one running and setting the run finish time.
+
+    Returns:
+      List[Job]: the jobs ordered by decreasing input size
+    """
+    sizes = {}
+    for job in jobs:
+        sizes[job.name] = job_input_bytes(job)
+
+        memory = max(budget.min_job_memory, int(sizes[job.name] * budget.memory_per_input_byte), job.mem_limit or 0)
+        job.mem_limit = min(memory, budget.memory_bytes)
+        job.nano_cpus = int(budget.job_cpus * 1e9)
+
+    return sorted(jobs, key=lambda job: sizes[job.name], reverse=True)
+
+def execute_scheduled_jobs(client, image, jobs, budget, max_workers=1, on_result=None, runner=None, logs=None, monitors=()):
+    """Execute jobs longest first, packing concurrent containers under the resource budget
+
+    A job is started when its memory and CPU limits fit in the free budget and
+    fewer than max_workers jobs are running. When the biggest pending job does
+    not fit, smaller pending jobs that fit are started first, but only once: if
+    it still does not fit after the next job finishes, no job passes it anymore
+    and the released resources are kept for it, so a job as big as the whole
+    budget is not starved by a stream of small ones. A job bigger than the
+    whole budget runs alone.
+
+    Args:
+      client (docker.DockerClient): docker client shared by all jobs
+      image (str): docker image used to create the containers
+      jobs (List[Job]): jobs to be executed
+      budget (ResourceBudget): resources shared by the running containers
+      max_workers (int): maximum number of containers running at the same time
+      on_result (Callable[[JobResult], None]): called as soon as each job finishes
+      runner (Callable[[Job], JobResult]): executes one job, by default run_job
+      logs (LogMultiplexer): multiplexer receiving the output of the default runner
+      monitors (List[JobMonitor]): observers notified when each job is queued
+
+    Returns:
+      List[JobResult]: one result per job, in completion order
+    """
+    if runner is None:
+        runner = lambda job: run_job(client, image, job, logs, monitors)
+
+    pending = estimate_jobs(list(jobs), budget)
+
+    for job in pending:
+        for monitor in monitors:
+            monitor.job_queued(job)
+
+    free_memory = budget.memory_bytes
+    free_cpus = budget.cpus
+    running = {}
+    results = []
+
+    def fits(job):
+        if job.mem_limit > free_memory:
+            return False
+
+        return free_cpus is None or job.nano_cpus / 1e9 <= free_cpus + 1e-9
+
+    # first job not fitting that smaller jobs have already passed
+    reserved = None
+
+    pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        while pending or running:
+            # start the biggest pending jobs that fit, first fit in longest first order
+            head = None
+            position = 0
+            while position < len(pending) and len(running) < max(1, max_workers):
+                job = pending[position]
+
+                if not fits(job) and running:
+                    if head is None:
+                        head = job
+
+                    # backfill past a job only once, then keep the released resources for it
+                    if job is reserved:
+                        break
+
+                    position += 1
+                    continue
+
+                pending.pop(position)
+                free_memory -= job.mem_limit
+                if free_cpus is not None:
+                    free_cpus -= job.nano_cpus / 1e9
+
+                _logger.debug(f"Scheduling {job.name} with {job.mem_limit} bytes and {job.nano_cpus / 1e9} CPUs")
+                running[pool.submit(runner, job)] = job
+
+            reserved = head
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                job = running.pop(future)
+                free_memory += job.mem_limit
+                if free_cpus is not None:
+                    free_cpus += job.nano_cpus / 1e9
+
+                result = future.result()
+                results.append(result)
+
+                if on_result is not None:
+                    on_result(result)
+    except KeyboardInterrupt:
+        shutdown_interrupted(pool)
+        raise
+    finally:
+        pool.shutdown(wait=True)
+
+    return results
@@ -0,0 +1,212 @@
+import os
+import shutil
+import fnmatch
+import filecmp
+import logging
+from dataclasses import dataclass
+
+from stages import aggregator_job, container_name, participants_file_path, read_participant_codes
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+SHARDS_FOLDER_NAME = '.aggregator_shards'
+
+# npz arrays stacked by window, X holds the windows and y their labels
+WINDOW_ARRAYS = 'X,y'
+
+@dataclass
+class AggregatorShard:
+    """A contiguous slice of the participants aggregated by its own container
+
+    folder holds the shard participants.txt and the output folder mounted as
+    the shard case id folder.
+    """
+    index: int
+    participants: list
+    folder: str
+
+    @property
+    def participants_file(self):
+        return os.path.join(self.folder, 'participants.txt')
+
+    @property
+    def output_folder(self):
+        return os.path.join(self.folder, 'output')
+
+def split_contiguous(participants, shards, weights=None):
+    """Split participants in contiguous slices of about the same total weight, or the same size without weights
+
+    Returns:
+      List[List[str]]: shards non empty slices
+    """
+    if not weights:
+        size, remainder = divmod(len(participants), shards)
+        bounds = [index * size + min(index, remainder) for index in range(shards + 1)]
+
+        return [participants[bounds[index]:bounds[index + 1]] for index in range(shards)]
+
+    weights = [max(1, weights.get(participant, 0)) for participant in participants]
+    total = sum(weights)
+
+    slices = []
+    start = 0
+    accumulated = 0
+    for index in range(shards - 1):
+        target = total * (index + 1) / shards
+
+        # every following shard keeps at least one participant
+        end = start + 1
+        accumulated += weights[start]
+        while end < len(participants) - (shards - index - 1) and accumulated + weights[end] / 2 <= target:
+            accumulated += weights[end]
+            end += 1
+
+        slices.append(participants[start:end])
+        start = end
+
+    slices.append(participants[start:])
+
+    return slices
+
+def plan_shards(args, shards, weights=None):
+    """Split the participants file in up to shards contiguous slices of the same size
+
+    With weights, like the windowed bytes of every participant, the slices are
+    balanced by weight instead of by number of participants. Contiguous slices
+    keep the participant order when the shard outputs are concatenated in
+    shard order.
+
+    Returns:
+      List[AggregatorShard]: the non empty shards
+    """
+    participants = read_participant_codes(participants_file_path())
+    if not participants:
+        raise Exception("The sharded aggregator needs the participants listed in participants.txt")
+
+    shards = max(1, min(shards, len(participants)))
+    root = os.path.join(os.path.abspath(args.case_id_folder), SHARDS_FOLDER_NAME, args.case_id)
+
+    return [
+        AggregatorShard(index, shard_participants, os.path.join(root, f"shard_{index:02d}"))
+        for index, shard_participants in enumerate(split_contiguous(participants, shards, weights))
+    ]
+
+def shard_jobs(args, shards, python_module):
+    """One aggregator job per shard, reading the shard participants and writing to the shard output folder"""
+    jobs = []
+    for shard in shards:
+        job = aggregator_job(args, python_module, shard.participants_file, shard.output_folder)
+        job.name = container_name(f"{job.name}_shard{shard.index:02d}")
+        jobs.append(job)
+
+    return jobs
+
+def prepare_shards(shards):
+    """Write the participants file and an empty output folder of every shard"""
+    for shard in shards:
+        shutil.rmtree(shard.folder, ignore_errors=True)
+        os.makedirs(shard.output_folder)
+
+        with open(shard.participants_file, 'w') as f:
+            f.write(','.join(shard.participants))
+
+def parse_window_arrays(text):
+    """Parse a comma separated list of npz array names or globs"""
+    return [name.strip() for name in (text or '').split(',') if name.strip()]
+
+def merge_npz(paths, target, window_arrays):
+    """Merge the npz file of several shards
+
+    The window arrays, stacked by window along their first axis, are
+    concatenated in shard order. Any other array is per case and must be the
+    same in every shard.
+
+    Args:
+      paths (List[str]): the npz file of every shard, in shard order
+      target (str): the merged npz file
+      window_arrays (List[str]): names or globs of the arrays stacked by window
+    """
+    # numpy and pandas are only loaded to merge the shards
+    import numpy as np
+
+    arrays = [np.load(path, allow_pickle=True) for path in paths]
+    try:
+        merged = {}
+        for key in arrays[0].files:
+            values = [array[key] for array in arrays]
+
+            if any(fnmatch.fnmatchcase(key, pattern) for pattern in window_arrays):
+                if any(value.ndim == 0 for value in values):
+                    raise Exception(f"Window array {key} of {target} is a scalar")
+
+                merged[key] = np.concatenate(values, axis=0)
+            elif all(value.shape == values[0].shape and np.array_equal(value, values[0]) for value in values[1:]):
+                merged[key] = values[0]
+            else:
+                raise Exception(f"Array {key} differs between the shards of {target}, list it in aggregator-window-arrays if it is stacked by window")
+    finally:
+        for array in arrays:
+            array.close()
+
+    with open(target, 'wb') as f:
+        np.savez(f, **merged)
+
+def merge_csv(paths, target):
+    import pandas as pd
+
+    pd.concat([pd.read_csv(path) for path in paths], ignore_index=True).to_csv(target, index=False)
+
+def merge_files(paths, target, window_arrays):
+    """Merge the same output file of several shards into the target file
+
+    npz window arrays and csv rows are concatenated in shard order, any other
+    file must be identical in every shard.
+    """
+    tmp_target = target + '.tmp'
+    _, ext = os.path.splitext(target)
+
+    if len(paths) == 1:
+        shutil.copyfile(paths[0], tmp_target)
+    elif ext == '.npz':
+        merge_npz(paths, tmp_target, window_arrays)
+    elif ext == '.csv':
+        merge_csv(paths, tmp_target)
+    elif all(filecmp.cmp(paths[0], path, shallow=False) for path in paths[1:]):
+        shutil.copyfile(paths[0], tmp_target)
+    else:
+        raise Exception(f"Shard outputs of {target} differ and cannot be merged")
+
+    os.replace(tmp_target, target)
+
+def merge_shards(shards, case_id_folder, window_arrays=None):
+    """Merge the shard outputs into the case id folder and remove the shard folders
+
+    Returns:
+      int: number of merged files
+    """
+    if window_arrays is None:
+        window_arrays = parse_window_arrays(WINDOW_ARRAYS)
+
+    outputs = {}
+    for shard in shards:
+        for root, _, files in os.walk(shard.output_folder):
+            for file in files:
+                path = os.path.join(root, file)
+                outputs.setdefault(os.path.relpath(path, shard.output_folder), []).append(path)
+
+    for relative_path, paths in sorted(outputs.items()):
+        target = os.path.join(case_id_folder, relative_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        merge_files(paths, target, window_arrays)
+
+    # all the shards of a case share one parent folder
+    shutil.rmtree(os.path.dirname(shards[0].folder), ignore_errors=True)
+
+    _logger.info(f"Merged {len(outputs)} files of {len(shards)} aggregator shards into {case_id_folder}")
+
+    return len(outputs)
@@ -0,0 +1,352 @@
+import os
+import re
+import logging
+import unicodedata
+from enum import Enum
+from collections import defaultdict
+
+from jobs import Job, parse_participant_sensor
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+class Stage(Enum):
+    CONVERTER = 'converter.py'
+    WINDOWED = 'windowed.py'
+    WINDOWED_METS = 'windowing_mets.py'
+    AGGREGATOR = 'aggregator.py'
+    TRAINER = 'trainer.py'
+    TESTER = 'tester.py'
+
+def to_ascii(text):
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode()
+
+def container_name(text):
+    # docker container names only allow [a-zA-Z0-9_.-]
+    return re.sub(r'[^a-zA-Z0-9_.-]', '-', to_ascii(text))
+
+def stage_job_name(python_module, name):
+    # the converter and windowed jobs of a file share its name, the stage keeps their logs, profiles and journal rows apart
+    return container_name(os.path.splitext(os.path.basename(python_module))[0] + '_' + name)
+
+def split_values(text):
+    return [value.strip() for value in text.split(',') if value.strip()]
+
+def participants_file_path():
+    # the aggregator always mounts the participants file from the working directory
+    return os.path.join(os.getcwd(), 'participants.txt')
+
+def read_participant_codes(path):
+    """Read the participant codes listed in a participants file, separated by spaces, commas or lines
+
+    Returns:
+      List[str]: the participant codes in file order without duplicates, empty if the file does not exist
+    """
+    try:
+        with open(path) as f:
+            text = f.read()
+    except FileNotFoundError:
+        return []
+
+    return list(dict.fromkeys(token for token in re.split(r'[\s,;]+', text) if token))
+
+def select_jobs(jobs, participants=None, sensors=None):
+    """Keep the jobs of the selected participants and sensors
+
+    Args:
+      participants (Set[str]): participant codes, None to keep every participant
+      sensors (Set[str]): sensors, None to keep every sensor
+
+    Returns:
+      List[Job]: the selected jobs in plan order
+    """
+    return [
+        job for job in jobs
+        if (participants is None or job.participant in participants) and (sensors is None or job.sensor in sensors)
+    ]
+
+def load_participants_not_time_off():
+    """Load the csv not time off file to detect imcompleted participants
+
+    Returns:
+      Dict[Tuple[str, str], Tuple[str, str]]: (sample, time) of the walking usual
+      speed calibration by (participant code, sensor), first row for duplicated keys
+    """
+    # pandas is only loaded by the windowed step
+    import pandas as pd
+
+    csv_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "participants_not_time_off.csv")
+
+    df_participants_not_time_off = pd.read_csv(csv_path, dtype=str)
+    df_participants_not_time_off = df_participants_not_time_off.drop_duplicates(
+        subset=list(df_participants_not_time_off.columns[:2]), keep='first')
+
+    return dict(zip(
+        zip(df_participants_not_time_off.iloc[:, 0], df_participants_not_time_off.iloc[:, 1]),
+        zip(df_participants_not_time_off['sample'], df_participants_not_time_off['time'])
+    ))
+
+def group_participant_files(input_files):
+    # group input files in participant groups from activity excel and csv input files
+    participants = defaultdict(list)
+
+    for participant, filename in input_files:
+        participants[participant].append(filename)
+
+    return participants
+
+def converter_jobs(args, input_files, python_module=Stage.CONVERTER.value):
+    jobs = []
+    for file in input_files:
+        _logger.info('Planning file: ' + file[1])
+
+        # Define the container volume mapping
+        volumes = {
+            file[0]: {
+                'bind': '/app/data',
+                'mode': 'rw'
+            }
+        }
+
+        # Define the container command
+        command = [
+            'python', python_module,
+            '--bin-matrix-PMP', 'data/' + file[1]
+        ]
+
+        # the converter exports the csv file next to the BIN file
+        name = os.path.splitext(file[1])[0]
+        inputs = [os.path.join(file[0], file[1])]
+        outputs = [os.path.join(file[0], name + '.csv')]
+        participant_code, sensor_id = parse_participant_sensor(file[1])
+
+        jobs.append(Job(stage_job_name(python_module, name), command, volumes, inputs, outputs, participant_code, sensor_id, python_module))
+
+    return jobs
+
+def windowed_jobs(args, input_files, participants_not_time_off, python_module=Stage.WINDOWED.value):
+    participants = group_participant_files(input_files)
+
+    # create the container from participant groups
+    jobs = []
+    for participant_path, files in participants.items():
+        _logger.info('Planning participant: ' + participant_path)
+
+        # Identify the .xlsx file
+        activity_files = [f for f in files if f.endswith('.xlsx')]
+        csv_files = [f for f in files if f.endswith('.csv')]
+
+        if len(activity_files) == 1 and len(csv_files) > 0:
+            activity_file = activity_files[0]
+
+            for csv_file in csv_files:
+                _logger.info(f"{activity_file} with {csv_file}")
+
+                # get name and extension from input csv file
+                name, extension = os.path.splitext(csv_file)
+
+                # check if the participant has not time off issue
+                participant_code = name.split('_')[0]
+                participant_id = participant_code[3:]
+                sensor_id = name.split('_')[2]
+
+                # Define the container volume mapping
+                volumes = {
+                    participant_path: {
+                        'bind': '/app/data',
+                        'mode': 'rw'
+                    }
+                }
+
+                # Define the container command
+                export_name = 'data_' + participant_id + '_tot_' + sensor_id
+                command = [
+                    'python', python_module,
+                    '--csv-matrix-PMP', 'data/' + csv_file,
+                    '--activity-PMP', 'data/' + activity_file,
+                    #'--export-folder-name', 'data/' + name + '.npz',
+                    '--export-folder-name', 'data/' + export_name + '.npz',
+                ]
+
+                inputs = [os.path.join(participant_path, csv_file), os.path.join(participant_path, activity_file)]
+                outputs = [os.path.join(participant_path, export_name + '.npz')]
+
+                if args.make_feature_extractions == True:
+                    command.append('--make-feature-extractions')
+                    outputs.append(os.path.join(participant_path, export_name + '_features.npz'))
+
+                participant_not_time_off = participants_not_time_off.get((participant_code, sensor_id))
+
+                if participant_not_time_off is not None:
+                    command.append('--has-timeoff')
+                    command.append('False')
+                    command.append('--calibrate-with-start-WALKING-USUAL-SPEED')
+                    command.append(participant_not_time_off[0])
+                    command.append('--start-time-WALKING-USUAL-SPEED')
+                    command.append(participant_not_time_off[1])
+
+                jobs.append(Job(stage_job_name(python_module, name), command, volumes, inputs, outputs, participant_code, sensor_id, python_module))
+
+    return jobs
+
+def windowed_mets_jobs(args, input_files, python_module=Stage.WINDOWED_METS.value):
+    participants = group_participant_files(input_files)
+
+    # create the container from participant groups
+    jobs = []
+    for participant_path, files in participants.items():
+        _logger.info('Planning participant: ' + participant_path)
+
+        # Identify the .xlsx file
+        activity_reposo_files = [f for f in files if "_REPOSO_" in f]
+        activity_treadmill_files = [f for f in files if "_TREADMILL_" in f]
+        activity_sts_files = [f for f in files if "_STS_" in f]
+        activity_gxt_files = [f for f in files if "_GXT_" in f]
+
+        npz_files = [f for f in files if f.endswith('features.npz')]
+
+        if len(activity_reposo_files) == 1 and len(activity_treadmill_files) == 1 and len(activity_sts_files) == 1 and len(activity_gxt_files) == 1 and len(npz_files) > 0:
+            for npz_file in npz_files:
+                _logger.info(f"{npz_file}")
+
+                # get name and extension from input csv file
+                name, extension = os.path.splitext(npz_file)
+
+                # Define the container volume mapping
+                volumes = {
+                    participant_path: {
+                        'bind': '/app/data',
+                        'mode': 'rw'
+                    }
+                }
+
+                # Define the container command
+                command = [
+                    'python', python_module,
+                    '--ruta-datos-features', 'data/' + npz_file,
+                    '--ruta-excel-fase-reposo', 'data/' + activity_reposo_files[0],
+                    '--ruta-excel-tapiz-rodante', 'data/' + activity_treadmill_files[0],
+                    '--ruta-excel-sts', 'data/' + activity_sts_files[0],
+                    '--ruta-excel-incremental', 'data/' + activity_gxt_files[0],
+                ]
+
+                inputs = [os.path.join(participant_path, f) for f in [npz_file, activity_reposo_files[0], activity_treadmill_files[0], activity_sts_files[0], activity_gxt_files[0]]]
+
+                # features files are named data_<participant id>_tot_<sensor>_features.npz
+                tokens = name.split('_')
+                participant_code = 'PMP' + tokens[1] if len(tokens) > 3 else None
+                sensor_id = tokens[3] if len(tokens) > 3 else None
+
+                jobs.append(Job(stage_job_name(python_module, name), command, volumes, inputs, participant=participant_code, sensor=sensor_id, stage=python_module))
+
+    return jobs
+
+def aggregator_job(args, python_module=Stage.AGGREGATOR.value, participant_file_path=None, case_id_folder_path=None):
+    # get container volume paths
+    dataset_folder_path = args.dataset_folder
+    participant_file_path = participant_file_path or participants_file_path()
+    case_id_folder_path = case_id_folder_path or args.case_id_folder
+
+    # Define the container volume mapping
+    volumes = {
+        dataset_folder_path: {
+            'bind': '/app/data/input',
+            'mode': 'rw'
+        },
+        participant_file_path: {
+            'bind': '/app/participants.txt',
+            'mode': 'rw'
+        },
+        case_id_folder_path: {
+            'bind': '/app/data/output',
+            'mode': 'rw'
+        }
+    }
+
+    # Define the container command
+    command = [
+        'python', python_module,
+        '--case-id', args.case_id,
+        '--ml-models', args.ml_models,
+        '--dataset-folder', 'data/input',
+        '--participants-file', 'participants.txt',
+        '--ml-sensors', args.ml_sensors,
+        '--case-id-folder', 'data/output'
+    ]
+
+    return Job(container_name('aggregator_' + args.case_id), command, volumes, stage=python_module)
+
+def trainer_job(args, python_module=Stage.TRAINER.value, case_id=None, ml_models=None):
+    case_id = case_id or args.case_id
+    ml_models = ml_models or args.ml_models
+
+    # get container volume paths
+    dataset_folder_path = args.dataset_folder
+    case_id_folder_path = args.case_id_folder
+
+    # Define the container volume mapping
+    volumes = {
+        dataset_folder_path: {
+            'bind': '/app/data/input',
+            'mode': 'rw'
+        },
+        case_id_folder_path: {
+            'bind': '/app/data/output',
+            'mode': 'rw'
+        }
+    }
+
+    # Define the container command
+    command = [
+        'python', python_module,
+        '--case-id', case_id,
+        '--dataset-folder', 'data/input',
+        '--ml-models', ml_models,
+        '--case-id-folder', 'data/output',
+        "--training-percent", args.training_percent
+    ]
+
+    return Job(container_name('trainer_' + case_id), command, volumes, stage=python_module)
+
+def tester_job(args, python_module=Stage.TESTER.value, case_id=None, ml_models=None):
+    case_id = case_id or args.case_id
+    ml_models = ml_models or args.ml_models
+
+    # get container volume paths
+    case_id_folder_path = args.case_id_folder
+
+    # Define the container volume mapping
+    volumes = {
+        case_id_folder_path: {
+            'bind': '/app/data/output',
+            'mode': 'rw'
+        }
+    }
+
+    # Define the container command
+    command = [
+        'python', python_module,
+        '--case-id', case_id,
+        '--case-id-folder', 'data/output',
+        '--ml-models', ml_models,
+        "--training-percent", args.training_percent
+    ]
+
+    return Job(container_name('tester_' + case_id), command, volumes, stage=python_module)
+
+def fan_out_jobs(args, job_builder, python_module):
+    """One job per (case id, ML model) combination of the comma separated case-id and ml-models
+
+    Every job gets a unique container name, so all of them can run at the same time.
+    """
+    jobs = []
+    for case_id in split_values(args.case_id):
+        for ml_model in split_values(args.ml_models):
+            job = job_builder(args, python_module, case_id, ml_model)
+            job.name = container_name(job.name + '_' + ml_model)
+            jobs.append(job)
+
+    return jobs
@@ -0,0 +1,232 @@
+import os
+import uuid
+import shutil
+import logging
+import threading
+from dataclasses import replace
+
+from jobs import JobMonitor, JobResult
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+SCRATCH_PREFIX = 'executor-'
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    return True
+
+def clean_scratch(scratch_folder):
+    """Remove the scratch folders left by executor processes no longer running
+
+    Returns:
+      int: number of removed folders
+    """
+    removed = 0
+    for entry in os.scandir(scratch_folder):
+        if not entry.is_dir() or not entry.name.startswith(SCRATCH_PREFIX):
+            continue
+
+        try:
+            pid = int(entry.name[len(SCRATCH_PREFIX):])
+        except ValueError:
+            continue
+
+        if pid != os.getpid() and not process_alive(pid):
+            _logger.warning(f"Removing scratch folder {entry.path} left by a crashed run")
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+
+    return removed
+
+def stage_file(source, target):
+    # hard link when the scratch is on the same file system, copy otherwise
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+def publish_file(source, target):
+    """Move a staged output next to its target and rename it, so the target appears at once complete"""
+    tmp_target = f"{target}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        shutil.copy2(source, tmp_target)
+        os.replace(tmp_target, target)
+    finally:
+        if os.path.exists(tmp_target):
+            os.remove(tmp_target)
+
+class StagedJobMonitor(JobMonitor):
+    """Forward the events of the runner wrapped by a staging area but the end of the job
+
+    The staging area reports the end of every job itself, once its outputs are
+    published, so each job gets exactly one job_finished.
+    """
+    def __init__(self, monitor):
+        self.monitor = monitor
+
+    def job_queued(self, job):
+        self.monitor.job_queued(job)
+
+    def job_started(self, job, container):
+        self.monitor.job_started(job, container)
+
+class StagingArea:
+    """Run the jobs against a copy of their input files in a fast local scratch folder
+
+    Every staged job gets its own scratch folder per volume holding its input
+    files, hard linked or copied. The job runs with its volumes mounted from
+    there and, when it succeeds, its declared outputs are published back to
+    the dataset folder. A job starts only when its scratch reservation (inputs
+    plus the same size for outputs) fits in the scratch limit, a job bigger
+    than the limit waits to be staged alone. Jobs without declared inputs or
+    outputs run in the dataset folder as usual.
+
+    Args:
+      scratch_folder (str): local NVMe or tmpfs folder
+      limit_bytes (int): maximum scratch space used at the same time, None for no limit
+      monitors (List[JobMonitor]): observers notified when each job finishes, with its outputs published
+    """
+    def __init__(self, scratch_folder, limit_bytes=None, monitors=()):
+        self.scratch_folder = os.path.abspath(scratch_folder)
+        self.limit_bytes = limit_bytes
+        self.monitors = monitors
+        self.used_bytes = 0
+        self.condition = threading.Condition()
+        self.folder = os.path.join(self.scratch_folder, f"{SCRATCH_PREFIX}{os.getpid()}")
+
+    def start(self):
+        os.makedirs(self.scratch_folder, exist_ok=True)
+        clean_scratch(self.scratch_folder)
+        os.makedirs(self.folder, exist_ok=True)
+
+        return self
+
+    def stop(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _reserve(self, size):
+        with self.condition:
+            if self.limit_bytes is not None:
+                self.condition.wait_for(lambda: self.used_bytes == 0 or self.used_bytes + size <= self.limit_bytes)
+
+            self.used_bytes += size
+
+    def _release(self, size):
+        with self.condition:
+            self.used_bytes -= size
+            self.condition.notify_all()
+
+    def _stage_volumes(self, job, job_folder):
+        """Stage the input files of every volume folder, returning the staged volumes and folders"""
+        volumes = {}
+        staged = {}
+        for position, (path, bind) in enumerate(job.volumes.items()):
+            inputs = [file for file in job.inputs if os.path.dirname(os.path.abspath(file)) == os.path.abspath(path)]
+
+            if not inputs:
+                volumes[path] = bind
+                continue
+
+            staged_path = os.path.join(job_folder, str(position))
+            os.makedirs(staged_path)
+
+            # the container user must be able to write to the staged folder as to the dataset one
+            stat = os.stat(path)
+            os.chmod(staged_path, stat.st_mode & 0o7777)
+            try:
+                os.chown(staged_path, stat.st_uid, stat.st_gid)
+            except PermissionError as e:
+                _logger.warning(f"Job {job.name} staged folder {staged_path} could not be given the owner of {path} "
+                                f"(uid {stat.st_uid}, gid {stat.st_gid}), the container may not be able to write its outputs: {e}")
+
+            for file in inputs:
+                stage_file(file, os.path.join(staged_path, os.path.basename(file)))
+
+            volumes[staged_path] = bind
+            staged[os.path.abspath(path)] = staged_path
+
+        return volumes, staged
+
+    def runner_monitors(self):
+        """Monitors of the runner to be wrapped, which must not report the end of the jobs"""
+        return [StagedJobMonitor(monitor) for monitor in self.monitors]
+
+    def wrap(self, runner):
+        """Wrap a job runner, built with the runner_monitors, to run the jobs in the scratch folder
+
+        Returns:
+          Callable[[Job], JobResult]: the staging runner
+        """
+        def run(job):
+            result = None
+            try:
+                result = self._run_staged(runner, job)
+            except Exception as e:
+                _logger.error(f"Unexpected error staging {job.name}: {e}")
+                result = JobResult(job.name, False, error=f"Staging failed: {e}")
+            finally:
+                if result is not None:
+                    for monitor in self.monitors:
+                        monitor.job_finished(job, result)
+
+            return result
+
+        return run
+
+    def _run_staged(self, runner, job):
+        if not job.inputs or not job.outputs:
+            return runner(job)
+
+        size = 2 * sum(os.path.getsize(file) for file in job.inputs if os.path.exists(file))
+        job_folder = os.path.join(self.folder, f"{job.name}-{uuid.uuid4().hex[:8]}")
+
+        self._reserve(size)
+        try:
+            try:
+                volumes, staged = self._stage_volumes(job, job_folder)
+            except OSError as e:
+                _logger.error(f"Job {job.name} inputs could not be staged: {e}")
+                return JobResult(job.name, False, error=f"Staging failed: {e}")
+
+            result = runner(replace(job, volumes=volumes))
+
+            if result.succeeded:
+                result = self._publish(job, staged, result)
+
+            return result
+        finally:
+            shutil.rmtree(job_folder, ignore_errors=True)
+            self._release(size)
+
+    def _publish(self, job, staged, result):
+        for output in job.outputs:
+            staged_path = staged.get(os.path.dirname(os.path.abspath(output)))
+            staged_output = None if staged_path is None else os.path.join(staged_path, os.path.basename(output))
+
+            if staged_output is None or not os.path.exists(staged_output):
+                _logger.error(f"Job {job.name} did not write its output {output}")
+                return JobResult(job.name, False, status_code=result.status_code, error=f"Output {output} not written")
+
+            try:
+                publish_file(staged_output, output)
+            except OSError as e:
+                _logger.error(f"Job {job.name} output {output} could not be published: {e}")
+                return JobResult(job.name, False, status_code=result.status_code, error=f"Publishing failed: {e}")
+
+        return result
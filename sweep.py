@@ -0,0 +1,236 @@
+import os
+import csv
+import json
+import fnmatch
+import logging
+import argparse
+import itertools
+from dataclasses import dataclass
+
+from stages import aggregator_job, container_name, split_values, tester_job, trainer_job
+
+__author__ = "Miguel Angel Salinas Gancedo"
+__copyright__ = "Simur"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+# the case folder also holds the aggregated datasets, larger csv files are never metrics
+MAX_METRICS_FILE_BYTES = 1024**2
+
+@dataclass
+class SweepCase:
+    """One combination of the sweep grid, trained and tested under its own case id"""
+    case_id: str
+    training_percent: str
+    ml_models: str
+    ml_sensors: str
+
+def load_sweep(path):
+    """Load a sweep specification from a TOML or JSON file
+
+    The specification holds the case id prefix and the grid values, model and
+    sensor sets are comma separated strings::
+
+        case_id = "sweep_01"
+        training_percents = [60, 70, 80]
+        ml_models = ["RandomForest", "ESANN,XGBoost"]
+        ml_sensors = ["thigh", "thigh,wrist"]
+    """
+    if path.endswith('.toml'):
+        import tomllib
+
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+
+    with open(path) as f:
+        spec = json.load(f)
+
+    if not isinstance(spec, dict):
+        raise Exception(f"Sweep file {path} must hold an object with the grid values")
+
+    return spec
+
+def grid_sets(spec, key, default):
+    """Comma separated sets of a grid key, the executor argument when the specification has none"""
+    values = spec.get(key, [default] if default is not None else [])
+
+    if not isinstance(values, list) or not values:
+        raise Exception(f"The sweep needs a list of {key} in the sweep file or --{key.replace('_', '-')}")
+
+    for value in values:
+        if not isinstance(value, str) or not split_values(value):
+            raise Exception(f"Invalid {key} set {value!r} in the sweep, expected a comma separated string")
+
+    return [','.join(split_values(value)) for value in values]
+
+def expand_sweep(spec, args):
+    """Expand the sweep grid into one case per combination, with a unique case id each
+
+    Grid values missing in the specification are taken from the executor arguments.
+    """
+    prefix = spec.get('case_id', args.case_id or 'sweep')
+    training_percents = [str(value) for value in spec.get('training_percents', [args.training_percent])]
+    ml_models = grid_sets(spec, 'ml_models', args.ml_models)
+    ml_sensors = grid_sets(spec, 'ml_sensors', args.ml_sensors)
+
+    cases = []
+    for training_percent, models, sensors in itertools.product(training_percents, ml_models, ml_sensors):
+        case_id = container_name(f"{prefix}_tp{training_percent}_{models.replace(',', '-')}_{sensors.replace(',', '-')}")
+        cases.append(SweepCase(case_id, training_percent, models, sensors))
+
+    # two cases in the same case folder would overwrite their outputs
+    case_ids = [case.case_id for case in cases]
+    duplicated = sorted({case_id for case_id in case_ids if case_ids.count(case_id) > 1})
+    if duplicated:
+        raise Exception(f"Sweep cases with the same case id: {', '.join(duplicated)}")
+
+    return cases
+
+def case_args(args, case):
+    """Executor arguments of one sweep case"""
+    return argparse.Namespace(**{
+        **vars(args),
+        'case_id': case.case_id,
+        'training_percent': case.training_percent,
+        'ml_models': case.ml_models,
+        'ml_sensors': case.ml_sensors,
+    })
+
+def sweep_chains(args, cases):
+    """aggregator -> trainer -> tester jobs of every case, the sensors are selected when aggregating"""
+    chains = []
+    for case in cases:
+        arguments = case_args(args, case)
+        chains.append([aggregator_job(arguments), trainer_job(arguments), tester_job(arguments)])
+
+    return chains
+
+def parse_number(text):
+    """Integer or float value of a CSV cell, None when it is not a number"""
+    for number in (int, float):
+        try:
+            return number(text)
+        except ValueError:
+            pass
+
+    return None
+
+def json_metrics(path, stem):
+    """Numeric values of a JSON object, by <file name>.<key>"""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(data, dict):
+        return {}
+
+    return {
+        f"{stem}.{key}": value for key, value in data.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    }
+
+def csv_metrics(path, stem):
+    """Numeric cells of a metrics or classification report CSV file
+
+    Rows labelled by their first cell, like the accuracy, macro avg or class
+    rows of a classification report, give <file name>.<label>.<column>
+    values. A first column without header, the index written by pandas, is
+    always a label even for numeric class labels. The cells of unlabelled
+    rows, like a single row of metrics, give <file name>.<column> values.
+    """
+    try:
+        with open(path, newline='') as f:
+            rows = list(csv.reader(f))
+    except (OSError, csv.Error, UnicodeDecodeError):
+        return {}
+
+    if len(rows) < 2:
+        return {}
+
+    header, rows = rows[0], rows[1:]
+    indexed = not header[0].strip()
+
+    metrics = {}
+    for position, row in enumerate(rows):
+        if not row:
+            continue
+
+        labelled = indexed or parse_number(row[0]) is None
+        label = row[0].strip() if labelled else (str(position) if len(rows) > 1 else None)
+
+        for column, cell in zip(header[1:] if labelled else header, row[1:] if labelled else row):
+            value = parse_number(cell.strip())
+            if value is None or not column.strip():
+                continue
+
+            key = f"{stem}.{label}.{column.strip()}" if label is not None else f"{stem}.{column.strip()}"
+            metrics[key] = value
+
+    return metrics
+
+def case_metrics(case_folder, patterns):
+    """Metrics of the tester output files of a case, the JSON and CSV files matching the patterns
+
+    Returns:
+      Dict[str, float]: metric values by <file name>.<key>
+    """
+    metrics = {}
+
+    for root, _, files in os.walk(case_folder):
+        for file in sorted(files):
+            path = os.path.join(root, file)
+            if not any(fnmatch.fnmatch(file, pattern) for pattern in patterns):
+                continue
+
+            stem = os.path.splitext(file)[0]
+            if file.endswith('.json'):
+                metrics.update(json_metrics(path, stem))
+            elif file.endswith('.csv') and os.path.getsize(path) <= MAX_METRICS_FILE_BYTES:
+                metrics.update(csv_metrics(path, stem))
+
+    return metrics
+
+def write_comparison(args, cases, chains, results, path):
+    """Write one row per case with the status of its jobs and the metrics found in its case folder
+
+    Returns:
+      List[str]: case ids whose tester succeeded without writing any metrics
+    """
+    status = {result.name: 'succeeded' if result.succeeded else 'failed' for result in results}
+    patterns = [pattern.strip() for pattern in args.sweep_metrics_files.split(',') if pattern.strip()]
+
+    missing = []
+
+    rows = []
+    for case, chain in zip(cases, chains):
+        row = {
+            'case_id': case.case_id,
+            'training_percent': case.training_percent,
+            'ml_models': case.ml_models,
+            'ml_sensors': case.ml_sensors,
+        }
+        for job in chain:
+            row[os.path.splitext(job.stage)[0]] = status.get(job.name, 'skipped')
+
+        metrics = case_metrics(os.path.join(args.case_id_folder, case.case_id), patterns)
+        if not metrics and status.get(chain[-1].name) == 'succeeded':
+            missing.append(case.case_id)
+
+        row.update(metrics)
+        rows.append(row)
+
+    fields = []
+    for row in rows:
+        fields.extend(field for field in row if field not in fields)
+
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    _logger.info(f"Sweep comparison of {len(rows)} cases written to {path}")
+
+    return missing
@@ -0,0 +1,8 @@
+import pytest
+
+@pytest.fixture(autouse=True)
+def state_home(tmp_path, monkeypatch):
+    """Keep the run journals of the tests out of the user state directory"""
+    monkeypatch.setenv('XDG_STATE_HOME', str(tmp_path / 'state'))
+
+    return tmp_path / 'state'
@@ -0,0 +1,91 @@
+"""Fake docker client and synthetic dataset shared by the tests and the benchmarks"""
+import os
+import time
+import threading
+
+SENSORS = ['PI', 'M', 'C']
+
+class FakeContainer:
+    """Container of the fake client: sleeps while its logs are followed and exits with a fixed code"""
+    def __init__(self, name, duration, status_code):
+        self.name = name
+        self.id = name
+        self.duration = duration
+        self.status_code = status_code
+        self.attrs = {'State': {'OOMKilled': False}}
+
+    def logs(self, stream=True, follow=True):
+        time.sleep(self.duration)
+        yield f"{self.name} finished\n".encode()
+
+    def wait(self):
+        return {'StatusCode': self.status_code}
+
+    def reload(self):
+        pass
+
+    def stats(self, stream=True, decode=True):
+        return iter(())
+
+    def remove(self, v=False, force=False):
+        pass
+
+class FakeContainers:
+    def __init__(self, client):
+        self.client = client
+
+    def run(self, name=None, **kwargs):
+        with self.client.lock:
+            self.client.started += 1
+
+        return FakeContainer(name, self.client.durations.get(name, 0.0), self.client.status_codes.get(name, 0))
+
+class FakeClient:
+    """Docker client replacement running every job as a FakeContainer
+
+    Args:
+      durations (Dict[str, float]): seconds each job container runs, by job name
+      status_codes (Dict[str, int]): exit code of each job container, 0 if missing
+    """
+    def __init__(self, durations, status_codes):
+        self.durations = durations
+        self.status_codes = status_codes
+        self.containers = FakeContainers(self)
+        self.lock = threading.Lock()
+        self.started = 0
+
+def write_sparse_file(path, size):
+    with open(path, 'wb') as f:
+        f.truncate(size)
+
+def generate_dataset(root, participants, file_size, rng):
+    """Generate a synthetic dataset tree with one folder of PMP files per participant
+
+    Returns:
+      int: number of files written
+    """
+    files = 0
+    for i in range(participants):
+        code = f"PMP{1000 + i}"
+        participant_path = os.path.join(root, code)
+        os.makedirs(participant_path)
+
+        names = [f"{code}_RegistroActividades.xlsx"]
+        names += [f"{code}_{activity}_W1.xlsx" for activity in ['REPOSO', 'TREADMILL', 'STS', 'GXT']]
+        for name in names:
+            write_sparse_file(os.path.join(participant_path, name), 0)
+
+        for sensor in SENSORS:
+            size = int(file_size * rng.uniform(0.5, 1.5))
+
+            write_sparse_file(os.path.join(participant_path, f"{code}_W1_{sensor}.BIN"), size)
+            write_sparse_file(os.path.join(participant_path, f"{code}_W1_{sensor}.csv"), size)
+            write_sparse_file(os.path.join(participant_path, f"data_{1000 + i}_tot_{sensor}_features.npz"), size // 10)
+
+        files += len(names) + 3 * len(SENSORS)
+
+        # date the folder back, out of the racy window the dataset index always lists again
+        past = time.time() - 60
+        os.utime(participant_path, (past, past))
+
+    return files
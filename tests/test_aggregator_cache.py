@@ -0,0 +1,91 @@
+import os
+import time
+import argparse
+import threading
+
+import executor
+from aggregator_cache import CASE_ID_PLACEHOLDER, AggregatorCache, aggregator_cache_key, case_path, cached_path
+from jobs import Job, JobResult
+
+def test_only_the_leading_case_id_is_replaced():
+    path = os.path.join('case_a', 'case_a_dataset.npz')
+
+    assert cached_path(path, 'case_a') == os.path.join(CASE_ID_PLACEHOLDER, 'case_a_dataset.npz')
+    assert case_path(cached_path(path, 'case_a'), 'case_b') == os.path.join('case_b', 'case_a_dataset.npz')
+    assert cached_path(os.path.join('other', 'case_a'), 'case_a') == os.path.join('other', 'case_a')
+
+def test_cache_key_depends_on_the_shards():
+    key = lambda shards: aggregator_cache_key(['PMP1001', 'PMP1002'], 'PI', 'RandomForest', 'sha256:image', [], shards=shards)
+
+    assert key([]) != key([['PMP1001'], ['PMP1002']])
+
+def test_cached_output_is_reused_by_another_case(tmp_path):
+    output = tmp_path / 'output'
+    (output / 'case_a').mkdir(parents=True)
+    (output / 'case_a' / 'dataset.npz').write_bytes(b'aggregated')
+
+    cache = AggregatorCache(str(tmp_path / 'cache'))
+    cache.store('key', str(output), 'case_a', [os.path.join('case_a', 'dataset.npz')])
+
+    # the cache keeps its own copy, rewriting the case output never changes it
+    (output / 'case_a' / 'dataset.npz').write_bytes(b'rewritten')
+
+    assert cache.materialize('key', str(output), 'case_b')
+    assert (output / 'case_b' / 'dataset.npz').read_bytes() == b'aggregated'
+    assert not cache.materialize('other', str(output), 'case_c')
+
+    # rewriting a materialized case output in place, as a run without the cache does, never changes the cache
+    with open(output / 'case_b' / 'dataset.npz', 'r+b') as f:
+        f.write(b'rewritten!')
+
+    assert os.stat(output / 'case_b' / 'dataset.npz').st_nlink == 1
+    assert cache.materialize('key', str(output), 'case_d')
+    assert (output / 'case_d' / 'dataset.npz').read_bytes() == b'aggregated'
+
+class FakeRuntime:
+    def image(self, image):
+        return 'sha256:fake'
+
+def test_concurrent_cases_with_the_same_key_aggregate_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'participants.txt').write_text('PMP1001,PMP1002')
+    (tmp_path / 'dataset' / 'PMP1001').mkdir(parents=True)
+
+    aggregations = []
+
+    def execute_aggregator_jobs(args, runtime, jobs, logs=None, monitors=(), staging=None):
+        aggregations.append(args.case_id)
+        time.sleep(0.2)
+
+        (tmp_path / 'output' / args.case_id).mkdir(parents=True)
+        (tmp_path / 'output' / args.case_id / 'dataset.npz').write_bytes(b'aggregated')
+
+        return [JobResult(job.name, True, status_code=0) for job in jobs]
+
+    monkeypatch.setattr(executor, 'execute_aggregator_jobs', execute_aggregator_jobs)
+
+    def case_args(case_id, training_percent):
+        return argparse.Namespace(
+            aggregator_cache_folder=str(tmp_path / 'cache'), aggregator_cache_limit='1g',
+            dataset_folder=str(tmp_path / 'dataset'), index_file=str(tmp_path / 'index.json'),
+            aggregator_shards=1, ml_sensors='PI', ml_models='RandomForest', docker_image='image',
+            content_hash=False, case_id_folder=str(tmp_path / 'output'), case_id=case_id,
+            training_percent=training_percent,
+        )
+
+    results = {}
+
+    def run(case_id, training_percent):
+        job = Job(f"aggregator_{case_id}", [], {})
+        results[case_id] = executor.execute_container_by_agregator(case_args(case_id, training_percent), FakeRuntime(), [job])
+
+    threads = [threading.Thread(target=run, args=(f"case_tp{percent}", percent)) for percent in (60, 70, 80)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(aggregations) == 1
+    assert all(result[0].succeeded for result in results.values())
+    for percent in (60, 70, 80):
+        assert (tmp_path / 'output' / f"case_tp{percent}" / 'dataset.npz').read_bytes() == b'aggregated'
@@ -0,0 +1,26 @@
+import pytest
+
+from batching import batch_command
+from jobs import Job
+from stages import converter_jobs
+
+def test_batch_command_rebases_the_participant_files(tmp_path):
+    participant_folder = tmp_path / 'PMP1002'
+    job, = converter_jobs(None, [(str(participant_folder), 'PMP1002_W1_PI.BIN')])
+
+    assert batch_command(job, str(tmp_path)) == ['python', 'converter.py', '--bin-matrix-PMP', 'dataset/PMP1002/PMP1002_W1_PI.BIN']
+
+def test_batch_command_rebases_whole_path_components_only(tmp_path):
+    job = Job('job', ['python', 'windowed.py', 'data', 'data/file.csv', 'database/file.csv'], {
+        str(tmp_path / 'PMP1002'): {'bind': '/app/data', 'mode': 'rw'},
+    })
+
+    assert batch_command(job, str(tmp_path)) == ['python', 'windowed.py', 'dataset/PMP1002', 'dataset/PMP1002/file.csv', 'database/file.csv']
+
+def test_batch_command_rejects_mounts_outside_the_dataset(tmp_path):
+    job = Job('job', ['python', 'converter.py'], {
+        str(tmp_path.parent / 'other'): {'bind': '/app/data', 'mode': 'rw'},
+    })
+
+    with pytest.raises(ValueError, match='outside the dataset folder'):
+        batch_command(job, str(tmp_path))
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from catalog import build_catalog, inspect_npz, parse_windowed_name
+from dataset_index import build_dataset_index
+
+def test_parse_windowed_name():
+    assert parse_windowed_name('data_1002_tot_PI.npz') == ('PMP1002', 'PI')
+    assert parse_windowed_name('PMP1002_W1_PI.BIN') == (None, None)
+
+@pytest.mark.parametrize('save', [np.savez, np.savez_compressed])
+def test_inspect_npz_reads_the_array_headers(tmp_path, save):
+    path = tmp_path / 'data_1002_tot_PI.npz'
+    save(path, features=np.zeros((20, 3)), labels=np.array(['walk', 'sit']), window=np.int32(30))
+
+    status, arrays = inspect_npz(str(path))
+
+    assert status == 'ok'
+    assert sorted(arrays) == [
+        ('features', '<f8', (20, 3), 480),
+        ('labels', '<U4', (2,), 32),
+        ('window', '<i4', (), 4),
+    ]
+
+def test_inspect_npz_of_object_arrays_has_no_bytes(tmp_path):
+    path = tmp_path / 'data_1002_tot_PI.npz'
+    np.savez(path, objects=np.array([{'a': 1}, None], dtype=object))
+
+    assert inspect_npz(str(path)) == ('ok', [('objects', '|O', (2,), None)])
+
+def test_inspect_npz_finds_truncated_files(tmp_path):
+    path = tmp_path / 'data_1002_tot_PI.npz'
+    np.savez(path, features=np.zeros((1000, 3)))
+    data = path.read_bytes()
+
+    path.write_bytes(data[:len(data) // 2])
+    assert inspect_npz(str(path))[0] == 'truncated'
+
+    path.write_bytes(b'')
+    assert inspect_npz(str(path))[0] == 'truncated'
+
+def test_catalog_problems_and_participant_bytes(tmp_path):
+    participant = tmp_path / 'dataset' / 'PMP1002'
+    participant.mkdir(parents=True)
+    np.savez(participant / 'data_1002_tot_PI.npz', features=np.zeros((10, 2)))
+    (participant / 'data_1002_tot_M.npz').write_bytes(b'PK\x03\x04 broken')
+
+    index = build_dataset_index(str(tmp_path / 'dataset'), str(tmp_path / 'index.json'))
+    catalog = build_catalog(index, str(tmp_path / 'catalog.csv'))
+
+    assert catalog.participant_bytes(sensors=['PI']) == {'PMP1002': 160}
+    assert catalog.problems(['PMP1002'], ['PI']) == []
+    assert catalog.problems(['PMP1002'], ['PI', 'M', 'C']) == [
+        f"{participant / 'data_1002_tot_M.npz'} is truncated",
+        'Windowed output of PMP1002 sensor C not found',
+    ]
@@ -0,0 +1,87 @@
+import os
+import time
+
+import dataset_index
+from dataset_index import FileKind, build_dataset_index, skip_unselected_participants
+
+def make_dataset(tmp_path):
+    root = tmp_path / 'dataset'
+    for participant in ('PMP1001', 'PMP1002'):
+        folder = root / participant
+        folder.mkdir(parents=True)
+        (folder / f"{participant}_W1_PI.BIN").write_bytes(b'')
+        (folder / f"{participant}_RegistroActividades.xlsx").write_bytes(b'')
+
+    return root
+
+def index_file(tmp_path):
+    # outside the dataset, saving the index changes the mtime of its folder
+    return str(tmp_path / 'index.json')
+
+def age(root, seconds=60):
+    """Date every directory in the past, out of the racy mtime window of the next scan"""
+    past_ns = time.time_ns() - seconds * 10**9
+    for directory, _, _ in os.walk(root):
+        os.utime(directory, ns=(past_ns, past_ns))
+
+def count_listings(monkeypatch):
+    listed = []
+    list_directory = dataset_index.list_directory
+
+    def counting_list_directory(directory):
+        listed.append(os.path.basename(directory))
+        return list_directory(directory)
+
+    monkeypatch.setattr(dataset_index, 'list_directory', counting_list_directory)
+
+    return listed
+
+def test_index_classifies_the_files(tmp_path):
+    root = make_dataset(tmp_path)
+
+    index = build_dataset_index(str(root), index_file(tmp_path))
+
+    assert index.files(FileKind.BIN) == [
+        (str(root / 'PMP1001'), 'PMP1001_W1_PI.BIN'),
+        (str(root / 'PMP1002'), 'PMP1002_W1_PI.BIN'),
+    ]
+    assert index.participant_files(str(root / 'PMP1002'), FileKind.ACTIVITY) == ['PMP1002_RegistroActividades.xlsx']
+
+def test_index_lists_again_only_the_changed_directories(tmp_path, monkeypatch):
+    root = make_dataset(tmp_path)
+    age(root)
+    build_dataset_index(str(root), index_file(tmp_path))
+
+    listed = count_listings(monkeypatch)
+    build_dataset_index(str(root), index_file(tmp_path))
+    assert listed == []
+
+    (root / 'PMP1002' / 'PMP1002_W1_PI.csv').write_bytes(b'')
+    index = build_dataset_index(str(root), index_file(tmp_path))
+
+    assert listed == ['PMP1002']
+    assert (str(root / 'PMP1002'), 'PMP1002_W1_PI.csv') in index.files(FileKind.CSV)
+
+def test_index_lists_again_the_directories_changed_just_before_the_scan(tmp_path, monkeypatch):
+    root = make_dataset(tmp_path)
+    build_dataset_index(str(root), index_file(tmp_path))
+
+    listed = count_listings(monkeypatch)
+    build_dataset_index(str(root), index_file(tmp_path))
+
+    assert sorted(listed) == ['PMP1001', 'PMP1002', 'dataset']
+
+def test_skipped_participants_keep_their_cached_entries(tmp_path, monkeypatch):
+    root = make_dataset(tmp_path)
+    age(root)
+    build_dataset_index(str(root), index_file(tmp_path))
+
+    index = build_dataset_index(str(root), index_file(tmp_path), skip_directory=skip_unselected_participants(['PMP1002']))
+    assert index.participants() == [str(root / 'PMP1002')]
+
+    listed = count_listings(monkeypatch)
+    index = build_dataset_index(str(root), index_file(tmp_path))
+
+    assert index.participants() == [str(root / 'PMP1001'), str(root / 'PMP1002')]
+    # dated as the cache, the skipped participant is still trusted
+    assert listed == []
@@ -0,0 +1,87 @@
+import random
+import logging
+
+import pytest
+
+from executor import Executor, parse_args, selected_sensors
+from stages import converter_jobs
+from tests.fakes import generate_dataset
+
+def test_dry_run_rejects_the_catalog(tmp_path):
+    executor = Executor.from_options(str(tmp_path), 'image:1.0', 'catalog')
+
+    with pytest.raises(Exception, match='dry run is not available'):
+        executor.dry_run()
+
+def test_planning_logs_no_execution(tmp_path, caplog):
+    caplog.set_level(logging.INFO)
+
+    jobs = converter_jobs(None, [(str(tmp_path), 'PMP1002_W1_PI.BIN')])
+
+    assert [job.name for job in jobs] == ['converter_PMP1002_W1_PI']
+    assert 'Planning file: PMP1002_W1_PI.BIN' in caplog.text
+    assert 'Executing' not in caplog.text
+
+@pytest.mark.parametrize('option', [
+    ['--incremental'],
+    ['--batch'],
+    ['--memory-budget', '64g'],
+    ['--aggregator-shards', '4'],
+    ['--aggregator-cache-folder', '/tmp/cache'],
+    ['--use-catalog'],
+    ['--stream-tester'],
+    ['--docker-hosts', 'unix:///var/run/docker.sock=4'],
+])
+def test_pipeline_rejects_the_options_it_does_not_implement(option, capsys):
+    with pytest.raises(SystemExit):
+        parse_args(['--dataset-folder', 'input', '--docker-image', 'image:1.0', '--python-module', 'pipeline'] + option)
+
+    assert f"{option[0]} not available with the pipeline" in capsys.readouterr().err
+
+def test_pipeline_accepts_the_scratch_folder(tmp_path):
+    args = parse_args([
+        '--dataset-folder', 'input', '--docker-image', 'image:1.0', '--python-module', 'pipeline',
+        '--scratch-folder', str(tmp_path),
+    ])
+
+    assert args.scratch_folder == str(tmp_path)
+
+def test_pipeline_run_rejects_the_options_it_does_not_implement(tmp_path):
+    executor = Executor.from_options(str(tmp_path), 'image:1.0', 'pipeline', use_catalog=True, aggregator_shards=2)
+
+    with pytest.raises(Exception, match='--aggregator-shards, --use-catalog not available with the pipeline'):
+        executor.run()
+
+@pytest.fixture
+def dataset(tmp_path):
+    root = tmp_path / 'input'
+    generate_dataset(str(root), 3, 1024, random.Random(0))
+
+    return root
+
+def planned_converters(dataset, **options):
+    executor = Executor.from_options(str(dataset), 'image:1.0', 'converter.py', **options)
+
+    return sorted(job.name for job in executor.plan())
+
+def test_plan_selects_the_given_participants(dataset, tmp_path):
+    participants_file = tmp_path / 'participants.txt'
+    participants_file.write_text('PMP1002\n')
+
+    names = planned_converters(dataset, participants='PMP1000', participants_file=str(participants_file))
+
+    assert names == [f"converter_{code}_W1_{sensor}" for code in ('PMP1000', 'PMP1002') for sensor in ('C', 'M', 'PI')]
+
+def test_plan_selects_the_sensors_by_code_or_name(dataset):
+    by_code = planned_converters(dataset, sensors='PI,M')
+    by_name = planned_converters(dataset, sensors='thigh, wrist')
+
+    assert by_code == by_name
+    assert by_code == [f"converter_PMP{1000 + index}_W1_{sensor}" for index in range(3) for sensor in ('M', 'PI')]
+
+@pytest.mark.parametrize('sensors', ['ankle', 'PI,chest', ' , '])
+def test_unknown_sensors_are_rejected(sensors):
+    args = parse_args(['--dataset-folder', 'input', '--docker-image', 'image:1.0', '--python-module', 'converter.py', '--sensors', sensors])
+
+    with pytest.raises(Exception, match='sensor'):
+        selected_sensors(args)
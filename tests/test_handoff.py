@@ -0,0 +1,155 @@
+import os
+import time
+import threading
+
+import pytest
+
+from handoff import ArtifactWatcher, Inotify, execute_streamed_testers
+from handoff import TesterHandoff as Handoff
+from jobs import Job, JobMonitor, JobResult
+
+class RecordingMonitor(JobMonitor):
+    def __init__(self):
+        self.events = []
+
+    def job_queued(self, job):
+        self.events.append(('queued', job.name))
+
+    def job_finished(self, job, result):
+        self.events.append(('finished', job.name, result.succeeded))
+
+@pytest.fixture
+def watcher(tmp_path):
+    watcher = ArtifactWatcher(str(tmp_path), stable_seconds=0, poll_interval=0.05)
+    yield watcher
+    watcher.close()
+
+def trainer_and_handoff(pattern='model_*.pkl'):
+    trainer = Job('trainer_rf', ['python', 'trainer.py'], {}, mem_limit=1000)
+    tester = Job('tester_rf', ['python', 'tester.py'], {})
+
+    return trainer, Handoff(tester, trainer.name, pattern)
+
+def test_stable_artifact_starts_the_tester_before_the_trainer_exits(tmp_path, watcher):
+    trainer, handoff = trainer_and_handoff()
+    tester_started = threading.Event()
+    overlapped = []
+
+    def train(job):
+        (tmp_path / 'model_rf.pkl').write_bytes(b'model')
+
+        # the trainer keeps running, writing its report, until the tester started
+        overlapped.append(tester_started.wait(timeout=5))
+        return JobResult(job.name, True, status_code=0)
+
+    def test(job):
+        tester_started.set()
+        return JobResult(job.name, True, status_code=0)
+
+    results = execute_streamed_testers([trainer], [handoff], watcher, train, test, max_workers=2)
+
+    assert overlapped == [True]
+    assert sorted(result.name for result in results) == ['tester_rf', 'trainer_rf']
+
+def test_artifact_written_before_the_watcher_started_is_ignored(tmp_path):
+    previous = tmp_path / 'model_rf.pkl'
+    previous.write_bytes(b'previous model')
+    past = time.time() - 60
+    os.utime(previous, (past, past))
+
+    watcher = ArtifactWatcher(str(tmp_path), stable_seconds=0, poll_interval=0.05)
+    trainer, handoff = trainer_and_handoff()
+    order = []
+
+    def train(job):
+        time.sleep(0.3)
+        order.append(job.name)
+        return JobResult(job.name, True, status_code=0)
+
+    def test(job):
+        order.append(job.name)
+        return JobResult(job.name, True, status_code=0)
+
+    try:
+        execute_streamed_testers([trainer], [handoff], watcher, train, test, max_workers=2)
+    finally:
+        watcher.close()
+
+    assert order == ['trainer_rf', 'tester_rf']
+
+def test_failed_trainer_fails_its_tester_without_running_it(watcher):
+    trainer, handoff = trainer_and_handoff()
+    monitor = RecordingMonitor()
+    tested = []
+
+    results = execute_streamed_testers(
+        [trainer], [handoff], watcher,
+        lambda job: JobResult(job.name, False, status_code=1),
+        lambda job: tested.append(job.name),
+        monitors=[monitor],
+    )
+
+    assert tested == []
+    assert {result.name: result.succeeded for result in results} == {'trainer_rf': False, 'tester_rf': False}
+    assert monitor.events[-2:] == [('queued', 'tester_rf'), ('finished', 'tester_rf', False)]
+
+def test_oom_trainer_is_rescheduled_while_its_tester_waits(watcher):
+    trainer, handoff = trainer_and_handoff(pattern=None)
+    attempts = []
+    tested = []
+
+    def train(job):
+        attempts.append(job.mem_limit)
+        return JobResult(job.name, len(attempts) > 1, status_code=0 if len(attempts) > 1 else 137, oom_killed=len(attempts) == 1)
+
+    def test(job):
+        tested.append(len(attempts))
+        return JobResult(job.name, True, status_code=0)
+
+    results = execute_streamed_testers([trainer], [handoff], watcher, train, test, max_workers=4, oom_retries=1, memory_factor=2.0)
+
+    assert attempts == [1000, 2000]
+    assert tested == [2]
+    assert all(result.succeeded for result in results)
+    assert [result.name for result in results].count('trainer_rf') == 1
+
+def test_tester_of_a_trainer_not_executed_starts_at_once(watcher):
+    # resumed run, the trainer of the random forest already succeeded
+    _, handoff = trainer_and_handoff()
+    other = Job('trainer_svm', ['python', 'trainer.py'], {})
+    tester_started = threading.Event()
+
+    def train(job):
+        assert tester_started.wait(timeout=5)
+        return JobResult(job.name, True, status_code=0)
+
+    def test(job):
+        tester_started.set()
+        return JobResult(job.name, True, status_code=0)
+
+    results = execute_streamed_testers([other], [handoff], watcher, train, test, max_workers=2)
+
+    assert all(result.succeeded for result in results)
+
+def inotify_available():
+    inotify = Inotify.open()
+    if inotify is None:
+        return False
+
+    inotify.close()
+    return True
+
+@pytest.mark.skipif(not inotify_available(), reason="inotify is only available on linux")
+def test_watcher_wakes_up_on_a_written_file(tmp_path):
+    watcher = ArtifactWatcher(str(tmp_path), stable_seconds=0, poll_interval=10)
+    timer = threading.Timer(0.1, lambda: (tmp_path / 'model_rf.pkl').write_bytes(b'model'))
+
+    try:
+        start = time.monotonic()
+        timer.start()
+        watcher.wait()
+
+        assert time.monotonic() - start < 5
+    finally:
+        timer.join()
+        watcher.close()
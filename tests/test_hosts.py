@@ -0,0 +1,71 @@
+import os
+import threading
+
+from hosts import DockerHost, HostDispatcher, host_job, map_volumes, parse_docker_hosts
+from jobs import Job, JobResult
+
+def test_parse_docker_hosts():
+    hosts = parse_docker_hosts('unix:///var/run/docker.sock=8, ssh://simur@node2=16:/mnt/data/input,tcp://node3:2376')
+
+    assert hosts == [
+        DockerHost('unix:///var/run/docker.sock', 8),
+        DockerHost('ssh://simur@node2', 16, '/mnt/data/input'),
+        DockerHost('tcp://node3:2376'),
+    ]
+
+def test_parse_docker_hosts_empty():
+    assert parse_docker_hosts(None) == []
+    assert parse_docker_hosts(' , ') == []
+
+def test_map_volumes_rebases_the_dataset_folders(tmp_path):
+    root = str(tmp_path / 'input')
+    volumes = {
+        root: {'bind': '/app/data/input', 'mode': 'rw'},
+        os.path.join(root, 'PMP1002'): {'bind': '/app/data', 'mode': 'rw'},
+        str(tmp_path / 'participants.txt'): {'bind': '/app/participants.txt', 'mode': 'rw'},
+    }
+
+    assert map_volumes(volumes, root, '/mnt/data/input') == {
+        '/mnt/data/input': {'bind': '/app/data/input', 'mode': 'rw'},
+        '/mnt/data/input/PMP1002': {'bind': '/app/data', 'mode': 'rw'},
+        str(tmp_path / 'participants.txt'): {'bind': '/app/participants.txt', 'mode': 'rw'},
+    }
+    assert map_volumes(volumes, root, None) is volumes
+
+def test_host_job_keeps_the_original_job(tmp_path):
+    root = str(tmp_path)
+    job = Job('job', ['python', 'converter.py'], {os.path.join(root, 'PMP1002'): {'bind': '/app/data', 'mode': 'rw'}})
+
+    mapped = host_job(job, root, DockerHost('ssh://node2', 4, '/mnt/input'))
+
+    assert list(mapped.volumes) == ['/mnt/input/PMP1002']
+    assert list(job.volumes) == [os.path.join(root, 'PMP1002')]
+
+def test_dispatcher_steals_the_jobs_of_a_blocked_host():
+    jobs = [Job(f"job_{index}", [], {}, participant=f"PMP100{index}") for index in range(6)]
+    blocked = threading.Event()
+    executed = {0: [], 1: []}
+
+    def runner(position):
+        def run(job):
+            executed[position].append(job.name)
+
+            # the first host is stuck on its first job until the other one ran everything else
+            if position == 0:
+                blocked.wait(timeout=5)
+
+            return JobResult(job.name, True, status_code=0)
+
+        return run
+
+    dispatcher = HostDispatcher([DockerHost('unix://a'), DockerHost('unix://b')], [runner(0), runner(1)])
+
+    def on_result(result):
+        if len(executed[1]) == len(jobs) - 1:
+            blocked.set()
+
+    results = dispatcher.run(jobs, on_result=on_result)
+
+    assert sorted(result.name for result in results) == sorted(job.name for job in jobs)
+    assert len(executed[0]) == 1
+    assert dispatcher.stolen == 2
@@ -0,0 +1,37 @@
+from jobs import RunningJobs
+
+class FakeHandle:
+    def __init__(self, fail=False):
+        self.killed = 0
+        self.fail = fail
+
+    def kill(self):
+        self.killed += 1
+        if self.fail:
+            raise Exception("already exited")
+
+def test_kill_all_kills_the_running_jobs_only():
+    running = RunningJobs()
+    first, second, finished = FakeHandle(), FakeHandle(fail=True), FakeHandle()
+    running.add('first', first)
+    running.add('second', second)
+    running.add('finished', finished)
+    running.remove('finished')
+
+    running.kill_all()
+
+    assert (first.killed, second.killed, finished.killed) == (1, 1, 0)
+
+def test_jobs_started_after_the_interrupt_are_killed_at_once():
+    running = RunningJobs()
+    running.kill_all()
+
+    late = FakeHandle()
+    running.add('late', late)
+    assert late.killed == 1
+
+    running.reset()
+
+    next_run = FakeHandle()
+    running.add('next_run', next_run)
+    assert next_run.killed == 0
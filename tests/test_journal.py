@@ -0,0 +1,78 @@
+import pytest
+
+from jobs import Job, JobResult, execute_jobs
+from journal import JournalMonitor, RunJournal, default_journal_path, resume_chains, resume_jobs
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = RunJournal(str(tmp_path / 'journal.sqlite'))
+    yield journal
+    journal.close()
+
+def make_jobs(*names):
+    return [Job(name, ['python', 'converter.py'], {}) for name in names]
+
+def test_resume_executes_the_jobs_not_succeeded(journal):
+    outcomes = {
+        'succeeded': JobResult('succeeded', True, status_code=0),
+        'failed': JobResult('failed', False, status_code=1),
+        'oom_killed': JobResult('oom_killed', False, status_code=137, oom_killed=True),
+    }
+
+    def runner(job):
+        monitor.job_started(job, None)
+        if job.name == 'oom_killed':
+            job.mem_limit = 2048
+        monitor.job_finished(job, outcomes[job.name])
+
+        return outcomes[job.name]
+
+    journal.start_run('run', 'converter.py')
+    monitor = JournalMonitor(journal, 'run')
+    execute_jobs(None, 'image', make_jobs('succeeded', 'failed', 'oom_killed'), runner=runner, monitors=[monitor])
+
+    # queued when the run was interrupted
+    monitor.job_queued(*make_jobs('interrupted'))
+
+    pending, results = resume_jobs(journal, 'run', make_jobs('succeeded', 'failed', 'oom_killed', 'interrupted', 'new'))
+
+    assert [job.name for job in pending] == ['failed', 'oom_killed', 'interrupted', 'new']
+    assert results == [JobResult('succeeded', True, status_code=0)]
+    # the OOM killed job resumes with its raised memory limit
+    assert pending[1].mem_limit == 2048
+
+def test_resume_chains_drop_the_succeeded_head_of_every_chain(journal):
+    monitor = JournalMonitor(journal, 'run')
+    for job in make_jobs('aggregator_a', 'trainer_a', 'aggregator_b'):
+        monitor.job_queued(job)
+        monitor.job_started(job, None)
+        monitor.job_finished(job, JobResult(job.name, job.name != 'trainer_a'))
+
+    chains = [make_jobs('aggregator_a', 'trainer_a', 'tester_a'), make_jobs('aggregator_b', 'trainer_b', 'tester_b')]
+    pending, results = resume_chains(journal, 'run', chains)
+
+    assert [[job.name for job in chain] for chain in pending] == [['trainer_a', 'tester_a'], ['trainer_b', 'tester_b']]
+    assert sorted(result.name for result in results) == ['aggregator_a', 'aggregator_b']
+
+def test_journal_counts_the_attempts(journal):
+    job, = make_jobs('job')
+    monitor = JournalMonitor(journal, 'run')
+
+    monitor.job_queued(job)
+    for succeeded in (False, True):
+        monitor.job_started(job, None)
+        monitor.job_finished(job, JobResult(job.name, succeeded))
+
+    assert journal.jobs('run')['job'] == {'state': 'succeeded', 'attempts': 2, 'mem_limit': None}
+
+def test_default_journal_is_local_and_per_dataset_folder(tmp_path, state_home):
+    path = default_journal_path(str(tmp_path / 'input'))
+
+    assert path.startswith(str(state_home))
+    assert path != default_journal_path(str(tmp_path / 'other'))
+
+    journal = RunJournal(path)
+    try:
+        assert journal.connection.execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+    finally:
+        journal.close()
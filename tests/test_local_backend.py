@@ -0,0 +1,53 @@
+import os
+import sys
+
+from jobs import Job
+from local_backend import LocalBackend, host_path, local_command
+
+VOLUMES = {
+    'data/input': {'bind': '/app/data/input', 'mode': 'rw'},
+    '/mnt/output': {'bind': '/app/data/input/output', 'mode': 'rw'},
+}
+
+def test_host_path_is_absolute(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+
+    assert host_path('data/input', VOLUMES) == str(tmp_path / 'data' / 'input')
+    assert host_path('/app/data/input/PMP1002/file.csv', VOLUMES) == str(tmp_path / 'data' / 'input' / 'PMP1002' / 'file.csv')
+
+def test_host_path_prefers_the_deepest_mount_point():
+    assert host_path('data/input/output/case/model.pkl', VOLUMES) == os.path.join('/mnt/output', 'case', 'model.pkl')
+
+def test_host_path_of_an_unmounted_path():
+    assert host_path('/tmp/file.csv', VOLUMES) is None
+    assert host_path('data/inputs', VOLUMES) is None
+
+def test_local_command_maps_the_mounted_arguments(tmp_path):
+    job = Job('job', ['python', 'windowed.py', '--csv-file', 'data/input/PMP1002.csv', '--case-id', 'case'], {
+        str(tmp_path): {'bind': '/app/data/input', 'mode': 'rw'},
+    })
+
+    assert local_command(job, '/opt/modules', 'python3') == [
+        'python3', '/opt/modules/windowed.py', '--csv-file', str(tmp_path / 'PMP1002.csv'), '--case-id', 'case',
+    ]
+
+def test_local_backend_runs_the_module_from_the_modules_folder(tmp_path):
+    modules = tmp_path / 'modules'
+    modules.mkdir()
+    (modules / 'converter.py').write_text(
+        'import sys\n'
+        'open(sys.argv[1] + ".csv", "w").write("converted")\n'
+        'sys.exit(int(sys.argv[2]))\n')
+
+    data = tmp_path / 'data'
+    data.mkdir()
+
+    backend = LocalBackend(str(modules), sys.executable)
+    volumes = {str(data): {'bind': '/app/data', 'mode': 'rw'}}
+
+    result = backend.run_job(Job('succeeded', ['python', 'converter.py', 'data/PMP1002', '0'], volumes))
+    assert result.succeeded
+    assert (data / 'PMP1002.csv').read_text() == 'converted'
+
+    result = backend.run_job(Job('failed', ['python', 'converter.py', 'data/PMP1003', '3'], volumes))
+    assert (result.succeeded, result.status_code, result.oom_killed) == (False, 3, False)
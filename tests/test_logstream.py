@@ -0,0 +1,95 @@
+import gzip
+import logging
+
+from jobs import Job, run_job
+from logstream import LogMultiplexer, RateLimiter
+from tests.fakes import FakeClient, FakeContainer
+
+class StreamingContainer(FakeContainer):
+    """Fake container whose log stream splits its lines between chunks"""
+    def __init__(self, name, chunks):
+        super().__init__(name, 0.0, 0)
+        self.chunks = chunks
+
+    def logs(self, stream=True, follow=True):
+        yield from self.chunks
+
+class StreamingContainers:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def run(self, name=None, **kwargs):
+        return StreamingContainer(name, self.chunks)
+
+def read_log(logs, job_name):
+    with gzip.open(logs.log_path(job_name), 'rt', encoding='utf-8') as f:
+        return f.read().splitlines()
+
+def test_rate_limiter_allows_bursts_then_the_rate():
+    limiter = RateLimiter(rate=2, burst=2)
+    now = limiter.updated_at
+
+    assert [limiter.allow(now) for _ in range(3)] == [True, True, False]
+    assert limiter.allow(now + 0.5)
+    assert not limiter.allow(now + 0.5)
+
+def test_job_log_stream_is_written_by_lines(tmp_path):
+    client = FakeClient({}, {})
+    client.containers = StreamingContainers([b'epoch 1\nep', b'och 2\n', b'done'])
+
+    with LogMultiplexer(str(tmp_path)) as logs:
+        result = run_job(client, 'image', Job('trainer_case', ['python', 'trainer.py'], {}), logs)
+
+    assert result.succeeded
+    lines = read_log(logs, 'trainer_case')
+    assert lines[0].endswith('---- trainer_case attempt started ----')
+    assert [line.split(' ', 2)[2] for line in lines[1:]] == ['epoch 1', 'epoch 2', 'done']
+
+def test_every_attempt_is_appended_with_its_header(tmp_path):
+    with LogMultiplexer(str(tmp_path)) as logs:
+        for attempt in range(2):
+            log = logs.open('converter_PMP1000_W1_PI')
+            log.write(f"attempt {attempt}")
+            log.close()
+
+    lines = read_log(logs, 'converter_PMP1000_W1_PI')
+
+    assert [line.endswith('---- converter_PMP1000_W1_PI attempt started ----') for line in lines] == [True, False, True, False]
+    assert lines[1].endswith('attempt 0') and lines[3].endswith('attempt 1')
+
+def test_console_lines_beyond_the_rate_are_counted(tmp_path, caplog):
+    caplog.set_level(logging.INFO, logger='logstream')
+
+    with LogMultiplexer(str(tmp_path), console_rate=0.001) as logs:
+        log = logs.open('windowed_PMP1000_W1_PI')
+        for index in range(50):
+            log.write(f"line {index}")
+        log.close()
+
+    console = [record.message for record in caplog.records if record.message.startswith('[windowed_PMP1000_W1_PI]')]
+
+    assert console[0] == '[windowed_PMP1000_W1_PI] line 0'
+    assert console[-1].startswith('[windowed_PMP1000_W1_PI] ... 49 lines suppressed')
+    # the log file keeps every line
+    assert len(read_log(logs, 'windowed_PMP1000_W1_PI')) == 51
+
+def test_lines_beyond_the_queue_are_dropped_and_counted(tmp_path, caplog):
+    caplog.set_level(logging.INFO, logger='logstream')
+
+    # the writer is not started yet, the queue fills up without blocking the job
+    logs = LogMultiplexer(str(tmp_path), queue_size=2)
+    log = logs.open('converter_PMP1000_W1_PI')
+    for index in range(5):
+        log.write(f"line {index}")
+
+    assert log.dropped == 3
+
+    logs.start()
+    log.close()
+    logs.close()
+
+    lines = read_log(logs, 'converter_PMP1000_W1_PI')
+
+    assert [line.split(' ', 2)[2] for line in lines[1:3]] == ['line 0', 'line 1']
+    assert lines[3].endswith('---- 3 lines dropped ----')
+    assert any('3 lines dropped' in record.message and record.levelno == logging.WARNING for record in caplog.records)
@@ -0,0 +1,72 @@
+import os
+
+from jobs import Job
+from manifest import Manifest, fingerprint_file, select_outdated_jobs
+
+def converter_job(folder):
+    return Job(
+        'converter_PMP1002_W1_PI',
+        ['python', 'converter.py', '--bin-matrix-PMP', 'data/PMP1002_W1_PI.BIN'],
+        {},
+        inputs=[str(folder / 'PMP1002_W1_PI.BIN')],
+        outputs=[str(folder / 'PMP1002_W1_PI.csv')],
+    )
+
+def test_fingerprint_file_changes_with_mtime_and_size(tmp_path):
+    path = tmp_path / 'PMP1002_W1_PI.BIN'
+    path.write_bytes(b'0123')
+    fingerprint = fingerprint_file(str(path))
+
+    os.utime(path, ns=(0, 0))
+    assert fingerprint_file(str(path)) != fingerprint
+
+    path.write_bytes(b'012345')
+    assert fingerprint_file(str(path))[1] == 6
+
+def test_fingerprint_file_with_content_hash_ignores_mtime(tmp_path):
+    path = tmp_path / 'PMP1002_W1_PI.BIN'
+    path.write_bytes(b'0123')
+    fingerprint = fingerprint_file(str(path), content_hash=True)
+
+    os.utime(path, ns=(0, 0))
+    assert fingerprint_file(str(path), content_hash=True) == fingerprint
+
+def test_fingerprint_file_of_a_missing_file(tmp_path):
+    path = str(tmp_path / 'missing.BIN')
+
+    assert fingerprint_file(path) == [path, None, None]
+
+def test_select_outdated_jobs(tmp_path):
+    (tmp_path / 'PMP1002_W1_PI.BIN').write_bytes(b'0123')
+    manifest_path = str(tmp_path / 'manifest.json')
+
+    job = converter_job(tmp_path)
+    manifest = Manifest(manifest_path, 'converter.py')
+    outdated, keys, skipped = select_outdated_jobs(manifest, [job], 'sha256:image')
+    assert (outdated, skipped) == ([job], 0)
+
+    manifest.record(job, keys[job.name])
+    manifest.save()
+    manifest = Manifest(manifest_path, 'converter.py')
+
+    # the output is missing
+    assert select_outdated_jobs(manifest, [job], 'sha256:image')[2] == 0
+
+    (tmp_path / 'PMP1002_W1_PI.csv').write_text('')
+    assert select_outdated_jobs(manifest, [job], 'sha256:image')[2] == 1
+    assert select_outdated_jobs(manifest, [job], 'sha256:image', force=True)[2] == 0
+    assert select_outdated_jobs(manifest, [job], 'sha256:other')[2] == 0
+
+    (tmp_path / 'PMP1002_W1_PI.BIN').write_bytes(b'012345')
+    assert select_outdated_jobs(manifest, [job], 'sha256:image')[2] == 0
+
+def test_manifest_entries_by_python_module(tmp_path):
+    manifest_path = str(tmp_path / 'manifest.json')
+    job = converter_job(tmp_path)
+
+    manifest = Manifest(manifest_path, 'converter.py')
+    manifest.record(job, 'key')
+    manifest.save()
+
+    assert Manifest(manifest_path, 'windowed.py').entries == {}
+    assert Manifest(manifest_path, 'converter.py').entries[job.name]['key'] == 'key'
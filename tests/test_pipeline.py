@@ -0,0 +1,125 @@
+import random
+
+import docker
+import pytest
+
+from executor import Executor
+from journal import RunJournal, default_journal_path
+from pipeline import ParticipantState, Pipeline
+from stages import Stage
+from tests.fakes import FakeClient, generate_dataset
+
+PARTICIPANTS = 3
+
+class FakeImage:
+    id = 'sha256:fake'
+
+class FakeImages:
+    def get(self, image):
+        return FakeImage()
+
+class PipelineClient(FakeClient):
+    """Fake docker client of a whole executor run, recording the started containers in order"""
+    def __init__(self, status_codes=None):
+        super().__init__({}, status_codes or {})
+        self.images = FakeImages()
+        self.names = []
+
+        run = self.containers.run
+
+        def record_run(name=None, **kwargs):
+            with self.lock:
+                self.names.append(name)
+
+            return run(name=name, **kwargs)
+
+        self.containers.run = record_run
+
+    def ping(self):
+        return True
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    # no participants.txt in the working directory, every participant is required
+    monkeypatch.chdir(tmp_path)
+
+    root = tmp_path / 'input'
+    generate_dataset(str(root), PARTICIPANTS, 1024, random.Random(0))
+
+    return root
+
+def run_pipeline(dataset, monkeypatch, client, **options):
+    monkeypatch.setattr(docker, 'from_env', lambda **kwargs: client)
+
+    options.setdefault('pipeline_stages', 'converter.py,windowed.py,windowing_mets.py')
+
+    executor = Executor.from_options(str(dataset), 'image:1.0', 'pipeline', max_workers=4, retries=0, **options)
+
+    return executor.run()
+
+def test_pipeline_runs_the_stages_of_every_participant_in_order(dataset, monkeypatch):
+    client = PipelineClient()
+
+    results = run_pipeline(dataset, monkeypatch, client)
+
+    assert results and all(result.succeeded for result in results)
+    assert len(results) == len(client.names) == len(set(client.names))
+
+    for index in range(PARTICIPANTS):
+        code = str(1000 + index)
+        stages = [name.split('_')[0] for name in client.names if code in name]
+
+        assert stages == sorted(stages, key=['converter', 'windowed', 'windowing'].index)
+        assert set(stages) == {'converter', 'windowed', 'windowing'}
+
+def test_pipeline_stops_a_failed_participant_only(dataset, monkeypatch):
+    failed = 'converter_PMP1001_W1_PI'
+    client = PipelineClient({failed: 1})
+
+    results = run_pipeline(dataset, monkeypatch, client, run_id='run')
+
+    assert [result.name for result in results if not result.succeeded] == [failed]
+    assert not any('1001' in name for name in client.names if not name.startswith('converter'))
+    assert any('1002' in name for name in client.names if name.startswith('windowing'))
+
+    journal = RunJournal(default_journal_path(str(dataset)))
+    try:
+        assert journal.jobs('run')[failed]['state'] == 'failed'
+    finally:
+        journal.close()
+
+
+def test_pipeline_fails_before_any_job_when_a_required_participant_is_missing(dataset, monkeypatch, tmp_path):
+    (tmp_path / 'participants.txt').write_text('PMP1000\nPMP1099\n')
+    client = PipelineClient()
+
+    with pytest.raises(Exception, match='PMP1099'):
+        run_pipeline(
+            dataset, monkeypatch, client,
+            pipeline_stages='converter.py,aggregator.py',
+            case_id='case', case_id_folder=str(tmp_path / 'cases'), ml_models='RandomForest',
+        )
+
+    assert client.names == []
+
+def test_cohort_waits_for_a_required_participant_without_code(tmp_path):
+    pipeline = Pipeline(None, None, [Stage.CONVERTER, Stage.AGGREGATOR], {})
+    pipeline.required = {'PMP1000', 'PMP1001'}
+
+    # no PMP file name in the first folder, it is matched by its folder name
+    unnamed = ParticipantState(str(tmp_path / 'PMP1000'))
+    coded = ParticipantState(str(tmp_path / 'subject'))
+    coded.code = 'PMP1001'
+    coded.done = True
+    pipeline.participants = {participant.directory: participant for participant in (unnamed, coded)}
+
+    assert pipeline._cohort_ready() is False
+
+    unnamed.done = True
+    assert pipeline._cohort_ready() is True
+
+    unnamed.failed = True
+    assert pipeline._cohort_ready() is None
@@ -0,0 +1,88 @@
+import csv
+import json
+
+from jobs import Job, JobResult
+from profiling import Profiler, block_io_bytes, percentile, rss_bytes
+from tests.fakes import FakeContainer
+
+class StatsContainer(FakeContainer):
+    """Fake container streaming the given docker stats samples"""
+    def __init__(self, name, samples):
+        super().__init__(name, 0.0, 0)
+        self.samples = samples
+
+    def stats(self, stream=True, decode=True):
+        return iter(self.samples)
+
+def stats_sample(rss, cpu_seconds, read, write, cgroup_v2=False):
+    return {
+        'memory_stats': {'usage': rss * 2, 'stats': {'anon' if cgroup_v2 else 'rss': rss}},
+        'cpu_stats': {'cpu_usage': {'total_usage': int(cpu_seconds * 1e9)}},
+        'blkio_stats': {'io_service_bytes_recursive': [
+            {'major': 8, 'op': 'Read', 'value': read},
+            {'major': 8, 'op': 'Write', 'value': write},
+        ]},
+    }
+
+def profile_job(profiler, job, samples, succeeded=True):
+    profiler.job_queued(job)
+    profiler.job_started(job, StatsContainer(job.name, samples))
+    profiler.job_finished(job, JobResult(job.name, succeeded, status_code=0 if succeeded else 1))
+
+def converter_job(participant, sensor):
+    name = f"converter_{participant}_W1_{sensor}"
+
+    return Job(name, ['python', 'converter.py'], {}, participant=participant, sensor=sensor, stage='converter.py')
+
+def test_percentile_is_the_nearest_rank():
+    values = [5, 1, 4, 2, 3]
+
+    assert [percentile(values, percent) for percent in (1, 50, 95, 100)] == [1, 3, 5, 5]
+
+def test_stats_of_cgroup_v1_and_v2_daemons():
+    assert rss_bytes(stats_sample(100, 1, 0, 0)['memory_stats']) == 100
+    assert rss_bytes(stats_sample(100, 1, 0, 0, cgroup_v2=True)['memory_stats']) == 100
+    assert rss_bytes({'usage': 300}) == 300
+    assert block_io_bytes(stats_sample(0, 1, 10, 20)['blkio_stats']) == (10, 20)
+
+def test_profiler_records_every_job_from_its_stats():
+    profiler = Profiler('converter.py')
+    job = converter_job('PMP1000', 'PI')
+
+    profile_job(profiler, job, [stats_sample(100, 0.5, 10, 0), stats_sample(300, 1.5, 40, 20), stats_sample(200, 2.0, 50, 30)])
+
+    record = profiler.records[job.name]
+    assert (record['stage'], record['participant'], record['sensor'], record['succeeded']) == ('converter.py', 'PMP1000', 'PI', True)
+    assert record['peak_rss_bytes'] == 300
+    assert record['cpu_seconds'] == 2.0
+    assert (record['block_read_bytes'], record['block_write_bytes']) == (50, 30)
+    assert record['wall_seconds'] >= 0 and record['wait_seconds'] >= 0
+
+def test_summary_has_the_p50_p95_and_max_of_every_group(tmp_path):
+    profiler = Profiler('converter.py')
+    for index, (participant, sensor) in enumerate([('PMP1000', 'PI'), ('PMP1000', 'M'), ('PMP1001', 'PI')]):
+        rss = 100 * (index + 1)
+        profile_job(profiler, converter_job(participant, sensor), [stats_sample(rss, index + 1, rss, 0)], succeeded=index != 2)
+
+    summary = profiler.summary()
+
+    assert summary['total']['jobs'] == 3
+    assert summary['total']['metrics']['peak_rss_bytes'] == {'p50': 200, 'p95': 300, 'max': 300}
+    assert summary['total']['metrics']['cpu_seconds'] == {'p50': 2.0, 'p95': 3.0, 'max': 3.0}
+
+    stage = summary['stages']['converter.py']
+    assert stage['participants']['PMP1000']['metrics']['peak_rss_bytes'] == {'p50': 100, 'p95': 200, 'max': 200}
+    assert stage['sensors']['PI']['jobs'] == 2
+    assert stage['sensors']['M']['metrics']['block_read_bytes'] == {'p50': 200, 'p95': 200, 'max': 200}
+
+    profile_path, summary_path = profiler.write(str(tmp_path / 'profiles'))
+
+    with open(profile_path, newline='') as f:
+        rows = list(csv.DictReader(f))
+
+    assert [row['job'] for row in rows] == ['converter_PMP1000_W1_M', 'converter_PMP1000_W1_PI', 'converter_PMP1001_W1_PI']
+    assert [row['succeeded'] for row in rows] == ['True', 'True', 'False']
+    assert [row['peak_rss_bytes'] for row in rows] == ['200', '100', '300']
+
+    with open(summary_path) as f:
+        assert json.load(f) == json.loads(json.dumps(summary))
@@ -0,0 +1,122 @@
+import logging
+import urllib.error
+import urllib.request
+
+import pytest
+
+import progress
+from jobs import Job, JobResult
+from progress import MetricsServer, ProgressMonitor, format_duration
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(progress, 'time', clock)
+
+    return clock
+
+def sized_job(folder, name, size, stage='converter.py'):
+    path = folder / f"{name}.BIN"
+    path.write_bytes(b'0' * size)
+
+    return Job(name, ['python', stage], {}, inputs=[str(path)], stage=stage)
+
+def run(monitor, clock, job, seconds, succeeded=True):
+    monitor.job_started(job, None)
+    clock.now += seconds
+    monitor.job_finished(job, JobResult(job.name, succeeded))
+
+def test_done_ratio_is_weighted_by_input_bytes_and_gives_the_eta(tmp_path, clock):
+    monitor = ProgressMonitor('converter.py', interval=0)
+    small, big = sized_job(tmp_path, 'small', 100), sized_job(tmp_path, 'big', 300)
+    for job in (small, big):
+        monitor.job_queued(job)
+
+    run(monitor, clock, big, 30)
+
+    snapshot = monitor.snapshot()['converter.py']
+    assert (snapshot['queued'], snapshot['running'], snapshot['succeeded'], snapshot['failed']) == (1, 0, 1, 0)
+    assert snapshot['done'] == 0.75
+    # 75% done in 30 seconds, 10 more seconds to go
+    assert snapshot['eta_seconds'] == pytest.approx(10)
+
+    run(monitor, clock, small, 5, succeeded=False)
+
+    snapshot = monitor.snapshot()['converter.py']
+    assert (snapshot['done'], snapshot['failed'], snapshot['eta_seconds']) == (1.0, 1, 0)
+
+def test_stages_without_input_bytes_progress_by_jobs(clock):
+    monitor = ProgressMonitor('trainer.py', interval=0)
+    jobs = [Job(f"trainer_{index}", ['python', 'trainer.py'], {}) for index in range(4)]
+    for job in jobs:
+        monitor.job_queued(job)
+
+    run(monitor, clock, jobs[0], 10)
+
+    snapshot = monitor.snapshot()['trainer.py']
+    assert snapshot['done'] == 0.25
+    assert snapshot['eta_seconds'] == pytest.approx(30)
+
+def test_progress_is_logged_for_the_unfinished_stages(tmp_path, clock, caplog):
+    caplog.set_level(logging.INFO, logger='progress')
+    monitor = ProgressMonitor('pipeline', interval=0)
+    converter = sized_job(tmp_path, 'converter', 100)
+    windowed = sized_job(tmp_path, 'windowed', 100, stage='windowed.py')
+    for job in (converter, windowed):
+        monitor.job_queued(job)
+
+    run(monitor, clock, converter, 60)
+    monitor.job_started(windowed, None)
+    monitor.log_progress()
+
+    assert [record.message for record in caplog.records] == [
+        'Progress windowed.py: 0/1 jobs, 1 running, 0 failed, 0.0% done, ETA --:--:--',
+    ]
+    assert format_duration(3725) == '01:02:05'
+
+def test_metrics_are_prometheus_text(tmp_path, clock):
+    monitor = ProgressMonitor('converter.py', interval=0)
+    small, big = sized_job(tmp_path, 'small', 100), sized_job(tmp_path, 'big', 300)
+    for job in (small, big):
+        monitor.job_queued(job)
+
+    run(monitor, clock, big, 10)
+
+    lines = monitor.metrics().splitlines()
+
+    assert '# TYPE executor_jobs gauge' in lines
+    assert 'executor_jobs{stage="converter.py",state="queued"} 1' in lines
+    assert 'executor_jobs{stage="converter.py",state="succeeded"} 1' in lines
+    assert 'executor_progress_ratio{stage="converter.py"} 0.750000' in lines
+    assert 'executor_eta_seconds{stage="converter.py"} 3.3' in lines
+    assert '# TYPE executor_job_duration_seconds histogram' in lines
+    assert 'executor_job_duration_seconds_bucket{stage="converter.py",le="5"} 0' in lines
+    assert 'executor_job_duration_seconds_bucket{stage="converter.py",le="15"} 1' in lines
+    assert 'executor_job_duration_seconds_bucket{stage="converter.py",le="3600"} 1' in lines
+    assert 'executor_job_duration_seconds_bucket{stage="converter.py",le="+Inf"} 1' in lines
+    assert 'executor_job_duration_seconds_sum{stage="converter.py"} 10.000' in lines
+    assert 'executor_job_duration_seconds_count{stage="converter.py"} 1' in lines
+
+def test_metrics_are_served_over_http(tmp_path):
+    monitor = ProgressMonitor('converter.py', interval=0)
+    monitor.job_queued(sized_job(tmp_path, 'job', 10))
+
+    server = MetricsServer(monitor, 0).start()
+    try:
+        host, port = server.server.server_address
+
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=5) as response:
+            assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+            assert response.read().decode() == monitor.metrics()
+
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://{host}:{port}/other", timeout=5)
+    finally:
+        server.stop()
@@ -0,0 +1,113 @@
+import docker
+import pytest
+
+from executor import parse_args, start_runtimes
+from hosts import parse_docker_hosts
+from runtime import DockerRuntime
+
+class FakeImage:
+    def __init__(self, id):
+        self.id = id
+
+class FakeImages:
+    """Local images of a fake docker daemon by tag, the registry has every tag"""
+    def __init__(self, local, registry):
+        self.local = dict(local)
+        self.registry = registry
+        self.gets = []
+        self.pulls = []
+
+    def get(self, image):
+        self.gets.append(image)
+        if image not in self.local:
+            raise docker.errors.ImageNotFound(f"No such image: {image}")
+
+        return FakeImage(self.local[image])
+
+    def pull(self, image):
+        self.pulls.append(image)
+        self.local[image] = self.registry[image]
+
+        return FakeImage(self.local[image])
+
+class FakeDockerClient:
+    def __init__(self, local=(), registry=None, reachable=True):
+        self.images = FakeImages(dict(local), registry or {})
+        self.reachable = reachable
+        self.closed = False
+
+    def ping(self):
+        if not self.reachable:
+            raise Exception("connection refused")
+
+        return True
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def daemons(monkeypatch):
+    """Fake docker daemons by url, the environment one under None"""
+    daemons = {}
+
+    monkeypatch.setattr(docker, 'from_env', lambda **kwargs: daemons[None])
+    monkeypatch.setattr(docker, 'DockerClient', lambda base_url=None, **kwargs: daemons[base_url])
+
+    return daemons
+
+def test_images_are_pinned_to_their_id(daemons):
+    daemons[None] = FakeDockerClient(local={'hmc:1.0': 'sha256:aaa'})
+
+    runtime = DockerRuntime(max_workers=4).start(['hmc:1.0', 'hmc:1.0'])
+
+    # the tag moves while running, the run keeps the image it started with
+    daemons[None].images.local['hmc:1.0'] = 'sha256:bbb'
+
+    assert runtime.image('hmc:1.0') == 'sha256:aaa'
+    assert daemons[None].images.gets == ['hmc:1.0']
+    assert daemons[None].images.pulls == []
+
+def test_images_are_pulled_only_when_missing(daemons):
+    registry = {'hmc:1.0': 'sha256:aaa', 'ml:1.0': 'sha256:ccc'}
+    daemons[None] = FakeDockerClient(local={'hmc:1.0': 'sha256:aaa'}, registry=registry)
+
+    runtime = DockerRuntime().start(['hmc:1.0', 'ml:1.0'])
+
+    assert runtime.images == registry
+    assert daemons[None].images.pulls == ['ml:1.0']
+
+def test_images_are_always_pulled_with_pull(daemons):
+    registry = {'hmc:1.0': 'sha256:new'}
+    daemons[None] = FakeDockerClient(local={'hmc:1.0': 'sha256:old'}, registry=registry)
+
+    runtime = DockerRuntime(pull=True).start(['hmc:1.0'])
+
+    assert runtime.image('hmc:1.0') == 'sha256:new'
+    assert daemons[None].images.pulls == ['hmc:1.0']
+
+def test_unreachable_daemon_fails_before_resolving_the_images(daemons):
+    daemons[None] = FakeDockerClient(reachable=False)
+
+    with pytest.raises(Exception, match='not reachable'):
+        DockerRuntime().start(['hmc:1.0'])
+
+    assert daemons[None].images.gets == []
+
+def host_args():
+    return parse_args(['--dataset-folder', 'input', '--docker-image', 'hmc:1.0', '--python-module', 'converter.py'])
+
+def test_hosts_must_resolve_the_same_image_id(daemons):
+    daemons['ssh://node1'] = FakeDockerClient(local={'hmc:1.0': 'sha256:aaa'})
+    daemons['ssh://node2'] = FakeDockerClient(local={'hmc:1.0': 'sha256:bbb'})
+
+    with pytest.raises(Exception, match='ssh://node2 images differ from ssh://node1'):
+        start_runtimes(host_args(), parse_docker_hosts('ssh://node1=4,ssh://node2=4'))
+
+def test_hosts_with_the_same_image_id_start(daemons):
+    daemons['ssh://node1'] = FakeDockerClient(local={'hmc:1.0': 'sha256:aaa'})
+    daemons['ssh://node2'] = FakeDockerClient(registry={'hmc:1.0': 'sha256:aaa'})
+
+    runtimes = start_runtimes(host_args(), parse_docker_hosts('ssh://node1=4,ssh://node2=4'))
+
+    assert [runtime.image('hmc:1.0') for runtime in runtimes] == ['sha256:aaa', 'sha256:aaa']
+    assert daemons['ssh://node2'].images.pulls == ['hmc:1.0']
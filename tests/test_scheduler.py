@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+
+from jobs import Job, JobResult
+from scheduler import ResourceBudget, estimate_jobs, execute_scheduled_jobs, parse_bytes
+
+GB = 1024**3
+
+@pytest.mark.parametrize('text, size', [
+    ('1073741824', GB),
+    ('512m', 512 * 1024**2),
+    ('64G', 64 * GB),
+    ('1.5gb', int(1.5 * GB)),
+    (' 2k ', 2048),
+])
+def test_parse_bytes(text, size):
+    assert parse_bytes(text) == size
+
+def test_parse_bytes_rejects_invalid_sizes():
+    with pytest.raises(ValueError):
+        parse_bytes('lots')
+
+def sized_job(folder, name, size):
+    path = folder / f"{name}.BIN"
+    path.write_bytes(b'0' * size)
+
+    return Job(name, ['python', 'converter.py'], {}, inputs=[str(path)])
+
+def test_estimate_jobs_orders_longest_first_within_the_budget(tmp_path):
+    jobs = [sized_job(tmp_path, 'small', 10), sized_job(tmp_path, 'big', 1000), sized_job(tmp_path, 'huge', 10**5)]
+    budget = ResourceBudget(memory_bytes=100000, memory_per_input_byte=2.0, min_job_memory=100, job_cpus=0.5)
+
+    ordered = estimate_jobs(jobs, budget)
+
+    assert [job.name for job in ordered] == ['huge', 'big', 'small']
+    assert [job.mem_limit for job in ordered] == [100000, 2000, 100]
+    assert all(job.nano_cpus == 5 * 10**8 for job in ordered)
+
+def test_estimate_jobs_keeps_a_memory_limit_raised_after_an_oom_kill(tmp_path):
+    job = sized_job(tmp_path, 'job', 10)
+    job.mem_limit = 5000
+
+    estimate_jobs([job], ResourceBudget(memory_bytes=100000, min_job_memory=100))
+
+    assert job.mem_limit == 5000
+
+def test_execute_scheduled_jobs_packs_the_jobs_under_the_budget(tmp_path):
+    jobs = [sized_job(tmp_path, 'big', 60), sized_job(tmp_path, 'medium', 50), sized_job(tmp_path, 'small', 30)]
+    budget = ResourceBudget(memory_bytes=100, memory_per_input_byte=1.0, min_job_memory=1)
+
+    lock = threading.Lock()
+    both_started = threading.Barrier(2, timeout=5)
+    running = {}
+    started = []
+    peaks = []
+
+    def runner(job):
+        with lock:
+            started.append(job.name)
+            running[job.name] = job.mem_limit
+            peaks.append(sum(running.values()))
+
+        # the small job fits beside the big one, the medium one waits for a release
+        if job.name != 'medium':
+            both_started.wait()
+
+        with lock:
+            del running[job.name]
+
+        return JobResult(job.name, True, status_code=0)
+
+    results = execute_scheduled_jobs(None, 'image', jobs, budget, max_workers=3, runner=runner)
+
+    assert sorted(result.name for result in results) == ['big', 'medium', 'small']
+    assert started == ['big', 'small', 'medium']
+    assert max(peaks) <= 100
+
+def test_execute_scheduled_jobs_does_not_starve_a_budget_sized_job(tmp_path):
+    # the huge job memory limit was raised to the whole budget after an OOM kill
+    huge = sized_job(tmp_path, 'huge', 5)
+    huge.mem_limit = 1000
+    jobs = [sized_job(tmp_path, 'big', 50), huge] + [sized_job(tmp_path, f"small_{index:02d}", 1) for index in range(20)]
+    budget = ResourceBudget(memory_bytes=100, memory_per_input_byte=1.0, min_job_memory=1)
+
+    lock = threading.Lock()
+    running = {}
+    started = []
+    peaks = []
+
+    def runner(job):
+        with lock:
+            started.append(job.name)
+            running[job.name] = job.mem_limit
+            peaks.append(sum(running.values()))
+
+        with lock:
+            del running[job.name]
+
+        return JobResult(job.name, True, status_code=0)
+
+    results = execute_scheduled_jobs(None, 'image', jobs, budget, max_workers=4, runner=runner)
+
+    assert len(results) == 22
+    assert huge.mem_limit == 100
+    # the small jobs pass the huge one only while the first big job runs
+    assert started.index('huge') == 4
+    assert started[:4] == ['big', 'small_00', 'small_01', 'small_02']
+    assert max(peaks) <= 100
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from sharding import AggregatorShard, merge_npz, merge_shards, split_contiguous
+
+PARTICIPANTS = ['1001', '1002', '1003', '1004', '1005']
+
+def test_split_contiguous_same_size():
+    assert split_contiguous(PARTICIPANTS, 2) == [['1001', '1002', '1003'], ['1004', '1005']]
+
+def test_split_contiguous_by_weight():
+    weights = {'1001': 100, '1002': 1, '1003': 1, '1004': 1, '1005': 1}
+
+    assert split_contiguous(PARTICIPANTS, 2, weights) == [['1001'], ['1002', '1003', '1004', '1005']]
+
+def test_split_contiguous_keeps_one_participant_per_shard():
+    weights = {'1005': 100}
+
+    slices = split_contiguous(PARTICIPANTS, 5, weights)
+
+    assert [len(shard) for shard in slices] == [1, 1, 1, 1, 1]
+    assert sum(slices, []) == PARTICIPANTS
+
+# uneven number of windows of every participant
+WINDOWS = {'1001': 40, '1002': 35, '1003': 45, '1004': 50, '1005': 45}
+
+def aggregate(participants):
+    """Output of a fake aggregator: the windows of every participant stacked, and per case arrays"""
+    X = np.concatenate([np.full((WINDOWS[participant], 3, 250), int(participant), dtype=float) for participant in participants])
+    y = np.concatenate([np.arange(WINDOWS[participant]) % 4 for participant in participants])
+
+    return {
+        'X': X,
+        'y': y,
+        # per case arrays, one of them as long as a two participant shard
+        'sensors': np.array(['PI', 'M']),
+        'classes': np.array(['sit', 'walk', 'run']),
+        'window_size': np.array(250),
+    }
+
+def write_shards(tmp_path, shards):
+    paths = []
+    for index, shard in enumerate(shards):
+        path = tmp_path / f"shard_{index}.npz"
+        np.savez(path, **aggregate(shard))
+        paths.append(str(path))
+
+    return paths
+
+def test_merge_npz_matches_unsharded_output(tmp_path):
+    unsharded = aggregate(PARTICIPANTS)
+    paths = write_shards(tmp_path, split_contiguous(PARTICIPANTS, 3))
+
+    target = tmp_path / 'merged.npz'
+    merge_npz(paths, str(target), ['X', 'y'])
+
+    with np.load(target) as merged:
+        assert merged['X'].shape == (215, 3, 250)
+        assert sorted(merged.files) == sorted(unsharded)
+        for key, value in unsharded.items():
+            assert merged[key].shape == value.shape
+            assert np.array_equal(merged[key], value)
+
+def test_merge_npz_concatenates_the_window_arrays_by_glob(tmp_path):
+    paths = write_shards(tmp_path, [['1001', '1002'], ['1003']])
+
+    target = tmp_path / 'merged.npz'
+    merge_npz(paths, str(target), ['[Xy]'])
+
+    with np.load(target) as merged:
+        assert merged['X'].shape == (120, 3, 250)
+        assert merged['y'].shape == (120,)
+        assert merged['sensors'].tolist() == ['PI', 'M']
+
+def test_merge_npz_rejects_different_per_case_arrays(tmp_path):
+    first, second = tmp_path / 'first.npz', tmp_path / 'second.npz'
+    np.savez(first, sensors=np.array(['acc', 'gyro']))
+    np.savez(second, sensors=np.array(['acc', 'mag']))
+
+    with pytest.raises(Exception, match='sensors'):
+        merge_npz([str(first), str(second)], str(tmp_path / 'merged.npz'), ['X', 'y'])
+
+def test_merge_npz_rejects_unlisted_window_arrays(tmp_path):
+    paths = write_shards(tmp_path, [['1001', '1002'], ['1003']])
+
+    with pytest.raises(Exception, match='aggregator-window-arrays'):
+        merge_npz(paths, str(tmp_path / 'merged.npz'), ['y'])
+
+def test_merge_shards_matches_unsharded_output(tmp_path):
+    shards = [
+        AggregatorShard(index, participants, str(tmp_path / 'shards' / f"shard_{index:02d}"))
+        for index, participants in enumerate(split_contiguous(PARTICIPANTS, 2))
+    ]
+    for shard in shards:
+        (tmp_path / shard.output_folder / 'case').mkdir(parents=True)
+        np.savez(tmp_path / shard.output_folder / 'case' / 'dataset.npz', **aggregate(shard.participants))
+        (tmp_path / shard.output_folder / 'case' / 'dataset.csv').write_text(
+            'participant\n' + ''.join(f"{participant}\n" for participant in shard.participants))
+
+    unsharded = tmp_path / 'unsharded.npz'
+    np.savez(unsharded, **aggregate(PARTICIPANTS))
+
+    case_id_folder = tmp_path / 'output'
+    assert merge_shards(shards, str(case_id_folder)) == 2
+
+    with np.load(unsharded) as expected, np.load(case_id_folder / 'case' / 'dataset.npz') as merged:
+        for key in expected.files:
+            assert np.array_equal(merged[key], expected[key])
+
+    assert (case_id_folder / 'case' / 'dataset.csv').read_text() == 'participant\n' + '\n'.join(PARTICIPANTS) + '\n'
+    assert not (tmp_path / 'shards').exists()
@@ -0,0 +1,186 @@
+import os
+import logging
+import subprocess
+import threading
+
+import pytest
+
+import staging
+from jobs import Job, JobMonitor, JobResult
+from staging import SCRATCH_PREFIX, StagingArea, stage_file
+
+BIND = {'bind': '/app/data', 'mode': 'rw'}
+
+class RecordingMonitor(JobMonitor):
+    def __init__(self):
+        self.finished = []
+
+    def job_finished(self, job, result):
+        self.finished.append((job.name, result.succeeded))
+
+@pytest.fixture
+def dataset(tmp_path):
+    folder = tmp_path / 'dataset' / 'PMP1001'
+    folder.mkdir(parents=True)
+    (folder / 'input.csv').write_bytes(b'x' * 100)
+
+    return folder
+
+@pytest.fixture
+def area(tmp_path):
+    monitor = RecordingMonitor()
+    with StagingArea(str(tmp_path / 'scratch'), monitors=[monitor]) as area:
+        area.monitor = monitor
+        yield area
+
+def convert_job(folder, name='converter_PMP1001'):
+    return Job(name, ['python', 'converter.py'], {str(folder): BIND},
+               inputs=[str(folder / 'input.csv')], outputs=[str(folder / 'output.npz')])
+
+def staged_folder(job):
+    return next(path for path, bind in job.volumes.items() if bind == BIND)
+
+def write_output(job):
+    with open(os.path.join(staged_folder(job), 'output.npz'), 'wb') as file:
+        file.write(b'converted')
+
+    return JobResult(job.name, True, status_code=0)
+
+def test_inputs_are_hard_linked_on_the_same_file_system(tmp_path, dataset):
+    target = tmp_path / 'linked.csv'
+    stage_file(str(dataset / 'input.csv'), str(target))
+
+    assert os.stat(target).st_ino == os.stat(dataset / 'input.csv').st_ino
+
+def test_inputs_are_copied_when_they_cannot_be_linked(tmp_path, dataset, monkeypatch):
+    def cross_device(source, target):
+        raise OSError(18, 'Invalid cross-device link')
+
+    monkeypatch.setattr(staging.os, 'link', cross_device)
+
+    target = tmp_path / 'copied.csv'
+    stage_file(str(dataset / 'input.csv'), str(target))
+
+    assert os.stat(target).st_ino != os.stat(dataset / 'input.csv').st_ino
+    assert target.read_bytes() == b'x' * 100
+
+def test_outputs_are_published_once_the_job_succeeds(area, dataset):
+    def run(job):
+        assert staged_folder(job) != str(dataset)
+        assert os.path.exists(os.path.join(staged_folder(job), 'input.csv'))
+
+        result = write_output(job)
+        # nothing is published while the job is running
+        assert not (dataset / 'output.npz').exists()
+
+        return result
+
+    result = area.wrap(run)(convert_job(dataset))
+
+    assert result.succeeded
+    assert (dataset / 'output.npz').read_bytes() == b'converted'
+    assert sorted(os.listdir(dataset)) == ['input.csv', 'output.npz']
+    assert os.listdir(area.folder) == []
+    assert area.monitor.finished == [('converter_PMP1001', True)]
+
+def test_outputs_of_a_failed_job_are_not_published(area, dataset):
+    def run(job):
+        write_output(job)
+        return JobResult(job.name, False, status_code=1)
+
+    result = area.wrap(run)(convert_job(dataset))
+
+    assert not result.succeeded
+    assert not (dataset / 'output.npz').exists()
+    assert os.listdir(area.folder) == []
+    assert area.monitor.finished == [('converter_PMP1001', False)]
+
+def test_missing_output_fails_the_job(area, dataset):
+    result = area.wrap(lambda job: JobResult(job.name, True, status_code=0))(convert_job(dataset))
+
+    assert not result.succeeded
+    assert 'not written' in result.error
+    assert area.monitor.finished == [('converter_PMP1001', False)]
+
+def test_unexpected_error_releases_the_scratch_and_reports_the_job(area, dataset):
+    def run(job):
+        raise RuntimeError("runner crashed")
+
+    result = area.wrap(run)(convert_job(dataset))
+
+    assert not result.succeeded
+    assert 'runner crashed' in result.error
+    assert area.used_bytes == 0
+    assert os.listdir(area.folder) == []
+    assert area.monitor.finished == [('converter_PMP1001', False)]
+
+def test_chown_failure_is_logged(area, dataset, monkeypatch, caplog):
+    def not_permitted(path, uid, gid):
+        raise PermissionError(1, 'Operation not permitted')
+
+    monkeypatch.setattr(staging.os, 'chown', not_permitted)
+
+    with caplog.at_level(logging.WARNING, logger='staging'):
+        result = area.wrap(write_output)(convert_job(dataset))
+
+    assert result.succeeded
+    assert any('could not be given the owner' in record.message for record in caplog.records)
+
+def test_jobs_wait_for_the_scratch_limit(tmp_path, dataset):
+    second = tmp_path / 'dataset' / 'PMP1002'
+    second.mkdir()
+    (second / 'input.csv').write_bytes(b'x' * 100)
+
+    lock = threading.Lock()
+    running = []
+    overlapped = []
+
+    def run(job):
+        with lock:
+            running.append(job.name)
+            overlapped.append(len(running))
+        threading.Event().wait(0.1)
+        with lock:
+            running.remove(job.name)
+
+        return write_output(job)
+
+    # each job reserves twice its inputs, only one fits at the same time
+    with StagingArea(str(tmp_path / 'scratch'), limit_bytes=300) as area:
+        runner = area.wrap(run)
+        threads = [threading.Thread(target=runner, args=(convert_job(folder, f"converter_{folder.name}"),))
+                   for folder in (dataset, second)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert area.used_bytes == 0
+
+    assert overlapped == [1, 1]
+    assert (dataset / 'output.npz').exists() and (second / 'output.npz').exists()
+
+def test_job_bigger_than_the_limit_runs_alone(tmp_path, dataset):
+    with StagingArea(str(tmp_path / 'scratch'), limit_bytes=10) as area:
+        result = area.wrap(write_output)(convert_job(dataset))
+
+    assert result.succeeded
+
+def test_scratch_left_by_a_crashed_run_is_removed(tmp_path):
+    scratch = tmp_path / 'scratch'
+    exited = subprocess.Popen(['true'])
+    exited.wait()
+
+    crashed = scratch / f"{SCRATCH_PREFIX}{exited.pid}"
+    (crashed / 'converter_PMP1001-0000').mkdir(parents=True)
+    alive = scratch / f"{SCRATCH_PREFIX}{os.getppid()}"
+    alive.mkdir()
+    other = scratch / 'other'
+    other.mkdir()
+
+    with StagingArea(str(scratch)) as area:
+        assert not crashed.exists()
+        assert alive.exists() and other.exists()
+        assert os.path.isdir(area.folder)
+
+    assert not os.path.exists(area.folder)
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from executor import parse_args
+from sweep import case_metrics, expand_sweep, load_sweep, sweep_chains
+
+def sweep_args(**options):
+    args = parse_args([
+        '--dataset-folder', '/data/input', '--docker-image', 'image:1.0', '--python-module', 'sweep',
+        '--case-id-folder', '/data/output',
+    ])
+    for name, value in options.items():
+        setattr(args, name, value)
+
+    return args
+
+def test_expand_sweep_gives_one_case_per_combination(tmp_path):
+    path = tmp_path / 'sweep.json'
+    path.write_text(json.dumps({
+        'case_id': 'sweep_01',
+        'training_percents': [60, 80],
+        'ml_models': ['RandomForest', 'ESANN, XGBoost'],
+        'ml_sensors': ['thigh', 'thigh,wrist'],
+    }))
+
+    cases = expand_sweep(load_sweep(str(path)), sweep_args())
+
+    assert len(cases) == 8
+    assert cases[0].case_id == 'sweep_01_tp60_RandomForest_thigh'
+    assert cases[-1].case_id == 'sweep_01_tp80_ESANN-XGBoost_thigh-wrist'
+    assert (cases[-1].training_percent, cases[-1].ml_models, cases[-1].ml_sensors) == ('80', 'ESANN,XGBoost', 'thigh,wrist')
+    assert len({case.case_id for case in cases}) == len(cases)
+
+def test_expand_sweep_takes_the_missing_grid_values_from_the_arguments():
+    cases = expand_sweep({'training_percents': [60]}, sweep_args(case_id='case', ml_models='RandomForest', ml_sensors='wrist'))
+
+    assert [(case.case_id, case.ml_models, case.ml_sensors) for case in cases] == [('case_tp60_RandomForest_wrist', 'RandomForest', 'wrist')]
+
+@pytest.mark.parametrize('spec, message', [
+    ({'ml_sensors': ['thigh']}, 'ml_models'),
+    ({'ml_models': ['RandomForest']}, 'ml_sensors'),
+    ({'ml_models': [], 'ml_sensors': ['thigh']}, 'ml_models'),
+    ({'ml_models': [['ESANN', 'XGBoost']], 'ml_sensors': ['thigh']}, 'ml_models'),
+    ({'ml_models': ['RandomForest'], 'ml_sensors': ' , '}, 'ml_sensors'),
+])
+def test_expand_sweep_rejects_missing_model_or_sensor_sets(spec, message):
+    with pytest.raises(Exception, match=message):
+        expand_sweep(spec, sweep_args())
+
+def test_expand_sweep_rejects_cases_with_the_same_case_id():
+    spec = {'ml_models': ['ESANN,XGBoost', 'ESANN-XGBoost'], 'ml_sensors': ['thigh']}
+
+    with pytest.raises(Exception, match='sweep_tp70_ESANN-XGBoost_thigh'):
+        expand_sweep(spec, sweep_args())
+
+def test_sweep_chains_run_every_case_in_its_own_case_folder():
+    cases = expand_sweep({'training_percents': [60, 70], 'ml_models': ['RandomForest'], 'ml_sensors': ['thigh']}, sweep_args())
+
+    chains = sweep_chains(sweep_args(), cases)
+
+    assert [[job.stage for job in chain] for chain in chains] == [['aggregator.py', 'trainer.py', 'tester.py']] * 2
+    assert len({job.name for chain in chains for job in chain}) == 6
+
+def test_case_metrics_of_json_and_classification_reports(tmp_path):
+    (tmp_path / 'metrics_RandomForest.json').write_text(json.dumps({'accuracy': 0.91, 'f1': 0.88, 'model': 'rf', 'best': True}))
+    (tmp_path / 'report_RandomForest.csv').write_text(
+        ',precision,recall,f1-score,support\n'
+        '1,0.9,0.8,0.85,10\n'
+        '2,0.7,0.75,0.72,12\n'
+        'macro avg,0.8,0.77,0.78,22\n'
+    )
+    (tmp_path / 'metrics_summary.csv').write_text('accuracy,f1\n0.91,0.88\n')
+    (tmp_path / 'predictions.csv').write_text('true,predicted\n0,1\n')
+
+    metrics = case_metrics(str(tmp_path), ['*.json', '*metric*.csv', '*report*.csv'])
+
+    assert metrics == {
+        'metrics_RandomForest.accuracy': 0.91,
+        'metrics_RandomForest.f1': 0.88,
+        'report_RandomForest.1.precision': 0.9,
+        'report_RandomForest.1.support': 10,
+        'report_RandomForest.1.recall': 0.8,
+        'report_RandomForest.1.f1-score': 0.85,
+        'report_RandomForest.2.precision': 0.7,
+        'report_RandomForest.2.recall': 0.75,
+        'report_RandomForest.2.f1-score': 0.72,
+        'report_RandomForest.2.support': 12,
+        'report_RandomForest.macro avg.precision': 0.8,
+        'report_RandomForest.macro avg.recall': 0.77,
+        'report_RandomForest.macro avg.f1-score': 0.78,
+        'report_RandomForest.macro avg.support': 22,
+        'metrics_summary.accuracy': 0.91,
+        'metrics_summary.f1': 0.88,
+    }